@@ -1,3 +1,47 @@
+from decimal import Decimal
+from unittest import mock
+
 from django.test import TestCase
 
-# Create your tests here.
+from orders.models import Order
+from orders.testing import OrderFlowMixin
+from reports.models import PharmacyAccountSummary
+from .models import DraftOrder, DraftOrderItem
+
+
+class DraftSubmitTests(OrderFlowMixin, TestCase):
+    """Submitting a draft creates the order at current prices and clears the draft, all in one transaction."""
+
+    def setUp(self):
+        super().setUp()
+        self.draft = DraftOrder.objects.create(user=self.pharmacy_user)
+        DraftOrderItem.objects.create(draft_order=self.draft, product=self.gloves, quantity=4, unit_price=9, discount_amount=2)
+        DraftOrderItem.objects.create(draft_order=self.draft, product=self.masks, quantity=2, unit_price=5)
+
+    def submit(self):
+        return self.client_for_pharmacy().post('/api/drafts/submit/')
+
+    def test_submit(self):
+        response = self.submit()
+        self.assertEqual(response.status_code, 201, response.data)
+        order = Order.objects.get(pk=response.data['id'])
+        self.assertEqual((order.pharmacy, order.total_amount), (self.pharmacy, Decimal('48.00')))
+        self.assertEqual(sorted((i.product.name, i.unit_price, i.total_price) for i in order.items.all()), [
+            ('Gloves', Decimal('10.00'), Decimal('38.00')), ('Masks', Decimal('5.00'), Decimal('10.00')),
+        ])
+        self.assertFalse(DraftOrder.objects.exists())
+        self.assertEqual(PharmacyAccountSummary.objects.get(pk=self.pharmacy.pk).order_count, 1)
+
+    def test_failure_leaves_no_order_and_keeps_the_draft(self):
+        with mock.patch('reports.account_summary.order_created', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            self.submit()
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(DraftOrderItem.objects.filter(draft_order=self.draft).count(), 2)
+
+    def test_empty_draft_or_inactive_product(self):
+        self.gloves.is_active = False
+        self.gloves.save()
+        self.assertEqual(self.submit().status_code, 400)
+        self.draft.items.all().delete()
+        self.assertEqual(self.submit().status_code, 400)
+        self.assertFalse(Order.objects.exists())
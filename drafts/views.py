@@ -1,4 +1,5 @@
 from decimal import Decimal
+from django.db import transaction
 from rest_framework import status, permissions as drf_permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -8,6 +9,7 @@ from pharmacies.models import Pharmacy
 from products.models import Product
 from orders.models import Order, OrderItem
 from orders.serializers import OrderSerializer
+from reports import account_summary
 
 from .models import DraftOrder, DraftOrderItem
 from .serializers import DraftOrderSerializer, DraftOrderItemSerializer, DraftOrderItemCreateSerializer
@@ -75,30 +77,32 @@ class DraftViewSet(GenericViewSet):
                 'quantity': di.quantity,
                 'discount_amount': di.discount_amount,
             })
-        order = Order.objects.create(pharmacy=pharmacy)
-        total_amount = Decimal('0')
-        for item_data in items_data:
-            product = item_data['product']
-            quantity = item_data['quantity']
-            discount_amount = item_data['discount_amount']
-            unit_price = product.selling_price
-            gst_rate = product.gst_rate
-            total_price = unit_price * quantity - discount_amount
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                quantity=quantity,
-                unit_price=unit_price,
-                discount_amount=discount_amount,
-                gst_rate=gst_rate,
-                total_price=total_price,
-            )
-            total_amount += total_price
-        order.total_amount = total_amount
-        order.save()
+        with transaction.atomic():
+            order = Order.objects.create(pharmacy=pharmacy)
+            total_amount = Decimal('0')
+            for item_data in items_data:
+                product = item_data['product']
+                quantity = item_data['quantity']
+                discount_amount = item_data['discount_amount']
+                unit_price = product.selling_price
+                gst_rate = product.gst_rate
+                total_price = unit_price * quantity - discount_amount
+                OrderItem.objects.create(
+                    order=order,
+                    product=product,
+                    quantity=quantity,
+                    unit_price=unit_price,
+                    discount_amount=discount_amount,
+                    gst_rate=gst_rate,
+                    total_price=total_price,
+                )
+                total_amount += total_price
+            order.total_amount = total_amount
+            order.save()
+            account_summary.order_created(order)
 
-        draft.items.all().delete()
-        draft.delete()
+            draft.items.all().delete()
+            draft.delete()
 
         serializer = OrderSerializer(order)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Invoice, CompanyProfile
+from .models import Invoice, CompanyProfile, InvoiceTaxSummary
 
 admin.site.register(Invoice)
 admin.site.register(CompanyProfile)
+admin.site.register(InvoiceTaxSummary)
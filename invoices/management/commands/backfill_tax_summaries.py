@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from orders.models import Dispatch
+from invoices.models import Invoice
+from invoices.services import ensure_tax_summaries
+
+
+class Command(BaseCommand):
+    help = 'Store tax summaries for invoices and dispatch bills that have none yet (bills older than stored summaries).'
+
+    def handle(self, *args, **options):
+        count = ensure_tax_summaries(Invoice.objects.all(), Dispatch.objects.all())
+        self.stdout.write(self.style.SUCCESS(f'Stored tax summaries for {count} bills.'))
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.11 on 2026-10-19 00:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0002_add_company_profile'),
+        ('orders', '0008_add_dispatch_model'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceTaxSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gst_rate', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('taxable_value', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('cgst_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('sgst_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('igst_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('tax_amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('dispatch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tax_summaries', to='orders.dispatch')),
+                ('invoice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tax_summaries', to='invoices.invoice')),
+            ],
+            options={
+                'ordering': ['gst_rate'],
+            },
+        ),
+    ]
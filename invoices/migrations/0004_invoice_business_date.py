@@ -0,0 +1,30 @@
+# Generated by Django 5.2.11 on 2026-10-19 01:10
+
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+def backfill_business_date(apps, schema_editor):
+    # TruncDate converts in the current time zone (settings.TIME_ZONE), the same day the model computes on save.
+    apps.get_model('invoices', 'Invoice').objects.filter(business_date__isnull=True).update(business_date=TruncDate('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0003_invoice_tax_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='business_date',
+            field=models.DateField(editable=False, null=True, help_text='Local date of created_at'),
+        ),
+        migrations.RunPython(backfill_business_date, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='invoice',
+            name='business_date',
+            field=models.DateField(db_index=True, editable=False, help_text='Local date of created_at'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-19 00:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0004_invoice_business_date'),
+        ('orders', '0011_business_date'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['created_at', 'id'], name='invoices_invoice_created_idx'),
+        ),
+    ]
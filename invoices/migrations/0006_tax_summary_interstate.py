@@ -0,0 +1,38 @@
+# Generated by Django 5.2.11 on 2026-10-19 02:10
+
+from django.db import migrations, models
+
+from invoices.tax import gst_state_code
+
+
+def backfill_interstate(apps, schema_editor):
+    # Rows taxed with IGST were stored as inter-state. Rows without tax (all lines at 0%) carry no amount to tell
+    # by, so they follow the buyer's and seller's current state codes.
+    InvoiceTaxSummary = apps.get_model('invoices', 'InvoiceTaxSummary')
+    Pharmacy = apps.get_model('pharmacies', 'Pharmacy')
+    company = apps.get_model('invoices', 'CompanyProfile').objects.first()
+    InvoiceTaxSummary.objects.exclude(igst_amount=0).update(interstate=True)
+    seller = gst_state_code(company.gst_number if company else None)
+    if seller:
+        other_state = [
+            pk for pk, gst_number in Pharmacy.objects.values_list('pk', 'gst_number')
+            if gst_state_code(gst_number) not in (None, seller)
+        ]
+        InvoiceTaxSummary.objects.filter(tax_amount=0, invoice__order__pharmacy__in=other_state).update(interstate=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0005_indexes'),
+        ('pharmacies', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoicetaxsummary',
+            name='interstate',
+            field=models.BooleanField(default=False, help_text='Taxed as an inter-state supply (IGST) when stored'),
+        ),
+        migrations.RunPython(backfill_interstate, migrations.RunPython.noop),
+    ]
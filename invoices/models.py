@@ -1,5 +1,5 @@
 from django.db import models
-from orders.models import Order
+from orders.models import BusinessDateMixin, Order
 import datetime
 
 
@@ -21,11 +21,16 @@ class CompanyProfile(models.Model):
         return self.company_name or 'Company'
 
 
-class Invoice(models.Model):
+class Invoice(BusinessDateMixin, models.Model):
     order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='invoice')
     invoice_number = models.CharField(max_length=30, unique=True, editable=False)
     pdf_file = models.FileField(upload_to='invoices/', blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    business_date = models.DateField(db_index=True, editable=False, help_text='Local date of created_at')
+
+    class Meta:
+        # Invoice lists are keyset-paginated on (created_at, id)
+        indexes = [models.Index(fields=['created_at', 'id'], name='invoices_invoice_created_idx')]
 
     def save(self, *args, **kwargs):
         if not self.invoice_number:
@@ -44,3 +49,24 @@ class Invoice(models.Model):
 
     def __str__(self):
         return self.invoice_number
+
+
+class InvoiceTaxSummary(models.Model):
+    """Stored per-rate GST breakup of a bill: overall bill when dispatch is null, else one dispatch-wise bill."""
+    invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name='tax_summaries')
+    dispatch = models.ForeignKey('orders.Dispatch', on_delete=models.CASCADE, null=True, blank=True, related_name='tax_summaries')
+    gst_rate = models.DecimalField(max_digits=5, decimal_places=2)
+    taxable_value = models.DecimalField(max_digits=12, decimal_places=2)
+    cgst_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    sgst_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    igst_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    tax_amount = models.DecimalField(max_digits=12, decimal_places=2)
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2)
+    interstate = models.BooleanField(default=False, help_text='Taxed as an inter-state supply (IGST) when stored')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['gst_rate']
+
+    def __str__(self):
+        return f"{self.invoice.invoice_number} @ {self.gst_rate}%"
@@ -0,0 +1,103 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Q
+from django.template.loader import get_template
+from django.utils.functional import cached_property
+
+from orders.models import Order
+from .models import CompanyProfile
+from .services import build_bill_lines, bill_tax_summary
+
+INVOICE_TEMPLATE = 'invoices/invoice_template.html'
+STATEMENT_TEMPLATE = 'invoices/statement_template.html'
+
+
+class LazyBill:
+    """Bill lines, total and tax summary built on first access, so a cached line-table fragment skips the queries."""
+
+    def __init__(self, invoice, bill_type='overall', dispatch_id=None, dispatch_date=None):
+        self.invoice = invoice
+        self.bill_type = bill_type
+        self.dispatch_id = dispatch_id
+        self.dispatch_date = dispatch_date
+
+    @cached_property
+    def _built(self):
+        return build_bill_lines(
+            self.invoice.order, bill_type=self.bill_type, dispatch_id=self.dispatch_id, dispatch_date=self.dispatch_date
+        )
+
+    @property
+    def lines(self):
+        return self._built['lines']
+
+    @property
+    def total(self):
+        return self._built['total']
+
+    @cached_property
+    def tax_summary(self):
+        return bill_tax_summary(self.invoice, self._built, bill_type=self.bill_type, dispatch_id=self.dispatch_id)
+
+
+def lines_version(order):
+    """Changes whenever the bill's lines can change: items added/replaced/voided or stock allocated. One query."""
+    agg = Order.objects.filter(pk=order.pk).aggregate(
+        last_item=Max('items__id'),
+        active_items=Count('items', filter=Q(items__is_void=False), distinct=True),
+        allocations=Count('items__allocations'),
+        last_allocation=Max('items__allocations__id'),
+    )
+    return f"{agg['last_item']}.{agg['active_items']}.{agg['allocations']}.{agg['last_allocation']}.{order.total_amount}.{int(order.is_void)}"
+
+
+def company_version(company):
+    return f"{company.pk}.{company.updated_at.timestamp()}" if company else 'none'
+
+
+def render_invoice_html(invoice, bill_type='overall', dispatch_id=None, dispatch_date=None, company=None):
+    """
+    Rendered bill HTML, cached per invoice/bill/version. Shared by the HTML preview and the PDF download.
+    The template also caches the company header and the line table as fragments (see invoice_template.html).
+    """
+    if company is None:
+        company = CompanyProfile.objects.first()
+    order = invoice.order
+    versions = {
+        'lines_version': lines_version(order),
+        'company_version': company_version(company),
+    }
+    bill_key = f"{bill_type}:{dispatch_id or ''}:{dispatch_date or ''}" if bill_type == 'dispatch' else 'overall'
+    key = 'invoice_html:{}:{}:{}:{}:{}'.format(
+        invoice.pk, bill_key, versions['lines_version'], versions['company_version'], order.updated_at.timestamp()
+    )
+    html = cache.get(key)
+    if html is None:
+        context = {
+            'invoice': invoice,
+            'company': company,
+            'bill_type': bill_type,
+            'bill_key': bill_key,
+            'bill': LazyBill(invoice, bill_type=bill_type, dispatch_id=dispatch_id, dispatch_date=dispatch_date),
+            'fragment_timeout': settings.INVOICE_HTML_CACHE_TIMEOUT,
+            **versions,
+        }
+        html = get_template(INVOICE_TEMPLATE).render(context)
+        cache.set(key, html, settings.INVOICE_HTML_CACHE_TIMEOUT)
+    return html
+
+
+def render_statement_html(pharmacy, statement, company=None):
+    """
+    Statement of account HTML for the PDF download: the bills' styles and (cached) company header around
+    statement, a dict of start_date, end_date, opening/closing balance, debit/credit totals and rows.
+    """
+    if company is None:
+        company = CompanyProfile.objects.first()
+    return get_template(STATEMENT_TEMPLATE).render({
+        'pharmacy': pharmacy,
+        'statement': statement,
+        'company': company,
+        'company_version': company_version(company),
+        'fragment_timeout': settings.INVOICE_HTML_CACHE_TIMEOUT,
+    })
@@ -1,13 +1,36 @@
 from rest_framework import serializers
 from .models import Invoice, CompanyProfile
 from orders.serializers import OrderSerializer
+from .services import summary_from_rows
 
 class InvoiceSerializer(serializers.ModelSerializer):
     order = OrderSerializer(read_only=True)
+    tax_summary = serializers.SerializerMethodField()
 
     class Meta:
         model = Invoice
-        fields = ('id', 'invoice_number', 'order', 'pdf_file', 'created_at')
+        fields = ('id', 'invoice_number', 'order', 'tax_summary', 'pdf_file', 'created_at')
+
+    def get_tax_summary(self, obj):
+        """Stored overall-bill GST summary (prefetch tax_summaries to avoid a query per invoice)."""
+        rows = [r for r in obj.tax_summaries.all() if r.dispatch_id is None]
+        return summary_from_rows(rows) if rows else None
+
+
+class InvoiceListSerializer(serializers.Serializer):
+    """Compact invoice row for list pages; reads the values() rows built in InvoiceViewSet.get_queryset."""
+    id = serializers.IntegerField()
+    invoice_number = serializers.CharField()
+    created_at = serializers.DateTimeField()
+    order_id = serializers.IntegerField()
+    order_number = serializers.CharField()
+    order_status = serializers.CharField()
+    payment_status = serializers.CharField()
+    pharmacy_id = serializers.IntegerField()
+    pharmacy_name = serializers.CharField()
+    total_amount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    paid_amount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    is_void = serializers.BooleanField()
 
 
 class CompanyProfileSerializer(serializers.ModelSerializer):
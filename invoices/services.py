@@ -0,0 +1,182 @@
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Subquery
+
+from orders.models import OrderItem, OrderItemAllocation
+from .models import CompanyProfile, InvoiceTaxSummary
+from .tax import AMOUNT_FIELDS, compute_tax_summary, is_interstate, summarize_rows
+
+
+def build_dispatch_lines(order, dispatch_id=None, dispatch_date=None):
+    """
+    Dispatched line rows and bill total, fetched with one joined query over allocations.
+    If dispatch_id is set, only that dispatch; else if dispatch_date (YYYY-MM-DD) is set, allocations from that date (legacy).
+    """
+    qs = OrderItemAllocation.objects.filter(order_item__order=order, order_item__is_void=False)
+    if dispatch_id is not None:
+        qs = qs.filter(dispatch_id=dispatch_id)
+    elif dispatch_date:
+        try:
+            qs = qs.filter(business_date=datetime.strptime(dispatch_date, '%Y-%m-%d').date())
+        except (ValueError, TypeError):
+            pass
+    rows = qs.order_by('order_item_id', 'id').values(
+        'quantity',
+        'order_item__unit_price',
+        'order_item__gst_rate',
+        'order_item__product__name',
+        'order_item__product__mrp',
+        'stock_batch__batch_number',
+        'stock_batch__expiry_date',
+    )
+    lines = [
+        {
+            'product_name': r['order_item__product__name'],
+            'mrp': r['order_item__product__mrp'],
+            'batch_number': r['stock_batch__batch_number'],
+            'expiry_date': r['stock_batch__expiry_date'],
+            'quantity': r['quantity'],
+            'free_qty': 0,
+            'unit_price': r['order_item__unit_price'],
+            'gst_rate': r['order_item__gst_rate'],
+            'total_price': r['quantity'] * r['order_item__unit_price'],
+        }
+        for r in rows
+    ]
+    return {'lines': lines, 'total': sum((l['total_price'] for l in lines), Decimal('0'))}
+
+
+def build_order_lines(order):
+    """Ordered (non-void) line rows and total for the overall bill; first allocated batch shown per line. One query."""
+    first_alloc = OrderItemAllocation.objects.filter(order_item=OuterRef('pk')).order_by('id')
+    rows = OrderItem.objects.filter(order=order, is_void=False).order_by('id').annotate(
+        first_batch_number=Subquery(first_alloc.values('stock_batch__batch_number')[:1]),
+        first_expiry_date=Subquery(first_alloc.values('stock_batch__expiry_date')[:1]),
+    ).values(
+        'quantity', 'free_qty', 'unit_price', 'gst_rate', 'total_price',
+        'product__name', 'product__mrp', 'first_batch_number', 'first_expiry_date',
+    )
+    lines = [
+        {
+            'product_name': r['product__name'],
+            'mrp': r['product__mrp'],
+            'batch_number': r['first_batch_number'],
+            'expiry_date': r['first_expiry_date'],
+            'quantity': r['quantity'],
+            'free_qty': r['free_qty'],
+            'unit_price': r['unit_price'],
+            'gst_rate': r['gst_rate'],
+            'total_price': r['total_price'],
+        }
+        for r in rows
+    ]
+    return {'lines': lines, 'total': sum((l['total_price'] for l in lines), Decimal('0'))}
+
+
+def build_bill_lines(order, bill_type='overall', dispatch_id=None, dispatch_date=None):
+    """Lines for either bill type. A dispatch bill with nothing dispatched falls back to the ordered lines (total 0), as before."""
+    if bill_type == 'dispatch':
+        bill = build_dispatch_lines(order, dispatch_id=dispatch_id, dispatch_date=dispatch_date)
+        if bill['lines']:
+            return bill
+        overall = build_order_lines(order)
+        overall['total'] = Decimal('0')
+        return overall
+    return build_order_lines(order)
+
+
+def _interstate(order, company=None):
+    return is_interstate(company or CompanyProfile.objects.first(), order.pharmacy)
+
+
+def summary_from_rows(rows):
+    """Tax summary dict (same shape as invoices.tax.compute_tax_summary) from stored InvoiceTaxSummary rows."""
+    rates = [dict({f: getattr(r, f) for f in AMOUNT_FIELDS}, gst_rate=r.gst_rate) for r in rows]
+    return summarize_rows(rates, interstate=any(r.interstate for r in rows))
+
+
+def _summary_rows(invoice, dispatch_id=None):
+    if dispatch_id is None:
+        return invoice.tax_summaries.filter(dispatch__isnull=True)
+    return invoice.tax_summaries.filter(dispatch_id=dispatch_id)
+
+
+def _compute_bill_summary(invoice, dispatch_id=None, lines=None, company=None):
+    if lines is None:
+        if dispatch_id is None:
+            lines = build_order_lines(invoice.order)['lines']
+        else:
+            lines = build_dispatch_lines(invoice.order, dispatch_id=dispatch_id)['lines']
+    return compute_tax_summary(lines, interstate=_interstate(invoice.order, company))
+
+
+def store_tax_summary(invoice, dispatch_id=None, lines=None, company=None):
+    """
+    (Re)compute and persist the tax summary of the overall bill, or of one dispatch bill.
+    Pass company (the CompanyProfile) when storing many, so it is loaded once.
+    """
+    summary = _compute_bill_summary(invoice, dispatch_id=dispatch_id, lines=lines, company=company)
+    with transaction.atomic():
+        _summary_rows(invoice, dispatch_id).delete()
+        InvoiceTaxSummary.objects.bulk_create([
+            InvoiceTaxSummary(invoice=invoice, dispatch_id=dispatch_id, interstate=summary['interstate'], **row)
+            for row in summary['rates']
+        ])
+    return summary
+
+
+def get_tax_summary(invoice, dispatch_id=None, lines=None):
+    """
+    Stored tax summary for a bill. A bill without stored rows (older than stored summaries, or without lines) is
+    computed without storing it: reads never write; the write paths and backfill_tax_summaries store summaries.
+    """
+    rows = list(_summary_rows(invoice, dispatch_id))
+    if rows:
+        return summary_from_rows(rows)
+    return _compute_bill_summary(invoice, dispatch_id=dispatch_id, lines=lines)
+
+
+def refresh_tax_summaries(order):
+    """
+    Rebuild the stored summaries of an order's bills after its lines or buyer change (edit/void), so the sales
+    register, which reads only stored rows, stays current. No-op before the order is invoiced.
+    """
+    invoice = getattr(order, 'invoice', None)
+    if invoice is None:
+        return
+    company = CompanyProfile.objects.first()
+    with transaction.atomic():
+        InvoiceTaxSummary.objects.filter(invoice=invoice).delete()
+        store_tax_summary(invoice, company=company)
+        for dispatch_id in order.dispatches.values_list('id', flat=True):
+            store_tax_summary(invoice, dispatch_id=dispatch_id, company=company)
+
+
+def bill_tax_summary(invoice, bill, bill_type='overall', dispatch_id=None):
+    """Tax summary for a built bill. Legacy date-filtered dispatch bills are computed, not stored."""
+    if bill_type == 'dispatch' and bill['total']:
+        if dispatch_id is None:
+            return compute_tax_summary(bill['lines'], interstate=_interstate(invoice.order))
+        return get_tax_summary(invoice, dispatch_id=dispatch_id, lines=bill['lines'])
+    return get_tax_summary(invoice, lines=bill['lines'])
+
+
+def ensure_tax_summaries(invoices, dispatches):
+    """
+    Store summaries for bills in the given querysets that have none yet (bills older than stored summaries).
+    Run by the backfill_tax_summaries command; returns the number of bills stored.
+    """
+    company = CompanyProfile.objects.first()
+    stored = 0
+    overall = InvoiceTaxSummary.objects.filter(invoice=OuterRef('pk'), dispatch__isnull=True)
+    for invoice in invoices.filter(~Exists(overall)).select_related('order__pharmacy').iterator(chunk_size=500):
+        store_tax_summary(invoice, company=company)
+        stored += 1
+    per_dispatch = InvoiceTaxSummary.objects.filter(dispatch=OuterRef('pk'))
+    pending = dispatches.filter(~Exists(per_dispatch), order__invoice__isnull=False).select_related('order__invoice', 'order__pharmacy')
+    for dispatch in pending.iterator(chunk_size=500):
+        store_tax_summary(dispatch.order.invoice, dispatch_id=dispatch.id, company=company)
+        stored += 1
+    return stored
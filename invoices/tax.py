@@ -0,0 +1,68 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+PAISE = Decimal('0.01')
+AMOUNT_FIELDS = ('taxable_value', 'cgst_amount', 'sgst_amount', 'igst_amount', 'tax_amount', 'total_amount')
+
+
+def round_amount(value):
+    return Decimal(value).quantize(PAISE, rounding=ROUND_HALF_UP)
+
+
+def gst_state_code(gst_number):
+    """First two characters of a GSTIN are the state code; None if missing/malformed."""
+    code = (gst_number or '').strip()[:2]
+    return code if len(code) == 2 and code.isdigit() else None
+
+
+def is_interstate(company, pharmacy):
+    """Inter-state supply when both GSTINs are known and their state codes differ."""
+    seller = gst_state_code(getattr(company, 'gst_number', None))
+    buyer = gst_state_code(getattr(pharmacy, 'gst_number', None))
+    return bool(seller and buyer and seller != buyer)
+
+
+def rate_row(gst_rate, total, interstate=False):
+    """Tax split for one rate given the inclusive total billed at that rate."""
+    total = round_amount(total)
+    rate = Decimal(gst_rate or 0)
+    taxable = round_amount(total * 100 / (100 + rate)) if rate > 0 else total
+    tax = total - taxable
+    if interstate:
+        cgst = sgst = Decimal('0.00')
+        igst = tax
+    else:
+        cgst = round_amount(tax / 2)
+        sgst = tax - cgst
+        igst = Decimal('0.00')
+    return {
+        'gst_rate': rate,
+        'taxable_value': taxable,
+        'cgst_amount': cgst,
+        'sgst_amount': sgst,
+        'igst_amount': igst,
+        'tax_amount': tax,
+        'total_amount': total,
+    }
+
+
+def summarize_rows(rows, interstate=False):
+    """Wrap per-rate rows with bill-level totals."""
+    summary = {'interstate': interstate, 'rates': rows}
+    for field in AMOUNT_FIELDS:
+        summary[field] = sum((r[field] for r in rows), Decimal('0.00'))
+    return summary
+
+
+def compute_tax_summary(lines, interstate=False):
+    """
+    Grouped tax summary for bill lines (dicts with 'gst_rate' and GST-inclusive 'total_price').
+    Lines are summed per rate in one pass; taxable value and tax are then rounded once per rate,
+    so the rate rows always add up to the bill total. Intra-state: CGST + SGST (SGST takes the
+    odd paisa); inter-state: IGST.
+    """
+    totals = {}
+    for line in lines:
+        rate = Decimal(line['gst_rate'] or 0)
+        totals[rate] = totals.get(rate, Decimal('0')) + line['total_price']
+    rows = [rate_row(rate, totals[rate], interstate) for rate in sorted(totals)]
+    return summarize_rows(rows, interstate)
@@ -1,3 +1,193 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase
+
+from orders.models import OrderItem
+from orders.testing import OrderFlowMixin
+from .models import CompanyProfile, Invoice, InvoiceTaxSummary
+from .services import build_dispatch_lines, build_order_lines, get_tax_summary, store_tax_summary
+from .tax import compute_tax_summary, gst_state_code, is_interstate, rate_row
+
+
+class BillLinesTests(OrderFlowMixin, TestCase):
+    """Bill lines and totals for both bill types, each built with one query."""
+
+    def setUp(self):
+        super().setUp()
+        self.order = self.place_order()
+        self.approve(self.order)
+        self.dispatch(self.order, {self.gloves.id: 3})
+        self.dispatch(self.order, {self.gloves.id: 1, self.masks.id: 2})
+        self.first, self.second = self.order.dispatches.order_by('id')
+
+    def test_order_lines(self):
+        with self.assertNumQueries(1):
+            bill = build_order_lines(self.order)
+        self.assertEqual([(line['product_name'], line['quantity'], line['batch_number']) for line in bill['lines']],
+                         [('Gloves', 4, 'B1'), ('Masks', 2, 'B1')])
+        self.assertEqual(bill['total'], Decimal('50'))
+
+    def test_dispatch_lines(self):
+        with self.assertNumQueries(1):
+            bill = build_dispatch_lines(self.order, dispatch_id=self.second.id)
+        self.assertEqual([(line['product_name'], line['quantity']) for line in bill['lines']], [('Gloves', 1), ('Masks', 2)])
+        self.assertEqual(bill['total'], Decimal('20'))
+
+    def test_voided_lines_left_out(self):
+        self.void_item(self.order, self.masks)
+        self.assertEqual(build_order_lines(self.order)['total'], Decimal('40'))
+        self.assertEqual(build_dispatch_lines(self.order, dispatch_id=self.second.id)['total'], Decimal('10'))
+
+    def test_lines_endpoint(self):
+        invoice = self.order.invoice
+        response = self.client.get(f'/api/invoices/{invoice.id}/lines/', {'bill_type': 'dispatch', 'dispatch_id': self.first.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(line['product_name'], line['quantity']) for line in response.data['lines']], [('Gloves', 3)])
+        self.assertEqual(response.data['total'], Decimal('30'))
+        # A dispatch_id that is not one of the order's dispatches is ignored: every dispatched line
+        response = self.client.get(f'/api/invoices/{invoice.id}/lines/', {'bill_type': 'dispatch', 'dispatch_id': 999})
+        self.assertEqual(len(response.data['lines']), 3)
+        self.assertEqual(response.data['total'], Decimal('50'))
+
+
+class TaxEngineTests(SimpleTestCase):
+    """Per-rate GST split of GST-inclusive totals, rounded to the paisa."""
+
+    def test_intra_state_split(self):
+        row = rate_row(Decimal('12'), Decimal('100'))
+        self.assertEqual(row['taxable_value'], Decimal('89.29'))
+        self.assertEqual(row['tax_amount'], Decimal('10.71'))
+        self.assertEqual((row['cgst_amount'], row['sgst_amount'], row['igst_amount']), (Decimal('5.36'), Decimal('5.35'), Decimal('0.00')))
+
+    def test_inter_state_split(self):
+        row = rate_row(Decimal('12'), Decimal('100'), interstate=True)
+        self.assertEqual((row['cgst_amount'], row['sgst_amount'], row['igst_amount']), (Decimal('0.00'), Decimal('0.00'), Decimal('10.71')))
+
+    def test_zero_rate_is_all_taxable(self):
+        row = rate_row(Decimal('0'), Decimal('45.5'))
+        self.assertEqual((row['taxable_value'], row['tax_amount']), (Decimal('45.50'), Decimal('0.00')))
+
+    def test_rounded_once_per_rate(self):
+        lines = [{'gst_rate': 12, 'total_price': Decimal('33.33')}] * 3 + [{'gst_rate': 5, 'total_price': Decimal('10.01')}]
+        summary = compute_tax_summary(lines)
+        self.assertEqual([r['gst_rate'] for r in summary['rates']], [Decimal('5'), Decimal('12')])
+        self.assertEqual(summary['rates'][1]['taxable_value'], Decimal('89.28'))
+        self.assertEqual(summary['total_amount'], Decimal('110.00'))
+        self.assertEqual(summary['taxable_value'] + summary['tax_amount'], summary['total_amount'])
+        self.assertEqual(summary['cgst_amount'] + summary['sgst_amount'], summary['tax_amount'])
+
+    def test_gstin_state_code(self):
+        self.assertEqual(gst_state_code(' 29ABCDE1234F1Z5'), '29')
+        self.assertIsNone(gst_state_code(''))
+        self.assertIsNone(gst_state_code('KA-1234'))
+        seller = CompanyProfile(gst_number='29ABCDE1234F1Z5')
+        self.assertFalse(is_interstate(seller, CompanyProfile(gst_number='29XYZAB1234F1Z5')))
+        self.assertTrue(is_interstate(seller, CompanyProfile(gst_number='07XYZAB1234F1Z5')))
+        self.assertFalse(is_interstate(seller, CompanyProfile(gst_number='')))
+        self.assertFalse(is_interstate(None, CompanyProfile(gst_number='07XYZAB1234F1Z5')))
+
+
+class TaxSummaryStorageTests(OrderFlowMixin, TestCase):
+    """Bill summaries are stored by the write paths; reads compute a missing one without storing it."""
+
+    def setUp(self):
+        super().setUp()
+        self.order = self.place_order()
+        self.approve(self.order)
+        self.invoice = self.order.invoice
+
+    def test_reads_do_not_store(self):
+        stored = get_tax_summary(self.invoice)
+        InvoiceTaxSummary.objects.all().delete()
+        for view in ('lines', 'preview'):
+            response = self.client.get(f'/api/invoices/{self.invoice.id}/{view}/')
+            self.assertEqual(response.status_code, 200)
+        self.assertFalse(InvoiceTaxSummary.objects.exists())
+        self.assertEqual(get_tax_summary(self.invoice), stored)
+
+    def test_zero_rated_inter_state_bill(self):
+        CompanyProfile.objects.create(company_name='Distributor', gst_number='07CCCCC0000C1Z5')
+        OrderItem.objects.filter(order=self.order).update(gst_rate=0)
+        store_tax_summary(self.invoice)
+        summary = get_tax_summary(self.invoice)
+        self.assertTrue(summary['interstate'])
+        self.assertEqual(summary['igst_amount'], Decimal('0.00'))
+
+
+class InvoiceListTests(OrderFlowMixin, TestCase):
+    """The invoice list serves compact keyset-paginated rows; ?expand=order nests the order."""
+
+    def setUp(self):
+        super().setUp()
+        self.invoices = []
+        for pharmacy in (self.pharmacy, self.other, self.pharmacy):
+            order = self.place_order(pharmacy=pharmacy)
+            self.approve(order)
+            self.invoices.append(order.invoice)
+
+    def test_compact_rows_by_page(self):
+        url, params, seen = '/api/invoices/', {'page_size': 2}, []
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            seen += response.data['results']
+            url, params = response.data['next'], None
+        self.assertEqual([r['id'] for r in seen], [i.id for i in reversed(self.invoices)])
+        self.assertEqual(set(seen[0]), {
+            'id', 'invoice_number', 'created_at', 'order_id', 'order_number', 'order_status', 'payment_status',
+            'pharmacy_id', 'pharmacy_name', 'total_amount', 'paid_amount', 'is_void',
+        })
+        self.assertEqual((seen[0]['pharmacy_name'], seen[0]['total_amount']), ('Store 0', '50.00'))
+
+    def test_expand_order(self):
+        response = self.client.get('/api/invoices/', {'expand': 'order'})
+        self.assertEqual(response.status_code, 200)
+        row = response.data['results'][0]
+        self.assertEqual(len(row['order']['items']), 2)
+        self.assertEqual(row['tax_summary']['total_amount'], Decimal('50.00'))
+
+    def test_pharmacy_sees_own_invoices(self):
+        response = self.client_for_pharmacy().get('/api/invoices/')
+        self.assertEqual(sorted(r['id'] for r in response.data['results']), [self.invoices[0].id, self.invoices[2].id])
+
+
+class InvoicePreviewTests(OrderFlowMixin, TestCase):
+    """The bill HTML is rendered once per invoice, bill and version and shared by the preview and the PDF."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        super().setUp()
+        cache.clear()
+        self.company = CompanyProfile.objects.create(company_name='Acme Distributors', gst_number='29CCCCC0000C1Z5')
+        self.order = self.place_order()
+        self.approve(self.order)
+        self.invoice = Invoice.objects.select_related('order').get(order=self.order)
+
+    def preview(self):
+        response = self.client.get(f'/api/invoices/{self.invoice.id}/preview/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/html; charset=utf-8')
+        return response.content.decode()
+
+    def test_cached_until_lines_change(self):
+        from .rendering import render_invoice_html
+        html = self.preview()
+        self.assertIn(self.invoice.invoice_number, html)
+        self.assertIn('Masks', html)
+        # A hit costs the company row and the one-query lines version
+        with self.assertNumQueries(2):
+            self.assertEqual(render_invoice_html(self.invoice), html)
+        self.void_item(self.order, self.masks)
+        self.assertNotIn('Masks', self.preview())
+
+    def test_company_change_renders_new_header(self):
+        self.assertIn('Acme Distributors', self.preview())
+        self.company.company_name = 'Acme Pharma'
+        self.company.save()
+        self.assertIn('Acme Pharma', self.preview())
+
+    def test_download(self):
+        response = self.client.get(f'/api/invoices/{self.invoice.id}/download/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn(f'invoice_{self.invoice.invoice_number}_overall.pdf', response['Content-Disposition'])
@@ -1,23 +1,58 @@
 import os
 from django.conf import settings
 from django.http import HttpResponse
-from django.template.loader import get_template
 from rest_framework import viewsets, permissions, status
+from django.db.models import F
 from rest_framework.decorators import action
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 from weasyprint import HTML
 from accounts.permissions import IsAdminUser
 from .models import Invoice, CompanyProfile
-from .serializers import InvoiceSerializer, CompanyProfileSerializer
+from .serializers import InvoiceSerializer, InvoiceListSerializer, CompanyProfileSerializer
+from .services import build_bill_lines, bill_tax_summary
+from .rendering import render_invoice_html
+
+class InvoiceCursorPagination(CursorPagination):
+    """Keyset pagination on (created_at, id): constant cost per page at any depth."""
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
 
 class InvoiceViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = InvoiceSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = InvoiceCursorPagination
+
+    def _compact_list(self):
+        """List serves compact rows unless ?expand=order asks for the nested order."""
+        return self.action == 'list' and self.request.query_params.get('expand') != 'order'
+
+    def get_serializer_class(self):
+        if self._compact_list():
+            return InvoiceListSerializer
+        return InvoiceSerializer
 
     def get_queryset(self):
-        qs = Invoice.objects.select_related('order', 'order__pharmacy').prefetch_related(
-            'order__items', 'order__items__product', 'order__items__allocations', 'order__items__allocations__stock_batch'
-        ).order_by('-created_at')
+        qs = Invoice.objects.select_related('order', 'order__pharmacy').order_by('-created_at', '-id')
+        if self._compact_list():
+            qs = Invoice.objects.order_by('-created_at', '-id').values(
+                'id', 'invoice_number', 'created_at', 'order_id',
+                order_number=F('order__order_number'),
+                order_status=F('order__status'),
+                payment_status=F('order__payment_status'),
+                pharmacy_id=F('order__pharmacy_id'),
+                pharmacy_name=F('order__pharmacy__pharmacy_name'),
+                total_amount=F('order__total_amount'),
+                paid_amount=F('order__paid_amount'),
+                is_void=F('order__is_void'),
+            )
+        elif self.action in ('list', 'retrieve'):
+            # Bills and line JSON use invoices.services; only the nested order serializer needs these.
+            qs = qs.prefetch_related(
+                'tax_summaries', 'order__items', 'order__items__product', 'order__items__allocations', 'order__items__allocations__stock_batch'
+            )
         user = self.request.user
         if user.role != 'admin':
             qs = qs.filter(order__pharmacy=user.pharmacy)
@@ -26,91 +61,48 @@ class InvoiceViewSet(viewsets.ReadOnlyModelViewSet):
             qs = qs.filter(order_id=order_id)
         return qs
 
-    def _get_company(self):
-        return CompanyProfile.objects.first()
+    def _dispatch_id_param(self, order, dispatch_id):
+        """Validate dispatch_id query param against the order's dispatches; None if invalid."""
+        if not dispatch_id:
+            return None
+        try:
+            dispatch_id = int(dispatch_id)
+        except (ValueError, TypeError):
+            return None
+        if not order.dispatches.filter(pk=dispatch_id).exists():
+            return None
+        return dispatch_id
 
-    def _build_dispatch_lines(self, order, dispatch_id=None, dispatch_date=None):
-        """Build list of dispatched line rows. If dispatch_id is set, only that dispatch; else if dispatch_date (YYYY-MM-DD) is set, allocations from that date (legacy)."""
-        from datetime import datetime
-        lines = []
-        date_filter = None
-        if dispatch_date:
-            try:
-                date_filter = datetime.strptime(dispatch_date, '%Y-%m-%d').date()
-            except (ValueError, TypeError):
-                pass
-        for item in order.items.filter(is_void=False):
-            qs = item.allocations.select_related('stock_batch').all()
-            if dispatch_id is not None:
-                qs = qs.filter(dispatch_id=dispatch_id)
-            elif date_filter:
-                qs = qs.filter(created_at__date=date_filter)
-            for alloc in qs:
-                batch = alloc.stock_batch
-                lines.append({
-                    'product_name': item.product.name,
-                    'mrp': item.product.mrp,
-                    'batch_number': batch.batch_number,
-                    'expiry_date': batch.expiry_date,
-                    'quantity': alloc.quantity,
-                    'free_qty': 0,
-                    'unit_price': item.unit_price,
-                    'gst_rate': item.gst_rate,
-                    'total_price': alloc.quantity * item.unit_price,
-                })
-        return lines
+    def _bill_params(self, request, order):
+        """bill_type ('overall' | 'dispatch'), validated dispatch_id (per-dispatch bill) and legacy dispatch_date (YYYY-MM-DD)."""
+        bill_type = request.query_params.get('bill_type', 'overall')
+        dispatch_id = None
+        if bill_type == 'dispatch':
+            dispatch_id = self._dispatch_id_param(order, request.query_params.get('dispatch_id'))
+        return bill_type, dispatch_id, request.query_params.get('dispatch_date')
 
     @action(detail=True, methods=['get'])
-    def download(self, request, pk=None):
+    def lines(self, request, pk=None):
+        """Bill lines, total and stored per-rate GST summary (same rows the PDF renders)."""
         invoice = self.get_object()
-        bill_type = request.query_params.get('bill_type', 'overall')  # 'overall' | 'dispatch'
-        dispatch_id = request.query_params.get('dispatch_id')  # optional: specific Dispatch id for per-dispatch bill
-        dispatch_date = request.query_params.get('dispatch_date')  # optional YYYY-MM-DD (legacy, when no dispatch_id)
-        company = self._get_company()
-        order = invoice.order
-        if bill_type == 'dispatch':
-            if dispatch_id:
-                try:
-                    dispatch_id = int(dispatch_id)
-                    if not order.dispatches.filter(pk=dispatch_id).exists():
-                        dispatch_id = None
-                except (ValueError, TypeError):
-                    dispatch_id = None
-            dispatched_lines = self._build_dispatch_lines(order, dispatch_id=dispatch_id, dispatch_date=dispatch_date)
-        else:
-            dispatched_lines = None
-        from decimal import Decimal
-        dispatch_total = sum((Decimal(str(d['total_price'])) for d in (dispatched_lines or [])), Decimal('0'))
-
-        def gst_amount_from_line(total_price, gst_rate):
-            """Given inclusive total and gst_rate %, return GST amount. total = base + base*rate/100 => base = total/(1+rate/100), gst = total - base."""
-            total = Decimal(str(total_price))
-            rate = Decimal(str(gst_rate or 0)) / Decimal('100')
-            if rate <= 0:
-                return Decimal('0')
-            base = total / (1 + rate)
-            return total - base
+        bill_type, dispatch_id, dispatch_date = self._bill_params(request, invoice.order)
+        bill = build_bill_lines(invoice.order, bill_type=bill_type, dispatch_id=dispatch_id, dispatch_date=dispatch_date)
+        bill['tax_summary'] = bill_tax_summary(invoice, bill, bill_type=bill_type, dispatch_id=dispatch_id)
+        return Response(bill)
 
-        if bill_type == 'dispatch' and dispatched_lines:
-            gst_total = sum(
-                gst_amount_from_line(d['total_price'], d.get('gst_rate'))
-                for d in dispatched_lines
-            )
-        else:
-            gst_total = Decimal('0')
-            for item in order.items.filter(is_void=False):
-                gst_total += gst_amount_from_line(item.total_price, item.gst_rate)
+    @action(detail=True, methods=['get'])
+    def preview(self, request, pk=None):
+        """Bill as HTML for on-screen viewing (same params as download)."""
+        invoice = self.get_object()
+        bill_type, dispatch_id, dispatch_date = self._bill_params(request, invoice.order)
+        html_content = render_invoice_html(invoice, bill_type=bill_type, dispatch_id=dispatch_id, dispatch_date=dispatch_date)
+        return HttpResponse(html_content, content_type='text/html; charset=utf-8')
 
-        template = get_template('invoices/invoice_template.html')
-        context = {
-            'invoice': invoice,
-            'company': company,
-            'bill_type': bill_type,
-            'dispatched_lines': dispatched_lines,
-            'dispatch_total': dispatch_total,
-            'gst_total': gst_total,
-        }
-        html_content = template.render(context)
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        invoice = self.get_object()
+        bill_type, dispatch_id, dispatch_date = self._bill_params(request, invoice.order)
+        html_content = render_invoice_html(invoice, bill_type=bill_type, dispatch_id=dispatch_id, dispatch_date=dispatch_date)
 
         pdf_file = HTML(string=html_content, base_url=request.build_absolute_uri()).write_pdf()
         suffix = '_dispatch' if bill_type == 'dispatch' else '_overall'
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Order, OrderItem, OrderItemAllocation, Dispatch
+from .models import Order, OrderItem, OrderItemAllocation, Dispatch, LedgerEntry, LedgerCheckpoint
 
 
 @admin.register(Order)
@@ -22,3 +22,15 @@ class OrderItemAdmin(admin.ModelAdmin):
 class OrderItemAllocationAdmin(admin.ModelAdmin):
     list_display = ('id', 'order_item', 'stock_batch', 'quantity', 'dispatch', 'created_at')
     list_filter = ('dispatch',)
+
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'pharmacy', 'entry_type', 'reference', 'debit', 'credit', 'posted_at')
+    list_filter = ('entry_type', 'pharmacy')
+
+
+@admin.register(LedgerCheckpoint)
+class LedgerCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('pharmacy', 'as_of', 'balance', 'created_at')
+    list_filter = ('as_of',)
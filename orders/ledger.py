@@ -0,0 +1,152 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, Sum, Value, Window
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from reports.aging import ACTIVE_STATUSES
+from reports.dates import day_start, filter_date_range
+from .models import LedgerCheckpoint, LedgerEntry
+
+AMOUNT = DecimalField(max_digits=14, decimal_places=2)
+CENTS = Decimal('0.01')
+
+
+def post(order, entry_type, debit=0, credit=0, reference='', dispatch=None, pharmacy_id=None):
+    """Add one entry to the ledger of the order's pharmacy (or pharmacy_id); zero amounts are not posted."""
+    if not debit and not credit:
+        return None
+    return LedgerEntry.objects.create(
+        pharmacy_id=pharmacy_id or order.pharmacy_id, order=order, dispatch=dispatch,
+        entry_type=entry_type, debit=debit, credit=credit, reference=reference or order.order_number,
+    )
+
+
+def _adjust(order, amount, reference, pharmacy_id=None):
+    """Adjustment entry: a positive amount is debited, a negative one credited."""
+    return post(order, 'adjustment', debit=max(amount, 0), credit=max(-amount, 0), reference=reference, pharmacy_id=pharmacy_id)
+
+
+# Like receivables aging and the account summary, the ledger carries dispatched value only while the order is in
+# ACTIVE_STATUSES: dispatches and voids of other orders are not posted, and moving in or out posts an adjustment.
+
+def post_dispatch(order, value, dispatch=None):
+    if order.status not in ACTIVE_STATUSES:
+        return None
+    reference = f'{order.order_number}/D{dispatch.id}' if dispatch else order.order_number
+    return post(order, 'dispatch', debit=value, reference=reference, dispatch=dispatch)
+
+
+def post_payment(order, amount, reference=''):
+    """Credit a payment; reference is the receipt, cheque or UTR number when given (default: the order number)."""
+    return post(order, 'payment', credit=amount, reference=reference)
+
+
+def post_void(order, value):
+    """Credit dispatched value taken back by voiding lines; value is the (negative) change from void_order_items."""
+    if order.status not in ACTIVE_STATUSES:
+        return None
+    return post(order, 'void', credit=-value)
+
+
+def post_status_change(order, old_status):
+    """Debit the order's dispatched value when it enters the active statuses, credit it when it leaves them."""
+    was_active, is_active = old_status in ACTIVE_STATUSES, order.status in ACTIVE_STATUSES
+    if was_active == is_active:
+        return None
+    value = order.dispatched_amount()
+    return _adjust(order, value if is_active else -value, f'{order.order_number} {old_status} -> {order.status}')
+
+
+def _order_balance(order, status=None):
+    """What the order contributes to its pharmacy's balance: dispatched value while active, less payments."""
+    dispatched = order.dispatched_amount() if (status or order.status) in ACTIVE_STATUSES else Decimal('0')
+    return dispatched - order.paid_amount
+
+
+def post_order_moved(order, old_pharmacy_id, old_status=None):
+    """
+    Move the order's balance from old_pharmacy_id's ledger to its current pharmacy's. When the status changed
+    in the same edit, pass old_status and post the status change afterwards (on the new pharmacy).
+    """
+    if order.pharmacy_id == old_pharmacy_id:
+        return
+    balance = _order_balance(order, old_status)
+    _adjust(order, -balance, f'{order.order_number} moved to another store', pharmacy_id=old_pharmacy_id)
+    _adjust(order, balance, f'{order.order_number} moved from another store')
+
+
+def post_order_deleted(order):
+    """Reverse the balance of an order that is being deleted (call before deleting it)."""
+    return _adjust(order, -_order_balance(order), f'{order.order_number} deleted')
+
+
+def _net(entries):
+    return entries.aggregate(
+        net=Coalesce(Sum(F('debit') - F('credit'), output_field=AMOUNT), Value(Decimal('0')), output_field=AMOUNT)
+    )['net']
+
+
+def balance_before(pharmacy_id, day):
+    """
+    Ledger balance at the start of day (a date): the latest checkpoint before day plus the entries posted
+    between it and day, so an opening balance reads a bounded slice of the ledger rather than all of it.
+    """
+    checkpoint = LedgerCheckpoint.objects.filter(pharmacy_id=pharmacy_id, as_of__lt=day).order_by('-as_of').first()
+    entries = LedgerEntry.objects.filter(pharmacy_id=pharmacy_id, posted_at__lt=day_start(day))
+    if checkpoint is None:
+        return _net(entries)
+    return checkpoint.balance + _net(entries.filter(posted_at__gte=day_start(checkpoint.as_of + timedelta(days=1))))
+
+
+def statement_entries(pharmacy_id, start_d, end_d):
+    """
+    Entries of [start_d, end_d] (dates, inclusive; either may be None) in posting order, with running_total:
+    the cumulative debit - credit within the range (a window function). Add the opening balance for the balance.
+    """
+    entries = filter_date_range(LedgerEntry.objects.filter(pharmacy_id=pharmacy_id), 'posted_at', start_d, end_d)
+    return entries.select_related('order').annotate(
+        running_total=Window(Sum(F('debit') - F('credit'), output_field=AMOUNT), order_by=[F('posted_at').asc(), F('id').asc()]),
+    ).order_by('posted_at', 'id')
+
+
+def write_checkpoints(as_of=None):
+    """Store every pharmacy's closing balance at the end of as_of (default: yesterday). Returns the count."""
+    as_of = as_of or timezone.localdate() - timedelta(days=1)
+    pharmacy_ids = LedgerEntry.objects.filter(posted_at__lt=day_start(as_of + timedelta(days=1))).values_list(
+        'pharmacy_id', flat=True
+    ).distinct().order_by()
+    with transaction.atomic():
+        # Recomputed from the previous checkpoint, not from one already written for as_of
+        LedgerCheckpoint.objects.filter(as_of=as_of).delete()
+        checkpoints = [
+            LedgerCheckpoint(pharmacy_id=pharmacy_id, as_of=as_of, balance=balance_before(pharmacy_id, as_of + timedelta(days=1)))
+            for pharmacy_id in pharmacy_ids
+        ]
+        LedgerCheckpoint.objects.bulk_create(checkpoints, batch_size=1000)
+    return len(checkpoints)
+
+
+def statement(pharmacy_id, start_d, end_d):
+    """
+    Statement of [start_d, end_d]: opening balance and a lazy iterator of entry rows with the running balance,
+    streamed from the database in posting order. start_d None starts from the first entry.
+    """
+    opening = (balance_before(pharmacy_id, start_d) if start_d else Decimal('0')).quantize(CENTS)
+
+    def rows():
+        for entry in statement_entries(pharmacy_id, start_d, end_d).iterator(chunk_size=2000):
+            posted_at = timezone.localtime(entry.posted_at)
+            yield {
+                'date': posted_at.date(),
+                'posted_at': posted_at,
+                'entry_type': entry.entry_type,
+                'reference': entry.reference,
+                'order_number': entry.order.order_number if entry.order else '',
+                'debit': entry.debit,
+                'credit': entry.credit,
+                'balance': (opening + entry.running_total).quantize(CENTS),
+            }
+    return opening, rows()
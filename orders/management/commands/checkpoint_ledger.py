@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.ledger import write_checkpoints
+
+
+class Command(BaseCommand):
+    help = 'Store each pharmacy\'s closing ledger balance for a date (default: yesterday), so statements start from it.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Closing date (YYYY-MM-DD); default yesterday')
+
+    def handle(self, *args, **options):
+        as_of = None
+        if options['date']:
+            try:
+                as_of = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--date must be YYYY-MM-DD.')
+        count = write_checkpoints(as_of)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {count} ledger checkpoints.'))
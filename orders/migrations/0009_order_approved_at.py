@@ -0,0 +1,30 @@
+# Generated by Django 5.2.11 on 2026-10-19 00:33
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_approved_at(apps, schema_editor):
+    # Invoices are generated on approval, so the invoice timestamp is the approval time of existing orders.
+    Order = apps.get_model('orders', 'Order')
+    Invoice = apps.get_model('invoices', 'Invoice')
+    Order.objects.filter(approved_at__isnull=True, invoice__isnull=False).update(
+        approved_at=Subquery(Invoice.objects.filter(order=OuterRef('pk')).values('created_at')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_add_dispatch_model'),
+        ('invoices', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='approved_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_approved_at, migrations.RunPython.noop),
+    ]
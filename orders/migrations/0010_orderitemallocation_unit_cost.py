@@ -0,0 +1,49 @@
+# Generated by Django 5.2.11 on 2026-10-19 00:43
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, Q, Sum
+
+
+def backfill_unit_cost(apps, schema_editor):
+    # Same rule as products.costing.batch_unit_cost: the lot's purchase lines, else the product's, weighted by quantity.
+    OrderItemAllocation = apps.get_model('orders', 'OrderItemAllocation')
+    StockBatch = apps.get_model('products', 'StockBatch')
+    PurchaseItem = apps.get_model('products', 'PurchaseItem')
+    pending = StockBatch.objects.filter(order_allocations__unit_cost__isnull=True).distinct()
+    for batch in pending.iterator():
+        lot = Q(batch_number=batch.batch_number, expiry_date=batch.expiry_date)
+        value = F('quantity') * F('unit_price')
+        totals = PurchaseItem.objects.filter(purchase__status='approved', product_id=batch.product_id).aggregate(
+            lot_value=Sum(value, filter=lot),
+            lot_quantity=Sum('quantity', filter=lot),
+            all_value=Sum(value),
+            all_quantity=Sum('quantity'),
+        )
+        for prefix in ('lot', 'all'):
+            if totals[f'{prefix}_quantity']:
+                cost = (Decimal(totals[f'{prefix}_value']) / totals[f'{prefix}_quantity']).quantize(Decimal('0.0001'))
+                OrderItemAllocation.objects.filter(stock_batch=batch, unit_cost__isnull=True).update(unit_cost=cost)
+                break
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_order_approved_at'),
+        ('products', '0012_remove_product_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitemallocation',
+            name='unit_cost',
+            field=models.DecimalField(blank=True, decimal_places=4, help_text='Landed cost per unit of the batch, snapshotted at dispatch (products.costing.batch_unit_cost). Null = no purchase cost known.', max_digits=14, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='orderitemallocation',
+            index=models.Index(fields=['created_at'], name='orders_alloc_created_idx'),
+        ),
+        migrations.RunPython(backfill_unit_cost, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.11 on 2026-10-19 01:10
+
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+def backfill_business_date(apps, schema_editor):
+    # TruncDate converts in the current time zone (settings.TIME_ZONE), the same day the models compute on save.
+    for model_name, source in (('Order', 'created_at'), ('Dispatch', 'dispatched_at'), ('OrderItemAllocation', 'created_at')):
+        apps.get_model('orders', model_name).objects.filter(business_date__isnull=True).update(business_date=TruncDate(source))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_orderitemallocation_unit_cost'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='business_date',
+            field=models.DateField(editable=False, null=True, help_text='Local date of created_at'),
+        ),
+        migrations.AddField(
+            model_name='dispatch',
+            name='business_date',
+            field=models.DateField(editable=False, null=True, help_text='Local date of dispatched_at'),
+        ),
+        migrations.AddField(
+            model_name='orderitemallocation',
+            name='business_date',
+            field=models.DateField(editable=False, null=True, help_text='Local date of created_at'),
+        ),
+        migrations.RunPython(backfill_business_date, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='order',
+            name='business_date',
+            field=models.DateField(db_index=True, editable=False, help_text='Local date of created_at'),
+        ),
+        migrations.AlterField(
+            model_name='dispatch',
+            name='business_date',
+            field=models.DateField(db_index=True, editable=False, help_text='Local date of dispatched_at'),
+        ),
+        migrations.AlterField(
+            model_name='orderitemallocation',
+            name='business_date',
+            field=models.DateField(db_index=True, editable=False, help_text='Local date of created_at'),
+        ),
+    ]
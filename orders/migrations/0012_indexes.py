@@ -0,0 +1,27 @@
+# Generated by Django 5.2.11 on 2026-10-19 00:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0011_business_date'),
+        ('pharmacies', '0001_initial'),
+        ('products', '0014_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['pharmacy', 'created_at'], name='orders_order_pharmacy_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'is_void'], name='orders_order_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(condition=models.Q(('is_void', False)), fields=['order', 'total_price'], name='orders_item_live_idx'),
+        ),
+    ]
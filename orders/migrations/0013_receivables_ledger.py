@@ -0,0 +1,90 @@
+# Generated by Django 5.2.11 on 2026-10-19 01:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import DecimalField, F, Sum
+
+
+def backfill_ledger(apps, schema_editor):
+    """
+    Debit existing dispatches of approved/processing/shipped/delivered orders at their time (the statuses the
+    ledger carries dispatched value for). Allocations without a dispatch (legacy endpoint) are debited one by one.
+    Voided lines are left out rather than debited and credited back. Payment history was not kept, so each
+    order's paid_amount becomes one credit at the order's last update.
+    """
+    Order = apps.get_model('orders', 'Order')
+    OrderItemAllocation = apps.get_model('orders', 'OrderItemAllocation')
+    LedgerEntry = apps.get_model('orders', 'LedgerEntry')
+    value = F('quantity') * F('order_item__unit_price')
+    amount = DecimalField(max_digits=14, decimal_places=2)
+    order_fields = {'order_id': F('order_item__order_id'), 'pharmacy_id': F('order_item__order__pharmacy_id'), 'order_number': F('order_item__order__order_number')}
+    live = OrderItemAllocation.objects.filter(
+        order_item__is_void=False, order_item__order__status__in=['approved', 'processing', 'shipped', 'delivered']
+    ).order_by()
+    entries = [
+        LedgerEntry(
+            pharmacy_id=r['pharmacy_id'], order_id=r['order_id'], dispatch_id=r['dispatch_id'], entry_type='dispatch',
+            debit=r['value'], reference=f"{r['order_number']}/D{r['dispatch_id']}", posted_at=r['dispatch__dispatched_at'],
+        )
+        for r in live.filter(dispatch__isnull=False).values('dispatch_id', 'dispatch__dispatched_at', **order_fields).annotate(
+            value=Sum(value, output_field=amount)
+        )
+    ]
+    entries += [
+        LedgerEntry(
+            pharmacy_id=r['pharmacy_id'], order_id=r['order_id'], entry_type='dispatch',
+            debit=r['value'], reference=r['order_number'], posted_at=r['created_at'],
+        )
+        for r in live.filter(dispatch__isnull=True).values('created_at', **order_fields, value=value)
+    ]
+    entries += [
+        LedgerEntry(
+            pharmacy_id=o.pharmacy_id, order_id=o.id, entry_type='payment',
+            credit=o.paid_amount, reference=f'{o.order_number} (paid before ledger)', posted_at=o.updated_at,
+        )
+        for o in Order.objects.filter(paid_amount__gt=0).only('pharmacy_id', 'order_number', 'paid_amount', 'updated_at')
+    ]
+    LedgerEntry.objects.bulk_create(entries, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0012_indexes'),
+        ('pharmacies', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateField()),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('pharmacy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_checkpoints', to='pharmacies.pharmacy')),
+            ],
+            options={
+                'unique_together': {('pharmacy', 'as_of')},
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.CharField(choices=[('dispatch', 'Dispatch'), ('payment', 'Payment'), ('void', 'Void'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('debit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('credit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('reference', models.CharField(blank=True, default='', max_length=100)),
+                ('posted_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('dispatch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='orders.dispatch')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='orders.order')),
+                ('pharmacy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='pharmacies.pharmacy')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['pharmacy', 'posted_at', 'id'], name='orders_ledger_statement_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
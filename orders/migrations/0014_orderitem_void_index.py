@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-19 01:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0013_receivables_ledger'),
+        ('products', '0015_purchase_approved_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['order', 'is_void'], name='orders_item_void_idx'),
+        ),
+    ]
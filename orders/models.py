@@ -1,11 +1,28 @@
 from django.db import models
-from django.db.models import Sum, F
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from decimal import Decimal
 from pharmacies.models import Pharmacy
 from products.models import Product, StockBatch
 import datetime
 
-class Order(models.Model):
+
+class BusinessDateMixin:
+    """
+    Sets business_date (the local calendar day of the record's creation, indexed) on first save, so date
+    filters and per-day grouping compare a stored date instead of converting each row's timestamp in SQL.
+    """
+    business_date_source = 'created_at'
+
+    def save(self, *args, **kwargs):
+        if self.business_date is None:
+            moment = getattr(self, self.business_date_source)
+            self.business_date = timezone.localdate(moment) if moment else timezone.localdate()
+        super().save(*args, **kwargs)
+
+
+class Order(BusinessDateMixin, models.Model):
     STATUS_CHOICES = (
         ('pending', 'Pending'),
         ('approved', 'Approved'),
@@ -34,9 +51,18 @@ class Order(models.Model):
     # Track if stock has been deducted to prevent duplicate deductions
     stock_deducted = models.BooleanField(default=False)
     is_void = models.BooleanField(default=False, help_text='Voided orders are excluded from active totals and reports.')
+    approved_at = models.DateTimeField(null=True, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    business_date = models.DateField(db_index=True, editable=False, help_text='Local date of created_at')
+
+    class Meta:
+        indexes = [
+            # Pharmacy order history, newest first
+            models.Index(fields=['pharmacy', 'created_at'], name='orders_order_pharmacy_idx'),
+            models.Index(fields=['status', 'is_void'], name='orders_order_status_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.order_number:
@@ -53,7 +79,12 @@ class Order(models.Model):
         return self.order_number
 
     def dispatched_amount(self):
-        """Total value of items actually dispatched (for payment collection). Excludes voided items."""
+        """
+        Total value of items actually dispatched (for payment collection). Excludes voided items.
+        Read from the dispatched_value annotation when the order was loaded with dispatched_value_subquery().
+        """
+        if hasattr(self, 'dispatched_value'):
+            return self.dispatched_value
         result = OrderItemAllocation.objects.filter(
             order_item__order=self, order_item__is_void=False
         ).aggregate(total=Sum(F('quantity') * F('order_item__unit_price')))
@@ -70,11 +101,21 @@ class OrderItem(models.Model):
     total_price = models.DecimalField(max_digits=12, decimal_places=2)
     is_void = models.BooleanField(default=False, help_text='Voided line items are excluded from order totals.')
 
+    class Meta:
+        indexes = [
+            # Order totals sum the live lines: covering, partial where the backend supports it
+            models.Index(fields=['order', 'total_price'], condition=models.Q(is_void=False), name='orders_item_live_idx'),
+            # Lines of an order by void state, voided ones included (the live index leaves those out)
+            models.Index(fields=['order', 'is_void'], name='orders_item_void_idx'),
+        ]
+
     def __str__(self):
         return f"{self.product.name} ({self.order.order_number})"
 
     @property
     def dispatched_quantity(self):
+        if 'allocations' in getattr(self, '_prefetched_objects_cache', {}):
+            return sum(allocation.quantity for allocation in self.allocations.all())
         return self.allocations.aggregate(total=Sum('quantity'))['total'] or 0
 
     @property
@@ -82,13 +123,16 @@ class OrderItem(models.Model):
         return self.quantity - self.dispatched_quantity
 
 
-class Dispatch(models.Model):
+class Dispatch(BusinessDateMixin, models.Model):
     """
     One record per dispatch event (e.g. one "Save dispatch" from the dispatch screen).
     Groups multiple OrderItemAllocations so each event can have its own bill.
     """
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='dispatches')
     dispatched_at = models.DateTimeField(auto_now_add=True)
+    business_date = models.DateField(db_index=True, editable=False, help_text='Local date of dispatched_at')
+
+    business_date_source = 'dispatched_at'
 
     def __str__(self):
         return f"Dispatch #{self.id} — {self.order.order_number}"
@@ -100,13 +144,76 @@ class Dispatch(models.Model):
         return result['total'] or Decimal('0')
 
 
-class OrderItemAllocation(models.Model):
+class OrderItemAllocation(BusinessDateMixin, models.Model):
     """Which batch and how much was dispatched for an order line. Enables partial dispatch."""
     order_item = models.ForeignKey(OrderItem, on_delete=models.CASCADE, related_name='allocations')
     stock_batch = models.ForeignKey(StockBatch, on_delete=models.CASCADE, related_name='order_allocations')
     quantity = models.PositiveIntegerField()
     dispatch = models.ForeignKey(Dispatch, on_delete=models.CASCADE, null=True, blank=True, related_name='allocations')
+    unit_cost = models.DecimalField(
+        max_digits=14, decimal_places=4, null=True, blank=True,
+        help_text='Landed cost per unit of the batch, snapshotted at dispatch (products.costing.batch_unit_cost). Null = no purchase cost known.'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
+    business_date = models.DateField(db_index=True, editable=False, help_text='Local date of created_at')
+
+    class Meta:
+        indexes = [models.Index(fields=['created_at'], name='orders_alloc_created_idx')]
 
     def __str__(self):
         return f"{self.order_item.product.name} batch {self.stock_batch.batch_number} x {self.quantity}"
+
+
+def dispatched_value_subquery():
+    """Order.dispatched_amount() as an annotation (dispatched_value), so order lists do not query it per order."""
+    total = OrderItemAllocation.objects.filter(
+        order_item__order=OuterRef('pk'), order_item__is_void=False
+    ).order_by().values('order_item__order').annotate(
+        total=Sum(F('quantity') * F('order_item__unit_price'))
+    ).values('total')[:1]
+    return Coalesce(Subquery(total, output_field=DecimalField(max_digits=14, decimal_places=2)), Decimal('0'))
+
+
+class LedgerEntry(models.Model):
+    """
+    Receivables ledger of a pharmacy: dispatched value is debited, payments and voided dispatched lines are
+    credited, and adjustments follow orders that change status or store. Rows are only ever added (orders.ledger);
+    the running balance is computed when reading.
+    """
+    ENTRY_TYPES = (
+        ('dispatch', 'Dispatch'),
+        ('payment', 'Payment'),
+        ('void', 'Void'),
+        ('adjustment', 'Adjustment'),
+    )
+    pharmacy = models.ForeignKey(Pharmacy, on_delete=models.CASCADE, related_name='ledger_entries')
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='ledger_entries')
+    dispatch = models.ForeignKey(Dispatch, on_delete=models.SET_NULL, null=True, blank=True, related_name='ledger_entries')
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPES)
+    debit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    credit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    reference = models.CharField(max_length=100, blank=True, default='')
+    posted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Statements: one pharmacy's entries in a period, in posting order
+            models.Index(fields=['pharmacy', 'posted_at', 'id'], name='orders_ledger_statement_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.pharmacy_id} {self.entry_type} {self.debit or -self.credit} @ {self.posted_at:%Y-%m-%d %H:%M}"
+
+
+class LedgerCheckpoint(models.Model):
+    """Closing ledger balance of a pharmacy at the end of as_of (local date), written by checkpoint_ledger."""
+    pharmacy = models.ForeignKey(Pharmacy, on_delete=models.CASCADE, related_name='ledger_checkpoints')
+    as_of = models.DateField()
+    balance = models.DecimalField(max_digits=14, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = [('pharmacy', 'as_of')]
+
+    def __str__(self):
+        return f"{self.pharmacy_id} closing {self.as_of}: {self.balance}"
@@ -1,8 +1,12 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import Order, OrderItem, OrderItemAllocation, Dispatch
 from products.models import Product, StockBatch
 from products.serializers import ProductSerializer
 from pharmacies.models import Pharmacy
+from invoices.services import refresh_tax_summaries
+from reports import account_summary
+from . import ledger
 
 
 class DispatchSerializer(serializers.ModelSerializer):
@@ -75,7 +79,11 @@ class OrderSerializer(serializers.ModelSerializer):
             'salesman_name', 'terms', 'delivery_type',
             'created_at', 'updated_at'
         )
-        read_only_fields = ('order_number', 'total_amount', 'status', 'balance_amount', 'dispatched_amount', 'outstanding_amount')
+        # Payments go through record_payment, which keeps the account summary and ledger in step
+        read_only_fields = (
+            'order_number', 'total_amount', 'status', 'paid_amount', 'payment_status',
+            'balance_amount', 'dispatched_amount', 'outstanding_amount',
+        )
 
     def get_balance_amount(self, obj):
         from decimal import Decimal
@@ -104,23 +112,37 @@ class OrderSerializer(serializers.ModelSerializer):
         order = Order.objects.create(**validated_data)
         if items_data:
             self._process_items(order, items_data)
+        account_summary.order_created(order)
         return order
     def update(self, instance, validated_data):
         items_data = validated_data.pop('items', None)
-
-        # Update order fields
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-
-        if items_data is not None:
-            # Only allow replacing items when order has no dispatch (allocations)
-            if OrderItemAllocation.objects.filter(order_item__order=instance).exists():
-                raise serializers.ValidationError(
-                    {'items': 'Cannot edit order lines once dispatch has started. Order has allocated items.'}
-                )
-            instance.items.all().delete()
-            self._process_items(instance, items_data)
+        old_pharmacy_id, old_status = instance.pharmacy_id, instance.status
+
+        with transaction.atomic():
+            # Update order fields
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
+
+            if items_data is not None:
+                # Only allow replacing items when order has no dispatch (allocations)
+                if OrderItemAllocation.objects.filter(order_item__order=instance).exists():
+                    raise serializers.ValidationError(
+                        {'items': 'Cannot edit order lines once dispatch has started. Order has allocated items.'}
+                    )
+                instance.items.all().delete()
+                self._process_items(instance, items_data)
+
+            # The bills' stored tax summaries follow the lines and the buyer (intra- or inter-state)
+            if items_data is not None or instance.pharmacy_id != old_pharmacy_id:
+                refresh_tax_summaries(instance)
+
+            # Moving an order between stores (or statuses) is rare: recompute the affected summaries
+            if instance.pharmacy_id != old_pharmacy_id or instance.status != old_status:
+                for pharmacy_id in {old_pharmacy_id, instance.pharmacy_id}:
+                    account_summary.refresh_account_summary(pharmacy_id)
+                ledger.post_order_moved(instance, old_pharmacy_id, old_status)
+                ledger.post_status_change(instance, old_status)
 
         return instance
 
@@ -0,0 +1,96 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from orders.models import Dispatch, Order, OrderItemAllocation
+from pharmacies.models import Pharmacy
+from products.models import Category, Product, StockBatch
+
+
+class OrderFlowMixin:
+    """
+    Test fixtures for the order flow through the API: two pharmacies (same state as each other), two stocked
+    products, an admin and a pharmacy user. Mix into a TestCase; after_event() runs after each successful step.
+    Each test starts with an empty cache, so cached reports never carry over between tests.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Consumables')
+        cls.pharmacy, cls.other = Pharmacy.objects.bulk_create([
+            Pharmacy(pharmacy_name=f'Store {i}', license_number=f'LS-{i}', gst_number=f'29BBBBB{i:04d}B1Z5',
+                     contact_person='Owner', phone='9000000000', email=f's{i}@example.com', address='Address')
+            for i in range(2)
+        ])
+        cls.gloves = Product.objects.create(name='Gloves', category=category, mrp=20, selling_price=10, stock_quantity=100)
+        cls.masks = Product.objects.create(name='Masks', category=category, mrp=10, selling_price=5, stock_quantity=100)
+        for product in (cls.gloves, cls.masks):
+            StockBatch.objects.create(product=product, batch_number='B1', expiry_date=timezone.localdate() + timedelta(days=365), quantity=100)
+        cls.admin = User.objects.create_user('flow-admin', password='x', role='admin', is_staff=True)
+        cls.pharmacy_user = User.objects.create_user('flow-pharmacy', password='x', role='pharmacy', pharmacy=cls.pharmacy)
+
+    def setUp(self):
+        cache.clear()
+        self.client = self.client_for(self.admin)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def client_for_pharmacy(self):
+        return self.client_for(self.pharmacy_user)
+
+    def after_event(self):
+        """Checks to run after every step; none by default."""
+
+    def place_order(self, client=None, pharmacy=None):
+        """Gloves 4 x 10 and masks 2 x 5 (40 + 10, GST inclusive)."""
+        response = (client or self.client).post('/api/orders/', {
+            'pharmacy': (pharmacy or self.pharmacy).id,
+            'items': [
+                {'product': self.gloves.id, 'quantity': 4, 'unit_price': '10'},
+                {'product': self.masks.id, 'quantity': 2, 'unit_price': '5'},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.after_event()
+        return Order.objects.get(pk=response.data['id'])
+
+    def dispatch(self, order, quantities):
+        """Dispatch {product id: quantity} from each product's first batch; returns the Dispatch."""
+        allocations = [
+            {'order_item': item.id, 'stock_batch': item.product.batches.first().id, 'quantity': quantities[item.product_id]}
+            for item in order.items.all() if item.product_id in quantities
+        ]
+        response = self.client.post(f'/api/orders/{order.id}/dispatches/', {'allocations': allocations}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.after_event()
+        return order.dispatches.latest('id')
+
+    def backdate(self, dispatch, when):
+        """Move a dispatch and its allocations to when (an aware datetime)."""
+        day = timezone.localdate(when)
+        Dispatch.objects.filter(pk=dispatch.pk).update(dispatched_at=when, business_date=day)
+        OrderItemAllocation.objects.filter(dispatch=dispatch).update(created_at=when, business_date=day)
+
+    def put(self, url, data=None):
+        response = self.client.put(url, data or {}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.after_event()
+        return response
+
+    def post(self, url):
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.after_event()
+        return response
+
+    def approve(self, order):
+        return self.put(f'/api/orders/{order.id}/approve/')
+
+    def void_item(self, order, product):
+        return self.post(f'/api/orders/{order.id}/items/{order.items.get(product=product).id}/void/')
@@ -1,3 +1,75 @@
+import io
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from . import ledger
+from .models import LedgerCheckpoint, LedgerEntry
+from .testing import OrderFlowMixin
+
+
+class LedgerTests(OrderFlowMixin, TestCase):
+    """
+    Opening balances from the latest checkpoint plus the entries after it, and statements with running balances.
+    History: 30 dispatched ten days ago, 10 paid five days ago, 10 more dispatched today.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.today = timezone.localdate()
+        now = timezone.now()
+        self.order = order = self.place_order()
+        self.approve(order)
+        self.dispatch(order, {self.gloves.id: 3})
+        self.put(f'/api/orders/{order.id}/record_payment/', {'amount': 10, 'reference': 'UTR-1'})
+        LedgerEntry.objects.filter(entry_type='dispatch').update(posted_at=now - timedelta(days=10))
+        LedgerEntry.objects.filter(entry_type='payment').update(posted_at=now - timedelta(days=5))
+        self.last_dispatch = self.dispatch(order, {self.masks.id: 2})
+
+    def days_ago(self, days):
+        return self.today - timedelta(days=days)
+
+    def balance_before(self, day):
+        return ledger.balance_before(self.pharmacy.id, day)
+
+    def test_balance_before(self):
+        self.assertEqual(self.balance_before(self.days_ago(11)), Decimal('0'))
+        self.assertEqual(self.balance_before(self.days_ago(7)), Decimal('30.00'))
+        self.assertEqual(self.balance_before(self.days_ago(4)), Decimal('20.00'))
+        self.assertEqual(self.balance_before(self.today + timedelta(days=1)), Decimal('30.00'))
+        self.assertEqual(ledger.balance_before(self.other.id, self.today), Decimal('0'))
+
+    def test_opening_balance_starts_from_checkpoint(self):
+        self.assertEqual(ledger.write_checkpoints(self.days_ago(7)), 1)
+        checkpoint = LedgerCheckpoint.objects.get()
+        self.assertEqual((checkpoint.pharmacy_id, checkpoint.balance), (self.pharmacy.id, Decimal('30.00')))
+        # Entries up to the checkpoint are no longer read: only the checkpoint and the payment after it count
+        LedgerCheckpoint.objects.update(balance=100)
+        self.assertEqual(self.balance_before(self.days_ago(4)), Decimal('90.00'))
+        self.assertEqual(self.balance_before(self.days_ago(7)), Decimal('30.00'))  # the checkpoint's own day is not covered
+
+    def test_rewriting_a_checkpoint(self):
+        ledger.write_checkpoints(self.days_ago(7))
+        ledger.write_checkpoints(self.days_ago(7))
+        self.assertEqual(list(LedgerCheckpoint.objects.values_list('balance', flat=True)), [Decimal('30.00')])
+
+    def test_checkpoint_command(self):
+        out = io.StringIO()
+        call_command('checkpoint_ledger', stdout=out)
+        self.assertIn('Wrote 1 ledger checkpoints.', out.getvalue())
+        checkpoint = LedgerCheckpoint.objects.get()
+        self.assertEqual((checkpoint.as_of, checkpoint.balance), (self.days_ago(1), Decimal('20.00')))
 
-# Create your tests here.
+    def test_statement_window(self):
+        opening, rows = ledger.statement(self.pharmacy.id, self.days_ago(6), self.today)
+        self.assertEqual(opening, Decimal('30.00'))
+        self.assertEqual([(r['entry_type'], r['reference'], r['debit'], r['credit'], r['balance']) for r in rows], [
+            ('payment', 'UTR-1', Decimal('0.00'), Decimal('10.00'), Decimal('20.00')),
+            ('dispatch', f'{self.order.order_number}/D{self.last_dispatch.id}', Decimal('10.00'), Decimal('0.00'), Decimal('30.00')),
+        ])
+        # Without a start date the statement runs from the first entry
+        opening, rows = ledger.statement(self.pharmacy.id, None, self.days_ago(6))
+        self.assertEqual((opening, [r['balance'] for r in rows]), (Decimal('0.00'), [Decimal('30.00')]))
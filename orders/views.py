@@ -1,20 +1,26 @@
 import decimal
 from rest_framework import viewsets, permissions as drf_permissions, status, decorators
 from rest_framework.response import Response
-from .models import Order, OrderItem, OrderItemAllocation, Dispatch
+from .models import Order, OrderItem, OrderItemAllocation, Dispatch, dispatched_value_subquery
 from .serializers import OrderSerializer, OrderItemAllocationSerializer, BulkDispatchSerializer, DispatchSerializer
 from invoices.models import Invoice
+from invoices.services import store_tax_summary, refresh_tax_summaries
 from django.db import transaction
 from pharmacies.models import Pharmacy
 from rest_framework import serializers
 from accounts.permissions import IsAdminUser
 
-from django.db.models import Sum, Count
-from django.db.models.functions import TruncDate, TruncWeek
+from django.db.models import Sum, Count, F
+from django.db.models.functions import TruncWeek
 from datetime import timedelta
 from django.utils import timezone
 from products.models import Product
 from products.models import StockBatch
+from products.costing import batch_unit_cost
+from reports.dates import filter_date_range, parse_date_range
+from reports import account_summary
+from . import ledger
+from reports.facts import allocation_delta, apply_deltas, void_order_items
 
 class OrderViewSet(viewsets.ModelViewSet):
     serializer_class = OrderSerializer
@@ -28,26 +34,13 @@ class OrderViewSet(viewsets.ModelViewSet):
         end_date = request.query_params.get('end_date')
         group = request.query_params.get('group', 'day')  # day | week | month
 
-        base_qs = Order.objects.exclude(status='rejected')
-        if start_date:
-            try:
-                from datetime import datetime
-                start_d = datetime.strptime(start_date, '%Y-%m-%d').date()
-                base_qs = base_qs.filter(created_at__date__gte=start_d)
-            except ValueError:
-                pass
-        if end_date:
-            try:
-                from datetime import datetime
-                end_d = datetime.strptime(end_date, '%Y-%m-%d').date()
-                base_qs = base_qs.filter(created_at__date__lte=end_d)
-            except ValueError:
-                pass
+        start_d, end_d = parse_date_range(request)
+        base_qs = filter_date_range(Order.objects.exclude(status='rejected'), 'business_date', start_d, end_d)
 
         # If no date range given, default to last 30 days for trend only; stats remain all-time
         trend_qs = base_qs
         if not start_date and not end_date:
-            trend_qs = base_qs.filter(created_at__date__gte=thirty_days_ago)
+            trend_qs = base_qs.filter(business_date__gte=thirty_days_ago)
 
         # General Stats (over filtered range)
         stats = base_qs.aggregate(
@@ -59,7 +52,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         # Sales Trend
         if group == 'month':
             daily = list(trend_qs.annotate(
-                date=TruncDate('created_at')
+                date=F('business_date')
             ).values('date').annotate(
                 sales=Sum('total_amount'),
                 collections=Sum('paid_amount')
@@ -74,14 +67,14 @@ class OrderViewSet(viewsets.ModelViewSet):
             trend = [{'date': k, 'sales': v['sales'], 'collections': v['collections']} for k, v in sorted(by_month.items())]
         elif group == 'week':
             trend = list(trend_qs.annotate(
-                date=TruncWeek('created_at')
+                date=TruncWeek('business_date')
             ).values('date').annotate(
                 sales=Sum('total_amount'),
                 collections=Sum('paid_amount')
             ).order_by('date'))
         else:
             trend = list(trend_qs.annotate(
-                date=TruncDate('created_at')
+                date=F('business_date')
             ).values('date').annotate(
                 sales=Sum('total_amount'),
                 collections=Sum('paid_amount')
@@ -148,7 +141,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         user = self.request.user
         queryset = Order.objects.all().select_related('pharmacy').prefetch_related(
             'items__product', 'items__allocations__stock_batch', 'dispatches'
-        )
+        ).annotate(dispatched_value=dispatched_value_subquery())
         if user.role == 'admin':
             return queryset.order_by('-created_at')
         return queryset.filter(pharmacy=user.pharmacy).order_by('-created_at')
@@ -172,6 +165,13 @@ class OrderViewSet(viewsets.ModelViewSet):
         else:
             raise serializers.ValidationError({"error": "Admin account requires explicit pharmacy selection. Store accounts must have a linked pharmacy."})
 
+    def perform_destroy(self, instance):
+        pharmacy_id = instance.pharmacy_id
+        with transaction.atomic():
+            ledger.post_order_deleted(instance)
+            instance.delete()
+            account_summary.refresh_account_summary(pharmacy_id)
+
     @decorators.action(detail=True, methods=['put'], permission_classes=[IsAdminUser])
     def record_payment(self, request, pk=None):
         order = self.get_object()
@@ -184,7 +184,8 @@ class OrderViewSet(viewsets.ModelViewSet):
             return Response({"error": "Amount must be greater than 0."}, status=status.HTTP_400_BAD_REQUEST)
 
         dispatched = order.dispatched_amount()
-        new_paid = order.paid_amount + decimal.Decimal(str(payment_amount))
+        amount = decimal.Decimal(str(payment_amount))
+        new_paid = order.paid_amount + amount
         if new_paid > dispatched:
             return Response({
                 "error": f"Cannot collect more than dispatched value. Dispatched: ₹{dispatched:.2f}, already paid: ₹{order.paid_amount:.2f}. Maximum you can record: ₹{(dispatched - order.paid_amount):.2f}."
@@ -197,7 +198,10 @@ class OrderViewSet(viewsets.ModelViewSet):
             order.payment_status = 'partial'
         else:
             order.payment_status = 'unpaid'
-        order.save()
+        with transaction.atomic():
+            order.save()
+            account_summary.add_payment(order, amount)
+            ledger.post_payment(order, amount, reference=str(request.data.get('reference') or '')[:100])
         return Response({
             "status": "Payment recorded",
             "paid_amount": order.paid_amount,
@@ -227,10 +231,16 @@ class OrderViewSet(viewsets.ModelViewSet):
         
         with transaction.atomic():
             order.status = 'approved'
+            order.approved_at = timezone.now()
             order.save()
+            account_summary.order_status_changed(order, 'pending')
+            ledger.post_status_change(order, 'pending')
             
             # Auto-generate Invoice
-            Invoice.objects.get_or_create(order=order)
+            invoice, created = Invoice.objects.get_or_create(order=order)
+            store_tax_summary(invoice)
+            if created:
+                account_summary.invoice_created(invoice)
             
         return Response({"status": "Order approved and stock updated, invoice generated."})
 
@@ -242,8 +252,12 @@ class OrderViewSet(viewsets.ModelViewSet):
         if new_status not in valid_statuses:
             return Response({"error": "Invalid status"}, status=status.HTTP_400_BAD_REQUEST)
         
-        order.status = new_status
-        order.save()
+        old_status = order.status
+        with transaction.atomic():
+            order.status = new_status
+            order.save()
+            account_summary.order_status_changed(order, old_status)
+            ledger.post_status_change(order, old_status)
         # Stock is deducted only when creating allocations (dispatch), not on status change.
         return Response({"status": f"Order status updated to {new_status}"})
 
@@ -277,6 +291,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         with transaction.atomic():
             dispatch = Dispatch.objects.create(order=order)
             created = []
+            sales = []
             for row in allocations_data:
                 order_item = row['order_item']
                 if order_item.order_id != order.id:
@@ -292,13 +307,24 @@ class OrderViewSet(viewsets.ModelViewSet):
                 if qty <= 0 or qty > min(remaining, available):
                     raise serializers.ValidationError({'allocations': f'Quantity for order item {order_item.id} must be 1–{min(remaining, available)}.'})
                 allocation = OrderItemAllocation.objects.create(
-                    order_item=order_item, stock_batch=stock_batch, quantity=qty, dispatch=dispatch
+                    order_item=order_item, stock_batch=stock_batch, quantity=qty, dispatch=dispatch,
+                    unit_cost=batch_unit_cost(stock_batch),
                 )
                 stock_batch.quantity -= qty
-                stock_batch.save(update_fields=['quantity'])
+                stock_batch.last_dispatched_at = allocation.created_at
+                stock_batch.save(update_fields=['quantity', 'last_dispatched_at'])
                 order_item.product.stock_quantity -= qty
-                order_item.product.save(update_fields=['stock_quantity'])
+                order_item.product.last_dispatched_at = allocation.created_at
+                order_item.product.save(update_fields=['stock_quantity', 'last_dispatched_at'])
                 created.append(allocation)
+                sales.append(allocation_delta(allocation, order_item, order.pharmacy_id, order_item.quantity - remaining))
+            apply_deltas(sales)
+            value = sum(measures['value'] for _, measures in sales)
+            account_summary.add_dispatched(order, value)
+            ledger.post_dispatch(order, value, dispatch=dispatch)
+            invoice = Invoice.objects.filter(order=order).first()
+            if invoice:
+                store_tax_summary(invoice, dispatch_id=dispatch.id)
         return Response({
             'dispatch': DispatchSerializer(dispatch).data,
             'allocations': OrderItemAllocationSerializer(created, many=True).data,
@@ -326,11 +352,19 @@ class OrderViewSet(viewsets.ModelViewSet):
         if qty <= 0 or qty > min(remaining, available):
             return Response({'detail': f'Quantity must be between 1 and {min(remaining, available)}.'}, status=status.HTTP_400_BAD_REQUEST)
         with transaction.atomic():
-            allocation = OrderItemAllocation.objects.create(order_item=order_item, stock_batch=stock_batch, quantity=qty)
+            allocation = OrderItemAllocation.objects.create(
+                order_item=order_item, stock_batch=stock_batch, quantity=qty, unit_cost=batch_unit_cost(stock_batch)
+            )
             stock_batch.quantity -= qty
+            stock_batch.last_dispatched_at = allocation.created_at
             stock_batch.save()
             order_item.product.stock_quantity -= qty
+            order_item.product.last_dispatched_at = allocation.created_at
             order_item.product.save()
+            sale = allocation_delta(allocation, order_item, order.pharmacy_id, order_item.quantity - remaining)
+            apply_deltas([sale])
+            account_summary.add_dispatched(order, sale[1]['value'])
+            ledger.post_dispatch(order, sale[1]['value'])
         return Response(OrderItemAllocationSerializer(allocation).data, status=status.HTTP_201_CREATED)
 
     @decorators.action(detail=True, methods=['post'], url_path='void', permission_classes=[IsAdminUser])
@@ -341,9 +375,13 @@ class OrderViewSet(viewsets.ModelViewSet):
             return Response({'detail': 'Order is already voided.'}, status=status.HTTP_400_BAD_REQUEST)
         with transaction.atomic():
             order.is_void = True
+            value = void_order_items(order.items.all())
+            account_summary.add_dispatched(order, value)
+            ledger.post_void(order, value)
             order.items.update(is_void=True)
             order.total_amount = 0
             order.save(update_fields=['is_void', 'total_amount'])
+            refresh_tax_summaries(order)
         return Response({'status': 'Order voided.', 'order_id': order.id})
 
     @decorators.action(detail=True, methods=['post'], url_path='items/(?P<item_id>[^/.]+)/void', permission_classes=[IsAdminUser])
@@ -359,6 +397,9 @@ class OrderViewSet(viewsets.ModelViewSet):
         if order_item.is_void:
             return Response({'detail': 'Item is already voided.'}, status=status.HTTP_400_BAD_REQUEST)
         with transaction.atomic():
+            value = void_order_items([order_item])
+            account_summary.add_dispatched(order, value)
+            ledger.post_void(order, value)
             order_item.is_void = True
             order_item.save(update_fields=['is_void'])
             from decimal import Decimal
@@ -367,4 +408,5 @@ class OrderViewSet(viewsets.ModelViewSet):
             )['total'] or Decimal('0')
             order.total_amount = new_total
             order.save()
+            refresh_tax_summaries(order)
         return Response({'status': 'Order item voided.', 'order_total': str(order.total_amount)})
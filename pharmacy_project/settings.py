@@ -62,8 +62,14 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compiled templates are kept in memory (bill previews/PDFs render the same template repeatedly)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
@@ -96,6 +102,30 @@ else:
         }
     }
 
+# Cache (per-process by default; point at Redis/Memcached in production so workers share it)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pharmacy-default',
+    }
+}
+
+# Rendered bill HTML and its cached fragments (seconds). Keys carry the bill version, so this only bounds staleness of pharmacy details.
+INVOICE_HTML_CACHE_TIMEOUT = 60 * 60
+
+# Report results are cached until a relevant write bumps their version; timeout is a safety net for time-relative reports.
+REPORT_CACHE_TIMEOUT = 10 * 60
+# Lifetime of the lock held by the one worker computing a missing report (bounds a lock left by a crashed worker).
+REPORT_CACHE_LOCK_TIMEOUT = 30
+# How long concurrent requests wait for that worker before computing the report themselves; kept short so
+# request and bundle threads are not parked for a whole slow recompute.
+REPORT_CACHE_WAIT = 1
+# Admin dashboard stats older than this are refreshed in the background while the cached copy is served.
+DASHBOARD_STATS_TTL = 30
+# POST /api/reports/bundle/: reports per request, and how many of them run at once (each on its own DB connection).
+REPORT_BUNDLE_MAX_REPORTS = 20
+REPORT_BUNDLE_WORKERS = 4
+
 # Custom User Model
 AUTH_USER_MODEL = 'accounts.User'
 
@@ -0,0 +1,59 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, Func, Q, Subquery, Sum
+from django.utils import timezone
+
+from .models import PurchaseItem
+
+COST_PLACES = Decimal('0.0001')
+COST_FIELD = DecimalField(max_digits=14, decimal_places=4)
+
+
+class DecimalRatio(Func):
+    """numerator / denominator as a decimal (SQLite stores whole-number decimals as integers and would floor it)."""
+    arg_joiner = ' / '
+    template = '(%(expressions)s)'
+    output_field = COST_FIELD
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sqlite(compiler, connection, arg_joiner=' * 1.0 / ', **extra_context)
+
+
+def approved_purchase_lines(as_of=None):
+    """Purchase lines that have been received into stock (approved purchases), optionally those approved by the end of a date."""
+    lines = PurchaseItem.objects.filter(purchase__status='approved')
+    if as_of is not None:
+        day_end = timezone.make_aware(datetime.combine(as_of + timedelta(days=1), time.min))
+        lines = lines.filter(purchase__approved_at__lt=day_end)
+    return lines
+
+
+def average_cost_subquery(purchase_lines):
+    """Quantity-weighted average unit price of the given (OuterRef-filtered) purchase lines, as a decimal subquery."""
+    return Subquery(
+        purchase_lines.order_by().values('product').annotate(
+            cost=DecimalRatio(Sum(F('quantity') * F('unit_price')), Sum('quantity'))
+        ).values('cost')[:1],
+        output_field=COST_FIELD,
+    )
+
+
+def batch_unit_cost(stock_batch):
+    """
+    Landed unit cost of a lot: weighted average price of the approved purchase lines for the same
+    (product, batch number, expiry), else the product's weighted average purchase cost; None without purchases.
+    One query.
+    """
+    lot = Q(batch_number=stock_batch.batch_number, expiry_date=stock_batch.expiry_date)
+    value = F('quantity') * F('unit_price')
+    totals = approved_purchase_lines().filter(product_id=stock_batch.product_id).aggregate(
+        lot_value=Sum(value, filter=lot),
+        lot_quantity=Sum('quantity', filter=lot),
+        all_value=Sum(value),
+        all_quantity=Sum('quantity'),
+    )
+    for prefix in ('lot', 'all'):
+        if totals[f'{prefix}_quantity']:
+            return (Decimal(totals[f'{prefix}_value']) / totals[f'{prefix}_quantity']).quantize(COST_PLACES)
+    return None
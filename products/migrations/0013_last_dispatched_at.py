@@ -0,0 +1,42 @@
+# Generated by Django 5.2.11 on 2026-10-19 00:47
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+
+
+def backfill_last_dispatched_at(apps, schema_editor):
+    OrderItemAllocation = apps.get_model('orders', 'OrderItemAllocation')
+    Product = apps.get_model('products', 'Product')
+    StockBatch = apps.get_model('products', 'StockBatch')
+
+    def latest(**outer):
+        return Subquery(
+            OrderItemAllocation.objects.filter(**outer).order_by().values(*outer).annotate(
+                latest=Max('created_at')
+            ).values('latest')[:1]
+        )
+
+    StockBatch.objects.update(last_dispatched_at=latest(stock_batch=OuterRef('pk')))
+    Product.objects.update(last_dispatched_at=latest(order_item__product=OuterRef('pk')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_orderitemallocation_unit_cost'),
+        ('products', '0012_remove_product_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='last_dispatched_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Latest dispatch of any batch; set in the dispatch path', null=True),
+        ),
+        migrations.AddField(
+            model_name='stockbatch',
+            name='last_dispatched_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Latest dispatch from this lot; set in the dispatch path', null=True),
+        ),
+        migrations.RunPython(backfill_last_dispatched_at, migrations.RunPython.noop),
+    ]
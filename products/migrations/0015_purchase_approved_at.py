@@ -0,0 +1,26 @@
+# Generated by Django 5.2.11 on 2026-10-19 13:12
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_approved_at(apps, schema_editor):
+    # The approval time was not recorded; creation is the closest known time for purchases already approved.
+    Purchase = apps.get_model('products', 'Purchase')
+    Purchase.objects.filter(status='approved').update(approved_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0014_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchase',
+            name='approved_at',
+            field=models.DateTimeField(blank=True, help_text='When the stock was received (approve action)', null=True),
+        ),
+        migrations.RunPython(backfill_approved_at, migrations.RunPython.noop),
+    ]
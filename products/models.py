@@ -23,8 +23,15 @@ class Product(models.Model):
     gst_rate = models.DecimalField(max_digits=5, decimal_places=2, default=12) # Default 12%
     image_url = models.URLField(max_length=500, blank=True, null=True)
     is_active = models.BooleanField(default=True)
+    last_dispatched_at = models.DateTimeField(null=True, blank=True, db_index=True, help_text='Latest dispatch of any batch; set in the dispatch path')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Low / out-of-stock lookups over active products (partial where the backend supports it)
+            models.Index(fields=['stock_quantity'], condition=models.Q(is_active=True), name='products_active_stock_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -36,10 +43,15 @@ class StockBatch(models.Model):
     expiry_date = models.DateField()
     quantity = models.PositiveIntegerField(default=0)
     received_date = models.DateField(null=True, blank=True)
+    last_dispatched_at = models.DateTimeField(null=True, blank=True, db_index=True, help_text='Latest dispatch from this lot; set in the dispatch path')
 
     class Meta:
         unique_together = [('product', 'batch_number', 'expiry_date')]
         ordering = ['expiry_date']
+        indexes = [
+            # FEFO pick list: a product's lots in stock by expiry (partial where the backend supports it)
+            models.Index(fields=['product', 'expiry_date'], condition=models.Q(quantity__gt=0), name='products_batch_instock_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.name} / {self.batch_number} (exp: {self.expiry_date})"
@@ -53,8 +65,12 @@ class Purchase(models.Model):
     is_paid = models.BooleanField(default=False)
     notes = models.TextField(blank=True, null=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    approved_at = models.DateTimeField(null=True, blank=True, help_text='When the stock was received (approve action)')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['status', 'purchase_date'], name='products_purchase_status_idx')]
+
     def __str__(self):
         return f"Purchase from {self.supplier_name} on {self.purchase_date}"
 
@@ -46,6 +46,7 @@ class PurchaseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Purchase
         fields = '__all__'
+        read_only_fields = ['approved_at']
 
     def create(self, validated_data):
         validated_data.pop('items', None)
@@ -1,3 +1,89 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import OuterRef
 from django.test import TestCase
+from django.utils import timezone
+
+from orders.testing import OrderFlowMixin
+from .costing import approved_purchase_lines, average_cost_subquery, batch_unit_cost
+from .models import Product, Purchase, PurchaseItem, StockBatch
+
+
+class PurchaseApprovalTests(OrderFlowMixin, TestCase):
+    """Approving a purchase receives its lots into stock and records when."""
+
+    def setUp(self):
+        super().setUp()
+        self.expiry = timezone.localdate() + timedelta(days=200)
+
+    def purchase(self, product, quantity, unit_price, batch_number):
+        response = self.client.post('/api/products/purchases/', {'supplier_name': 'Supplier', 'items': [{
+            'product': product.id, 'quantity': quantity, 'unit_price': unit_price,
+            'batch_number': batch_number, 'expiry_date': str(self.expiry),
+        }]}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return Purchase.objects.get(pk=response.data['id'])
+
+    def approve_purchase(self, purchase):
+        return self.client.post(f'/api/products/purchases/{purchase.id}/approve/')
+
+    def test_approval(self):
+        purchase = self.purchase(self.masks, 8, '3', 'P2')
+        Purchase.objects.filter(pk=purchase.pk).update(purchase_date=timezone.localdate() - timedelta(days=30))
+        self.assertIsNone(purchase.approved_at)
+        self.assertEqual(self.approve_purchase(purchase).status_code, 200)
+        purchase.refresh_from_db()
+        self.assertEqual(purchase.status, 'approved')
+        self.assertIsNotNone(purchase.approved_at)
+        # Received on the day of approval, not the day the purchase was entered
+        batch = StockBatch.objects.get(product=self.masks, batch_number='P2')
+        self.assertEqual((batch.quantity, batch.received_date), (8, timezone.localdate()))
+        self.masks.refresh_from_db()
+        self.assertEqual(self.masks.stock_quantity, 108)
+        self.assertEqual(self.approve_purchase(purchase).status_code, 400)
+
+    def test_approved_at_is_read_only(self):
+        purchase = self.purchase(self.masks, 8, '3', 'P2')
+        response = self.client.patch(f'/api/products/purchases/{purchase.id}/', {'approved_at': timezone.now().isoformat()}, format='json')
+        self.assertEqual(response.status_code, 200)
+        purchase.refresh_from_db()
+        self.assertIsNone(purchase.approved_at)
+
+
+class CostingTests(OrderFlowMixin, TestCase):
+    """Landed cost from approved purchase lines: per lot, else the product's weighted average."""
+
+    def setUp(self):
+        super().setUp()
+        self.expiry = timezone.localdate() + timedelta(days=200)
+        for quantity, unit_price in ((10, '10'), (15, '11')):
+            purchase = Purchase.objects.create(supplier_name='Supplier', status='approved', approved_at=timezone.now())
+            PurchaseItem.objects.create(purchase=purchase, product=self.gloves, quantity=quantity, unit_price=unit_price,
+                                        batch_number='P1', expiry_date=self.expiry)
+        self.pending = Purchase.objects.create(supplier_name='Supplier')
+        PurchaseItem.objects.create(purchase=self.pending, product=self.gloves, quantity=100, unit_price='1',
+                                    batch_number='P1', expiry_date=self.expiry)
+
+    def test_batch_unit_cost(self):
+        lot = StockBatch(product=self.gloves, batch_number='P1', expiry_date=self.expiry)
+        with self.assertNumQueries(1):
+            self.assertEqual(batch_unit_cost(lot), Decimal('10.6000'))
+        # Another lot of the product takes the product average; no purchases at all, no cost
+        self.assertEqual(batch_unit_cost(self.gloves.batches.get(batch_number='B1')), Decimal('10.6000'))
+        self.assertIsNone(batch_unit_cost(self.masks.batches.get(batch_number='B1')))
+
+    def test_average_cost_subquery(self):
+        # Whole-number totals (265 / 25) are divided as decimals, not floored
+        costs = Product.objects.annotate(cost=average_cost_subquery(approved_purchase_lines().filter(product=OuterRef('pk'))))
+        self.assertEqual({p.name: p.cost for p in costs}, {'Gloves': Decimal('10.6000'), 'Masks': None})
 
-# Create your tests here.
+    def test_lines_as_of_approval(self):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        self.assertEqual(approved_purchase_lines().count(), 2)
+        self.assertEqual(approved_purchase_lines(timezone.localdate()).count(), 2)
+        # Entered long ago does not matter; approved today is not received yet at the end of yesterday
+        Purchase.objects.update(purchase_date=yesterday - timedelta(days=30))
+        self.assertEqual(approved_purchase_lines(yesterday).count(), 0)
+        Purchase.objects.filter(status='approved').update(approved_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(approved_purchase_lines(yesterday).count(), 2)
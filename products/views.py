@@ -1,6 +1,8 @@
 from rest_framework import viewsets, permissions as drf_permissions, filters, status, decorators
 from rest_framework.response import Response
 from django.db import transaction
+from django.db.models import Subquery
+from django.utils import timezone
 from .models import Product, Category, Purchase, PurchaseItem, StockBatch
 from .serializers import ProductSerializer, CategorySerializer, PurchaseSerializer, StockBatchSerializer
 from accounts.permissions import IsAdminUser
@@ -25,9 +27,24 @@ class ProductViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         queryset = Product.objects.all().order_by('-id')
         if self.request.user.is_authenticated and self.request.user.role == 'admin':
-            return queryset
+            return self._filter_inventory_class(queryset)
         return queryset.filter(is_active=True)
 
+    def _filter_inventory_class(self, queryset):
+        """Admin filters ?abc= / ?xyz= (e.g. abc=A&xyz=Z) on the latest ABC/XYZ snapshot (reports.classification)."""
+        abc = self.request.query_params.get('abc')
+        xyz = self.request.query_params.get('xyz')
+        if not (abc or xyz):
+            return queryset
+        from reports.models import InventoryClass
+        latest = InventoryClass.objects.order_by('-period_end').values('period_end')[:1]
+        classes = InventoryClass.objects.filter(period_end=Subquery(latest))
+        if abc:
+            classes = classes.filter(abc_class__in=abc.upper().split(','))
+        if xyz:
+            classes = classes.filter(xyz_class__in=xyz.upper().split(','))
+        return queryset.filter(id__in=classes.values('product_id'))
+
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
             permission_classes = [drf_permissions.AllowAny]
@@ -45,7 +62,8 @@ class PurchaseViewSet(viewsets.ModelViewSet):
         purchase = self.get_object()
         if purchase.status == 'approved':
             return Response({'detail': 'Already approved.'}, status=status.HTTP_400_BAD_REQUEST)
-        received = purchase.purchase_date
+        now = timezone.now()
+        received = timezone.localdate(now)
         with transaction.atomic():
             for item in purchase.items.all():
                 if not item.batch_number or not item.expiry_date:
@@ -63,6 +81,7 @@ class PurchaseViewSet(viewsets.ModelViewSet):
                 item.product.stock_quantity += item.quantity
                 item.product.save()
             purchase.status = 'approved'
+            purchase.approved_at = now
             purchase.save()
         return Response({'status': 'approved', 'detail': 'Stock added to inventory.'})
 
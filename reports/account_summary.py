@@ -0,0 +1,129 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from invoices.models import Invoice
+from orders.models import Order, OrderItemAllocation
+from pharmacies.models import Pharmacy
+from .aging import ACTIVE_STATUSES
+from .models import PharmacyAccountSummary
+
+# Order status -> PharmacyAccountSummary counter
+STATUS_FIELDS = {status: f'{status}_orders' for status, _ in Order.STATUS_CHOICES}
+
+
+def _latest(qs, **fields):
+    """Subqueries for fields of the newest row of qs (correlated to the outer pharmacy), keyed by alias."""
+    qs = qs.order_by('-created_at', '-id')
+    return {alias: Subquery(qs.values(field)[:1]) for alias, field in fields.items()}
+
+
+def build_account_summaries(pharmacy_ids=None):
+    """
+    PharmacyAccountSummary rows computed from the orders, allocations and invoices of the given pharmacies
+    (default: all). Four grouped queries whatever the number of pharmacies.
+    """
+    pharmacies = Pharmacy.objects.all()
+    orders = Order.objects.all()
+    allocations = OrderItemAllocation.objects.filter(order_item__order__status__in=ACTIVE_STATUSES, order_item__is_void=False)
+    if pharmacy_ids is not None:
+        pharmacies = pharmacies.filter(pk__in=pharmacy_ids)
+        orders = orders.filter(pharmacy_id__in=pharmacy_ids)
+        allocations = allocations.filter(order_item__order__pharmacy_id__in=pharmacy_ids)
+
+    summaries = {
+        p['id']: PharmacyAccountSummary(pharmacy_id=p['id'], **{k: v for k, v in p.items() if k != 'id' and v is not None})
+        for p in pharmacies.annotate(
+            **_latest(Order.objects.filter(pharmacy=OuterRef('pk')), last_order_number='order_number', last_order_at='created_at'),
+            **_latest(Invoice.objects.filter(order__pharmacy=OuterRef('pk')), last_invoice_number='invoice_number', last_invoice_at='created_at'),
+        ).values('id', 'last_order_number', 'last_order_at', 'last_invoice_number', 'last_invoice_at')
+    }
+    paid_by_pharmacy = defaultdict(Decimal)
+    for row in orders.order_by().values('pharmacy_id', 'status').annotate(n=Count('id'), paid=Sum('paid_amount')):
+        summary = summaries[row['pharmacy_id']]
+        summary.order_count += row['n']
+        setattr(summary, STATUS_FIELDS[row['status']], row['n'])
+        paid_by_pharmacy[row['pharmacy_id']] += row['paid'] or 0
+    for row in allocations.order_by().values('order_item__order__pharmacy_id').annotate(
+        total=Sum(F('quantity') * F('order_item__unit_price'))
+    ):
+        summaries[row['order_item__order__pharmacy_id']].dispatched_amount = row['total'] or Decimal('0')
+    for pharmacy_id, amount in paid_by_pharmacy.items():
+        summaries[pharmacy_id].paid_amount = amount
+    return list(summaries.values())
+
+
+def _store(summaries):
+    fields = [f.name for f in PharmacyAccountSummary._meta.concrete_fields if not f.primary_key]
+    for summary in summaries:
+        summary.updated_at = timezone.now()
+    PharmacyAccountSummary.objects.bulk_create(
+        summaries, batch_size=1000, update_conflicts=True, unique_fields=['pharmacy'], update_fields=fields,
+    )
+
+
+def refresh_account_summary(pharmacy_id):
+    """Recompute one pharmacy's summary from its orders and store it."""
+    _store(build_account_summaries([pharmacy_id]))
+
+
+def rebuild_account_summaries():
+    """Recompute every pharmacy's summary. Returns the number of rows."""
+    summaries = build_account_summaries()
+    _store(summaries)
+    return len(summaries)
+
+
+def get_account_summary(pharmacy):
+    """The pharmacy's summary row (one primary-key lookup), built first if it does not exist yet."""
+    summary = PharmacyAccountSummary.objects.filter(pk=pharmacy.pk).first()
+    if summary is None:
+        refresh_account_summary(pharmacy.pk)
+        summary = PharmacyAccountSummary.objects.get(pk=pharmacy.pk)
+    return summary
+
+
+def _apply(pharmacy_id, **changes):
+    """
+    Apply changes (F() increments) to the pharmacy's row in the same transaction as the event. Call after the
+    event is written: a pharmacy without a row yet gets one computed from its orders, which include the event.
+    """
+    if not PharmacyAccountSummary.objects.filter(pk=pharmacy_id).update(**changes, updated_at=timezone.now()):
+        refresh_account_summary(pharmacy_id)
+
+
+def order_created(order):
+    field = STATUS_FIELDS[order.status]
+    _apply(
+        order.pharmacy_id, order_count=F('order_count') + 1, **{field: F(field) + 1},
+        last_order_number=order.order_number, last_order_at=order.created_at,
+    )
+
+
+def order_status_changed(order, old_status):
+    """Move the order between status counters; its dispatched value follows it in or out of the active statuses."""
+    if order.status == old_status:
+        return
+    old_field, new_field = STATUS_FIELDS[old_status], STATUS_FIELDS[order.status]
+    changes = {old_field: F(old_field) - 1, new_field: F(new_field) + 1}
+    was_active, is_active = old_status in ACTIVE_STATUSES, order.status in ACTIVE_STATUSES
+    if was_active != is_active:
+        value = order.dispatched_amount()
+        changes['dispatched_amount'] = F('dispatched_amount') + (value if is_active else -value)
+    _apply(order.pharmacy_id, **changes)
+
+
+def invoice_created(invoice):
+    _apply(invoice.order.pharmacy_id, last_invoice_number=invoice.invoice_number, last_invoice_at=invoice.created_at)
+
+
+def add_dispatched(order, value):
+    """Add dispatched value (negative when dispatched lines are voided) of an order."""
+    if value and order.status in ACTIVE_STATUSES:
+        _apply(order.pharmacy_id, dispatched_amount=F('dispatched_amount') + value)
+
+
+def add_payment(order, amount):
+    _apply(order.pharmacy_id, paid_amount=F('paid_amount') + amount)
@@ -1,3 +1,9 @@
 from django.contrib import admin
+from .models import DemandForecast, InventoryClass, PharmacyAccountSummary, ReportSnapshot, SalesFact, StockSnapshot
 
-# Register your models here.
+admin.site.register(DemandForecast)
+admin.site.register(InventoryClass)
+admin.site.register(StockSnapshot)
+admin.site.register(SalesFact)
+admin.site.register(ReportSnapshot)
+admin.site.register(PharmacyAccountSummary)
@@ -0,0 +1,93 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import F, Min, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from orders.models import OrderItemAllocation
+
+ACTIVE_STATUSES = ['approved', 'processing', 'shipped', 'delivered']
+
+# (key, first day, last day) of each age bucket; None = open-ended
+AGING_BUCKETS = [
+    ('0_30', 0, 30),
+    ('31_60', 31, 60),
+    ('61_90', 61, 90),
+    ('90_plus', 91, None),
+]
+
+
+def dispatch_events(pharmacy_id=None):
+    """
+    Dispatched value per dispatch event, with its order, pharmacy and the order's paid amount.
+    Allocations made without a Dispatch (legacy endpoint) form one event per order, dated by their first allocation.
+    Void lines are excluded, matching Order.dispatched_amount().
+    """
+    qs = OrderItemAllocation.objects.filter(
+        order_item__order__status__in=ACTIVE_STATUSES, order_item__is_void=False
+    )
+    if pharmacy_id:
+        qs = qs.filter(order_item__order__pharmacy_id=pharmacy_id)
+    return qs.order_by().values(
+        order_ref=F('order_item__order_id'),
+        pharmacy_ref=F('order_item__order__pharmacy_id'),
+        paid=F('order_item__order__paid_amount'),
+        event_ref=F('dispatch_id'),
+    ).annotate(
+        value=Sum(F('quantity') * F('order_item__unit_price')),
+        dated=Coalesce(Min('dispatch__dispatched_at'), Min('created_at')),
+    )
+
+
+def receivables_aging(as_of=None, pharmacy_id=None):
+    """
+    Outstanding receivables per pharmacy split into age buckets, in one SQL statement.
+
+    Payments are recorded per order (Order.paid_amount), so each order's paid amount is applied to its
+    dispatch events oldest-first: a running total (window SUM over the order's events by date) gives
+    what is still unpaid on each event; unpaid amounts are then bucketed by dispatch age and summed.
+    Returns {pharmacy_id: {bucket_key: Decimal}} for pharmacies with something outstanding.
+    """
+    as_of = as_of or timezone.now()
+    inner_sql, inner_params = dispatch_events(pharmacy_id).query.sql_with_params()
+    adapt = connection.ops.adapt_datetimefield_value
+
+    cases, case_params = [], []
+    for key, first_day, last_day in AGING_BUCKETS:
+        # dispatched at or after (as_of - last_day - 1 day) and before (as_of - first_day days)
+        conditions = []
+        if last_day is not None:
+            conditions.append('dated > %s')
+            case_params.append(adapt(as_of - timedelta(days=last_day + 1)))
+        if first_day:
+            conditions.append('dated <= %s')
+            case_params.append(adapt(as_of - timedelta(days=first_day)))
+        cases.append(f"WHEN {' AND '.join(conditions) or '1=1'} THEN '{key}'")
+
+    sql = f"""
+        SELECT pharmacy_ref, CASE {' '.join(cases)} END AS bucket, SUM(outstanding)
+        FROM (
+            SELECT pharmacy_ref, dated,
+                CASE
+                    WHEN running - paid <= 0 THEN 0
+                    WHEN running - paid >= value THEN value
+                    ELSE running - paid
+                END AS outstanding
+            FROM (
+                SELECT ev.*, SUM(value) OVER (PARTITION BY order_ref ORDER BY dated, event_ref) AS running
+                FROM ({inner_sql}) ev
+            ) w
+            WHERE dated <= %s
+        ) x
+        WHERE outstanding > 0
+        GROUP BY pharmacy_ref, bucket
+    """
+    result = {}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*case_params, *inner_params, adapt(as_of)])
+        for pharmacy_ref, bucket, amount in cursor.fetchall():
+            buckets = result.setdefault(pharmacy_ref, {key: Decimal('0') for key, _, _ in AGING_BUCKETS})
+            buckets[bucket] += Decimal(str(amount)).quantize(Decimal('0.01'))
+    return result
@@ -0,0 +1,95 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .snapshots import call_report_view
+
+logger = logging.getLogger(__name__)
+
+
+def report_views():
+    """Report name (its path under /api/reports/, without the trailing slash) -> (view class, path)."""
+    from .urls import urlpatterns
+    views = {}
+    for pattern in urlpatterns:
+        view_class = getattr(pattern.callback, 'view_class', None)
+        if view_class is not None and view_class is not ReportBundleView and hasattr(view_class, 'get'):
+            route = str(pattern.pattern)
+            views[route.rstrip('/')] = (view_class, route)
+    return views
+
+
+def _run_report(view_class, params, user, path, base_request):
+    started = time.perf_counter()
+    try:
+        response = call_report_view(view_class, params, user=user, path=path, base_request=base_request)
+        result = {'status': response.status_code}
+        result['data' if response.status_code == 200 else 'error'] = response.data
+    except Exception:
+        # The details stay in the server log; the caller sees a generic error for this report only.
+        logger.exception('Report %s failed in a bundle', view_class.__name__)
+        result = {'status': 500, 'error': {'detail': 'Report failed.'}}
+    finally:
+        connections.close_all()  # this worker thread's connections; they are never reused
+    result['ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+class ReportBundleView(APIView):
+    """
+    POST {"reports": [{"name": "sales-by-product", "params": {"start_date": "..."}, "key": "optional alias"}, ...]}
+    runs up to REPORT_BUNDLE_MAX_REPORTS report GETs in one round trip: the caller is authenticated once, each
+    report's own permission classes are checked against that user, and the reports run concurrently on a pool of
+    REPORT_BUNDLE_WORKERS threads, each with its own DB connection. Returns {"reports": {key: {status, data | error,
+    ms}}, "ms": total}; one report failing does not fail the bundle. JSON only (?format= params are ignored).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        entries = request.data.get('reports') if isinstance(request.data, dict) else None
+        if not isinstance(entries, list) or not entries:
+            return Response({'detail': 'reports must be a non-empty list.'}, status=400)
+        if len(entries) > settings.REPORT_BUNDLE_MAX_REPORTS:
+            return Response({'detail': f'At most {settings.REPORT_BUNDLE_MAX_REPORTS} reports per bundle.'}, status=400)
+        available = report_views()
+        base_path = request.path.rsplit('bundle/', 1)[0]
+        results, jobs = {}, {}
+        for entry in entries:
+            if not isinstance(entry, dict) or entry.get('name') not in available:
+                return Response({'detail': f'Unknown report: {entry!r}.'}, status=400)
+            key = entry.get('key', entry['name'])
+            if not isinstance(key, str) or not key:
+                return Response({'detail': f'key of {entry["name"]} must be a non-empty string.'}, status=400)
+            if key in results or key in jobs:
+                return Response({'detail': f'Duplicate report key: {key}.'}, status=400)
+            params = entry.get('params') or {}
+            if not isinstance(params, dict):
+                return Response({'detail': f'params of {key} must be an object.'}, status=400)
+            if not all(isinstance(v, (str, int, float)) and not isinstance(v, bool) for v in params.values()):
+                return Response({'detail': f'params of {key} must be strings or numbers.'}, status=400)
+            view_class, route = available[entry['name']]
+            view = view_class()
+            if not all(permission().has_permission(request, view) for permission in view.permission_classes):
+                results[key] = {'status': 403, 'error': {'detail': 'You do not have permission to view this report.'}, 'ms': 0.0}
+                continue
+            params = {k: str(v) for k, v in params.items() if k != 'format'}
+            jobs[key] = (view_class, params, base_path + route)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(settings.REPORT_BUNDLE_WORKERS, len(jobs) or 1)) as pool:
+            futures = {
+                key: pool.submit(_run_report, view_class, params, request.user, path, request._request)
+                for key, (view_class, params, path) in jobs.items()
+            }
+            for key, future in futures.items():
+                results[key] = future.result()
+        return Response({
+            'reports': {key: results[key] for key in [e.get('key', e['name']) for e in entries]},
+            'ms': round((time.perf_counter() - started) * 1000, 1),
+        })
@@ -0,0 +1,105 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+from .exports import STREAMED_FORMATS
+
+# Write topics; each report declares the topics its data depends on.
+TOPICS = ('orders', 'dispatch', 'payments', 'purchases', 'stock')
+
+
+def _version_key(topic):
+    return f'report_version:{topic}'
+
+
+def topic_version(topic):
+    # Seeded from the clock so a version key lost to eviction never restarts at a value old entries were stored under.
+    return cache.get_or_set(_version_key(topic), time.time_ns(), None)
+
+
+def bump_topics(*topics):
+    """Invalidate cached reports depending on these topics (call after the write is committed)."""
+    for topic in topics:
+        try:
+            cache.incr(_version_key(topic))
+        except ValueError:
+            cache.set(_version_key(topic), time.time_ns(), None)
+
+
+def bump_topics_on_commit(*topics):
+    """Bump once the current transaction commits, so readers never cache pre-commit data under the new version."""
+    transaction.on_commit(lambda: bump_topics(*topics))
+
+
+def single_flight(key, compute, timeout):
+    """
+    Return the cached value for key, computing it at most once across concurrent callers:
+    the caller that wins the lock computes and stores it; others poll the cache for it briefly
+    (REPORT_CACHE_WAIT) and compute locally if the lock holder has not produced a value by then.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, settings.REPORT_CACHE_LOCK_TIMEOUT):
+        try:
+            value = compute()
+            cache.set(key, value, timeout)
+            return value
+        finally:
+            cache.delete(lock_key)
+    deadline = time.monotonic() + settings.REPORT_CACHE_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        value = cache.get(key)
+        if value is not None:
+            return value
+        if cache.get(lock_key) is None:
+            break
+    return compute()
+
+
+def report_cache_key(name, request, topics):
+    """Key on report name, the caller's pharmacy (portal views), normalized query params and topic versions."""
+    params = sorted((k, sorted(request.query_params.getlist(k))) for k in request.query_params)
+    scope = getattr(request.user, 'pharmacy_id', None) if getattr(request.user, 'role', None) == 'pharmacy' else None
+    digest = hashlib.md5(repr((scope, params)).encode()).hexdigest()
+    versions = '.'.join(str(topic_version(t)) for t in topics)
+    return f'report:{name}:{digest}:{versions}'
+
+
+class _Uncacheable(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+def cached_report(*topics, timeout=None):
+    """
+    Cache a report view's GET response data until one of its topics is written (or timeout elapses).
+    Only 200 responses are cached; concurrent misses are computed once (single_flight). File exports are not cached.
+    """
+    def decorator(get):
+        @wraps(get)
+        def wrapper(self, request, *args, **kwargs):
+            if getattr(request.accepted_renderer, 'format', None) in STREAMED_FORMATS:
+                return get(self, request, *args, **kwargs)
+
+            def compute():
+                response = get(self, request, *args, **kwargs)
+                if not isinstance(response, Response) or response.status_code != 200:
+                    raise _Uncacheable(response)
+                return response.data
+
+            key = report_cache_key(type(self).__name__, request, topics)
+            try:
+                data = single_flight(key, compute, timeout or settings.REPORT_CACHE_TIMEOUT)
+            except _Uncacheable as exc:
+                return exc.response
+            return Response(data)
+        return wrapper
+    return decorator
@@ -0,0 +1,126 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F, Max, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from orders.models import OrderItemAllocation
+from products.models import Product
+from .models import InventoryClass
+
+# Cumulative value share up to which a product is A, then B; the rest is C.
+ABC_LIMITS = (0.80, 0.95)
+# Coefficient of variation of monthly units up to which a product is X, then Y; the rest (and no demand) is Z.
+XYZ_LIMITS = (0.5, 1.0)
+
+
+def _month_index(d):
+    return d.year * 12 + d.month - 1
+
+
+def _month_start(index):
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def last_closed_month_end(today=None):
+    """Last day of the month before today's month."""
+    today = today or timezone.localdate()
+    return today.replace(day=1) - timedelta(days=1)
+
+
+def monthly_series(product_ids, first_month, months):
+    """
+    Per-product monthly dispatched units and sales value as two arrays of shape (len(product_ids), months),
+    column 0 being the month starting at first_month. One grouped query over allocations (void lines excluded).
+    """
+    first = _month_index(first_month)
+    rows = OrderItemAllocation.objects.filter(
+        business_date__gte=first_month, business_date__lt=_month_start(first + months), order_item__is_void=False
+    ).order_by().values_list(F('order_item__product_id'), TruncMonth('business_date')).annotate(
+        units=Sum('quantity'), value=Sum(F('quantity') * F('order_item__unit_price')),
+    )
+    index = {pid: i for i, pid in enumerate(product_ids)}
+    units = np.zeros((len(product_ids), months))
+    value = np.zeros((len(product_ids), months))
+    for pid, month, qty, amount in rows:
+        if pid in index:
+            col = _month_index(month) - first
+            units[index[pid], col] += qty
+            value[index[pid], col] += float(amount)
+    return units, value
+
+
+def classify(units, value, abc_limits=ABC_LIMITS, xyz_limits=XYZ_LIMITS):
+    """
+    Vectorized ABC/XYZ over all products (rows). Returns (abc, xyz, share, cumulative, cv) arrays in row order.
+    ABC ranks products by total value and cuts the cumulative share; XYZ cuts the coefficient of variation of monthly units.
+    """
+    totals = value.sum(axis=1)
+    grand_total = totals.sum()
+    share = totals / grand_total if grand_total > 0 else np.zeros_like(totals)
+    order = np.argsort(-totals, kind='stable')
+    cumulative = np.empty_like(share)
+    cumulative[order] = np.cumsum(share[order])
+    abc = np.where(cumulative - share < abc_limits[0], 'A', np.where(cumulative - share < abc_limits[1], 'B', 'C'))
+    abc[totals <= 0] = 'C'
+
+    mean = units.mean(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cv = np.where(mean > 0, units.std(axis=1) / mean, np.nan)
+    xyz = np.where(cv <= xyz_limits[0], 'X', np.where(cv <= xyz_limits[1], 'Y', 'Z'))
+    xyz[np.isnan(cv)] = 'Z'
+    return abc, xyz, share, cumulative, cv
+
+
+def classify_period(period_end, window_months=12):
+    """Compute and store the snapshot for the window ending with period_end's month, replacing any existing one."""
+    last = _month_index(period_end)
+    first_month = _month_start(last - window_months + 1)
+    period_end = _month_start(last + 1) - timedelta(days=1)
+    product_ids = list(Product.objects.filter(is_active=True).order_by('id').values_list('id', flat=True))
+    units, value = monthly_series(product_ids, first_month, window_months)
+    abc, xyz, share, cumulative, cv = classify(units, value)
+    now = timezone.now()
+    snapshot = [
+        InventoryClass(
+            product_id=pid,
+            period_end=period_end,
+            window_months=window_months,
+            abc_class=abc[i],
+            xyz_class=xyz[i],
+            sales_value=Decimal(str(round(value[i].sum(), 2))),
+            value_share=round(float(share[i]), 6),
+            cumulative_share=round(float(cumulative[i]), 6),
+            quantity=int(units[i].sum()),
+            demand_cv=None if np.isnan(cv[i]) else round(float(cv[i]), 4),
+            computed_at=now,
+        )
+        for i, pid in enumerate(product_ids)
+    ]
+    with transaction.atomic():
+        InventoryClass.objects.filter(period_end=period_end).delete()
+        InventoryClass.objects.bulk_create(snapshot, batch_size=2000)
+    return len(snapshot)
+
+
+def classify_closed_months(window_months=12, today=None):
+    """
+    Incremental run: snapshot each closed month after the latest stored one (only the last closed month when
+    nothing is stored yet). Returns the period_end dates computed; empty when already up to date.
+    """
+    target = last_closed_month_end(today)
+    latest = latest_period()
+    first = _month_index(latest) + 1 if latest else _month_index(target)
+    computed = []
+    for index in range(first, _month_index(target) + 1):
+        period_end = _month_start(index + 1) - timedelta(days=1)
+        classify_period(period_end, window_months)
+        computed.append(period_end)
+    return computed
+
+
+def latest_period():
+    return InventoryClass.objects.aggregate(latest=Max('period_end'))['latest']
@@ -0,0 +1,113 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from orders.models import Order, OrderItemAllocation
+from products.models import Product
+from .aging import ACTIVE_STATUSES
+from .cache import single_flight, topic_version
+
+DASHBOARD_CACHE_KEY = 'report:dashboard_stats'
+DASHBOARD_TOPICS = ('orders', 'dispatch', 'payments', 'stock')
+LOW_STOCK_THRESHOLD = 10
+RECENT_ORDERS = 5
+
+
+def compute_dashboard_stats():
+    """
+    All dashboard figures: one conditional-aggregation query per table (orders, active products, live dispatched
+    allocations), then the recent orders.
+    """
+    today = timezone.localdate()
+    orders = Order.objects.aggregate(
+        total_orders=Count('id'),
+        pending_orders=Count('id', filter=Q(status='pending')),
+        active_orders=Count('id', filter=Q(status__in=ACTIVE_STATUSES, is_void=False)),
+        orders_today=Count('id', filter=Q(business_date=today)),
+        total_sales=Sum('total_amount', filter=Q(status='delivered')),
+        paid_amount=Sum('paid_amount'),
+    )
+    products = Product.objects.filter(is_active=True).aggregate(
+        low_stock_count=Count('id', filter=Q(stock_quantity__lt=LOW_STOCK_THRESHOLD)),
+        out_of_stock_count=Count('id', filter=Q(stock_quantity__lte=0)),
+    )
+    dispatched = OrderItemAllocation.objects.filter(
+        order_item__order__status__in=ACTIVE_STATUSES, order_item__is_void=False
+    ).aggregate(
+        total=Sum(F('quantity') * F('order_item__unit_price'))
+    )['total'] or 0
+    paid = orders['paid_amount'] or 0
+    recent = Order.objects.order_by('-created_at', '-id').values(
+        'id', 'order_number', 'status', 'total_amount', 'created_at', 'pharmacy__pharmacy_name'
+    )[:RECENT_ORDERS]
+    return {
+        'total_orders': orders['total_orders'],
+        'total_sales': orders['total_sales'] or 0,
+        'pending_orders': orders['pending_orders'],
+        'low_stock_count': products['low_stock_count'],
+        'active_orders': orders['active_orders'],
+        'orders_today': orders['orders_today'],
+        'out_of_stock_count': products['out_of_stock_count'],
+        'outstanding': {
+            'dispatched_amount': float(dispatched),
+            'paid_amount': float(paid),
+            'outstanding': float(max(0, dispatched - paid)),
+        },
+        'recent_orders': [
+            {
+                'id': o['id'],
+                'order_number': o['order_number'],
+                'pharmacy_name': o['pharmacy__pharmacy_name'] or '—',
+                'status': o['status'],
+                'total_amount': float(o['total_amount']),
+                'created_at': o['created_at'].isoformat() if o['created_at'] else None,
+            }
+            for o in recent
+        ],
+        'generated_at': timezone.now().isoformat(),
+    }
+
+
+def _versions():
+    return [topic_version(topic) for topic in DASHBOARD_TOPICS]
+
+
+def _compute_entry():
+    versions = _versions()
+    return {'stats': compute_dashboard_stats(), 'versions': versions, 'computed_at': time.time()}
+
+
+def refresh_dashboard_stats():
+    """Recompute and store the cached stats. Returns the new entry."""
+    entry = _compute_entry()
+    cache.set(DASHBOARD_CACHE_KEY, entry, None)
+    return entry
+
+
+def _refresh_stale():
+    """Recompute if no other request is already doing so; None when one is (the caller serves the stale entry)."""
+    lock_key = f'{DASHBOARD_CACHE_KEY}:refreshing'
+    if not cache.add(lock_key, 1, settings.REPORT_CACHE_LOCK_TIMEOUT):
+        return None
+    try:
+        return refresh_dashboard_stats()
+    finally:
+        cache.delete(lock_key)
+
+
+def dashboard_stats():
+    """
+    Dashboard stats, served from cache. An entry older than DASHBOARD_STATS_TTL, or computed before a write to
+    one of its topics, is recomputed by the one request that takes the refresh lock; concurrent requests are
+    served the stale entry meanwhile rather than queueing behind it.
+    """
+    entry = cache.get(DASHBOARD_CACHE_KEY)
+    if entry is None:
+        entry = single_flight(f'{DASHBOARD_CACHE_KEY}:initial', _compute_entry, settings.DASHBOARD_STATS_TTL)
+        cache.set(DASHBOARD_CACHE_KEY, entry, None)
+    elif time.time() - entry['computed_at'] > settings.DASHBOARD_STATS_TTL or entry['versions'] != _versions():
+        entry = _refresh_stale() or entry
+    return entry['stats']
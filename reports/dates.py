@@ -0,0 +1,48 @@
+from datetime import datetime, time, timedelta
+
+from django.db import models
+from django.utils import timezone
+
+
+def parse_date_range(request):
+    """Inclusive ?start_date= / ?end_date= (YYYY-MM-DD) as dates; None when absent or invalid."""
+    bounds = []
+    for param in ('start_date', 'end_date'):
+        value = request.query_params.get(param)
+        try:
+            bounds.append(datetime.strptime(value, '%Y-%m-%d').date() if value else None)
+        except ValueError:
+            bounds.append(None)
+    return tuple(bounds)
+
+
+def day_start(day):
+    """Aware datetime of local midnight at the start of day."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _is_datetime_field(model, path):
+    *relations, name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return isinstance(model._meta.get_field(name), models.DateTimeField)
+
+
+def date_range_q(model, field, start_d=None, end_d=None):
+    """
+    Inclusive start/end dates as a half-open range on field: field >= start and field < the day after end.
+    A date field (business_date) is compared with dates; a datetime field with local midnights. Either way the
+    column is compared as stored, so its index applies (no per-row date conversion as with __date).
+    """
+    q = models.Q()
+    as_bound = day_start if _is_datetime_field(model, field) else (lambda day: day)
+    if start_d:
+        q &= models.Q(**{f'{field}__gte': as_bound(start_d)})
+    if end_d:
+        q &= models.Q(**{f'{field}__lt': as_bound(end_d + timedelta(days=1))})
+    return q
+
+
+def filter_date_range(qs, field, start_d, end_d):
+    """Apply inclusive start/end dates (from parse_date_range) to qs as a half-open range on field."""
+    return qs.filter(date_range_q(qs.model, field, start_d, end_d))
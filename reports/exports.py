@@ -0,0 +1,248 @@
+import csv
+import io
+import itertools
+import json
+import re
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape, quoteattr
+
+from django.http import StreamingHttpResponse
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+class CSVRenderer(BaseRenderer):
+    """Lets ?format=csv through DRF content negotiation; export views stream the body themselves."""
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, default=str).encode() if data is not None else b''
+
+
+class JSONLinesRenderer(CSVRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'jsonl'
+
+
+class XLSXRenderer(CSVRenderer):
+    media_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    format = 'xlsx'
+
+
+# Formats whose body is streamed by the view rather than rendered from response.data
+STREAMED_FORMATS = ('csv', 'jsonl', 'xlsx')
+
+
+class ExportContentNegotiation(DefaultContentNegotiation):
+    """An explicit ?format= wins over the Accept header (download links, axios' application/json)."""
+    def select_renderer(self, request, renderers, format_suffix=None):
+        format_query = format_suffix or request.query_params.get(self.settings.URL_FORMAT_OVERRIDE)
+        if format_query:
+            for renderer in renderers:
+                if renderer.format == format_query:
+                    return renderer, renderer.media_type
+        return super().select_renderer(request, renderers, format_suffix)
+
+
+class _Echo:
+    """Pseudo-buffer for csv.writer: write() hands the formatted line back instead of storing it."""
+    def write(self, value):
+        return value
+
+
+def stream_csv(columns, rows, filename):
+    """Stream dict rows as CSV; only the current row is held in memory."""
+    writer = csv.writer(_Echo())
+
+    def generate():
+        yield writer.writerow([label for _, label in columns])
+        for row in rows:
+            yield writer.writerow([row.get(key, '') for key, _ in columns])
+
+    response = StreamingHttpResponse(generate(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def stream_jsonl(rows, filename):
+    """Stream dict rows as JSON Lines (one object per line)."""
+    response = StreamingHttpResponse(
+        (json.dumps(row, default=str) + '\n' for row in rows),
+        content_type='application/x-ndjson',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}.jsonl"'
+    return response
+
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name={sheet_name} sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+# Characters not allowed in XML 1.0 text
+_XML_INVALID = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+class _ZipSink(io.RawIOBase):
+    """Unseekable file object for ZipFile; drain() hands over what has been written since the last call."""
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _column_letter(index):
+    letters = ''
+    while index >= 0:
+        index, rem = divmod(index, 26)
+        letters = chr(65 + rem) + letters
+        index -= 1
+    return letters
+
+
+def _xlsx_row(row_number, values):
+    cells = []
+    for col, value in enumerate(values):
+        if value is None or value == '':
+            continue
+        ref = f'{_column_letter(col)}{row_number}'
+        if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+            cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+        else:
+            text = escape(_XML_INVALID.sub('', str(value)))
+            cells.append(f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return f'<row r="{row_number}">{"".join(cells)}</row>'
+
+
+def stream_xlsx(columns, rows, filename, sheet_name='Report'):
+    """
+    Stream dict rows as a single-sheet XLSX workbook. The sheet is written row by row into a zip that is
+    flushed to the client as it grows (inline strings, no shared-string table), so memory stays flat.
+    """
+    def generate():
+        sink = _ZipSink()
+        with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for name, content in XLSX_PARTS.items():
+                archive.writestr(name, content.replace('{sheet_name}', quoteattr(sheet_name[:31])))
+            yield sink.drain()
+            with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+                sheet.write(
+                    b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                    b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                )
+                sheet.write(_xlsx_row(1, [label for _, label in columns]).encode())
+                for row_number, row in enumerate(rows, start=2):
+                    sheet.write(_xlsx_row(row_number, [row.get(key) for key, _ in columns]).encode())
+                    if row_number % 500 == 0:
+                        yield sink.drain()
+                sheet.write(b'</sheetData></worksheet>')
+        yield sink.drain()
+
+    response = StreamingHttpResponse(generate(), content_type=XLSXRenderer.media_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.xlsx"'
+    return response
+
+
+def _default_columns(rows):
+    """Columns from the keys of the first row (peeked, then put back)."""
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return [], rows
+    return [(key, key.replace('_', ' ').title()) for key in first], itertools.chain([first], rows)
+
+
+def stream_rows(export_format, columns, rows, filename):
+    """Stream rows in the given format (csv, jsonl or xlsx); columns default to the first row's keys."""
+    if export_format == 'jsonl':
+        return stream_jsonl(rows, filename)
+    if columns is None:
+        columns, rows = _default_columns(rows)
+    if export_format == 'xlsx':
+        return stream_xlsx(columns, rows, filename)
+    return stream_csv(columns, rows, filename)
+
+
+class JSONErrorsMixin:
+    """Error responses are rendered as JSON even when a file format was negotiated (a 400 is not a CSV download)."""
+    def finalize_response(self, request, response, *args, **kwargs):
+        export_format = getattr(getattr(request, 'accepted_renderer', None), 'format', None)
+        if export_format in STREAMED_FORMATS and isinstance(response, Response) and response.status_code >= 400:
+            request.accepted_renderer, request.accepted_media_type = JSONRenderer(), JSONRenderer.media_type
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ExportableReportMixin(JSONErrorsMixin):
+    """
+    Adds ?format=csv|xlsx to a report APIView. Views that build large reports pass a lazy row iterable
+    (over .iterator() querysets) to report_response(), which streams it when exporting; any other 200
+    response is exported from its data (the list itself, data[export_rows_key], or a dict as one row).
+    """
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, CSVRenderer, XLSXRenderer]
+    content_negotiation_class = ExportContentNegotiation
+    export_formats = ('csv', 'xlsx')
+    export_columns = None  # [(key, label)]; default: keys of the first row
+    export_rows_key = None
+
+    def export_format(self, request):
+        export_format = getattr(getattr(request, 'accepted_renderer', None), 'format', None)
+        return export_format if export_format in self.export_formats else None
+
+    def export_filename(self):
+        name = re.sub(r'(Report|View)$', '', type(self).__name__)
+        return re.sub(r'(?<!^)(?=[A-Z])', '_', name).lower()
+
+    def report_response(self, request, rows, columns=None):
+        export_format = self.export_format(request)
+        if export_format:
+            return stream_rows(export_format, columns or self.export_columns, rows, self.export_filename())
+        return Response(list(rows))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        export_format = self.export_format(request)
+        if export_format and isinstance(response, Response) and response.status_code == 200:
+            data = response.data
+            if isinstance(data, dict):
+                data = data[self.export_rows_key] if self.export_rows_key else [data]
+            response = stream_rows(export_format, self.export_columns, data, self.export_filename())
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,100 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+
+from orders.models import OrderItemAllocation
+from .models import SalesFact
+
+FACT_MEASURES = ('quantity', 'free_quantity', 'value', 'taxable_value', 'gst_amount')
+MONEY_PLACES = Decimal('0.01')
+
+
+def allocation_delta(allocation, order_item, pharmacy_id, dispatched_before, sign=1):
+    """
+    ((business_date, product_id, pharmacy_id), measures) contributed by one allocation, negated with sign=-1.
+    dispatched_before is the line's quantity dispatched by earlier allocations: free units are credited in
+    proportion to the dispatched quantity, rounded down cumulatively so a fully dispatched line totals free_qty.
+    """
+    dispatched_after = dispatched_before + allocation.quantity
+    free = 0
+    if order_item.free_qty and order_item.quantity:
+        free = order_item.free_qty * dispatched_after // order_item.quantity - order_item.free_qty * dispatched_before // order_item.quantity
+    value = allocation.quantity * order_item.unit_price
+    taxable = (value * 100 / (100 + order_item.gst_rate)).quantize(MONEY_PLACES)
+    key = (allocation.business_date, order_item.product_id, pharmacy_id)
+    return key, {
+        'quantity': sign * allocation.quantity,
+        'free_quantity': sign * free,
+        'value': sign * value,
+        'taxable_value': sign * taxable,
+        'gst_amount': sign * (value - taxable),
+    }
+
+
+def _merge(deltas):
+    merged = defaultdict(lambda: dict.fromkeys(FACT_MEASURES, 0))
+    for key, measures in deltas:
+        for field, amount in measures.items():
+            merged[key][field] += amount
+    return merged
+
+
+def _ordered_deltas(allocations, sign=1):
+    """Deltas for allocations ordered by (order_item, created_at, id), tracking each line's dispatched quantity."""
+    dispatched = defaultdict(int)
+    for allocation in allocations:
+        order_item = allocation.order_item
+        yield allocation_delta(allocation, order_item, order_item.order.pharmacy_id, dispatched[order_item.id], sign)
+        dispatched[order_item.id] += allocation.quantity
+
+
+def apply_deltas(deltas):
+    """
+    Add deltas to SalesFact with one INSERT ... ON CONFLICT DO UPDATE per batch (PostgreSQL and SQLite), so
+    concurrent dispatches on the same (date, product, pharmacy) increment rather than overwrite each other.
+    """
+    rows = [
+        (business_date, product_id, pharmacy_id, *(measures[field] for field in FACT_MEASURES))
+        for (business_date, product_id, pharmacy_id), measures in _merge(deltas).items()
+    ]
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    table = quote(SalesFact._meta.db_table)
+    columns = ('business_date', 'product_id', 'pharmacy_id', *FACT_MEASURES)
+    sql = (
+        f"INSERT INTO {table} ({', '.join(map(quote, columns))}) VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON CONFLICT ({', '.join(map(quote, columns[:3]))}) DO UPDATE SET "
+        + ', '.join(f'{quote(field)} = {table}.{quote(field)} + excluded.{quote(field)}' for field in FACT_MEASURES)
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def void_order_items(order_items):
+    """
+    Take the dispatched quantities of order lines that are being voided back out of SalesFact.
+    Returns the (negative) change in dispatched value.
+    """
+    allocations = OrderItemAllocation.objects.filter(
+        order_item__in=order_items, order_item__is_void=False
+    ).select_related('order_item__order').order_by('order_item_id', 'created_at', 'id')
+    deltas = list(_ordered_deltas(allocations, sign=-1))
+    apply_deltas(deltas)
+    return sum((measures['value'] for _, measures in deltas), Decimal('0'))
+
+
+def rebuild_sales_facts():
+    """Recompute SalesFact from every non-void allocation, replacing the table. Returns the number of fact rows."""
+    allocations = OrderItemAllocation.objects.filter(order_item__is_void=False).select_related(
+        'order_item__order'
+    ).order_by('order_item_id', 'created_at', 'id').iterator(chunk_size=2000)
+    facts = [
+        SalesFact(business_date=business_date, product_id=product_id, pharmacy_id=pharmacy_id, **measures)
+        for (business_date, product_id, pharmacy_id), measures in _merge(_ordered_deltas(allocations)).items()
+    ]
+    with transaction.atomic():
+        SalesFact.objects.all().delete()
+        SalesFact.objects.bulk_create(facts, batch_size=2000)
+    return len(facts)
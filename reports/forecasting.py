@@ -0,0 +1,98 @@
+import math
+from datetime import timedelta
+from statistics import NormalDist
+
+import numpy as np
+from django.db.models import Sum
+from django.utils import timezone
+
+from orders.models import OrderItemAllocation
+from products.models import Product
+from .models import DemandForecast
+
+
+def demand_matrix(product_ids, start, days):
+    """
+    Daily dispatched units per product as an array of shape (len(product_ids), days); column 0 is `start`.
+    Built from one grouped query over allocations (void lines excluded).
+    """
+    rows = OrderItemAllocation.objects.filter(
+        business_date__gte=start, business_date__lt=start + timedelta(days=days), order_item__is_void=False
+    ).order_by().values_list('order_item__product_id', 'business_date').annotate(units=Sum('quantity'))
+    index = {pid: i for i, pid in enumerate(product_ids)}
+    cells = [(index[pid], (day - start).days, units) for pid, day, units in rows if pid in index]
+    matrix = np.zeros((len(product_ids), days))
+    if cells:
+        r, c, units = np.array(cells, dtype=np.int64).T
+        np.add.at(matrix, (r, c), units)
+    return matrix
+
+
+def forecast(matrix, method='ema', window=28, alpha=0.2):
+    """
+    Vectorized over all products (rows): forecast daily demand and its standard deviation over the last `window` days.
+    sma = mean of the window; ema = exponentially weighted mean of the whole history (newest day weight 1, then 1 - alpha, ...).
+    """
+    recent = matrix[:, -window:]
+    if method == 'sma':
+        daily = recent.mean(axis=1)
+    else:
+        weights = (1 - alpha) ** np.arange(matrix.shape[1])[::-1]
+        daily = matrix @ (weights / weights.sum())
+    std = recent.std(axis=1, ddof=1) if recent.shape[1] > 1 else np.zeros(len(matrix))
+    return daily, std
+
+
+def reorder_points(daily, std, lead_time_days, service_level):
+    """Safety stock (z * std * sqrt(lead time)) and reorder point (lead-time demand + safety stock), rounded up."""
+    z = NormalDist().inv_cdf(service_level)
+    safety = np.ceil(z * std * math.sqrt(lead_time_days))
+    reorder = np.ceil(daily * lead_time_days + safety)
+    return safety.astype(np.int64), reorder.astype(np.int64)
+
+
+def run_forecast(method='ema', history_days=90, window=28, alpha=0.2, lead_time_days=7, service_level=0.95):
+    """
+    Recompute DemandForecast for every active product from the last `history_days` complete days of dispatches.
+    One read query for demand, one for stock, and batched upserts. Returns the number of products forecast.
+    """
+    products = list(Product.objects.filter(is_active=True).order_by('id').values_list('id', 'stock_quantity'))
+    if not products:
+        return 0
+    ids = [pid for pid, _ in products]
+    stock = np.array([qty for _, qty in products], dtype=float)
+    start = timezone.localdate() - timedelta(days=history_days)
+    matrix = demand_matrix(ids, start, history_days)
+    daily, std = forecast(matrix, method=method, window=min(window, history_days), alpha=alpha)
+    safety, reorder = reorder_points(daily, std, lead_time_days, service_level)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cover = np.where(daily > 0, stock / daily, np.nan)
+
+    now = timezone.now()
+    forecasts = [
+        DemandForecast(
+            product_id=pid,
+            method=method,
+            daily_demand=round(float(daily[i]), 4),
+            demand_std=round(float(std[i]), 4),
+            lead_time_days=lead_time_days,
+            safety_stock=int(safety[i]),
+            reorder_point=int(reorder[i]),
+            days_of_cover=None if np.isnan(cover[i]) else round(float(max(cover[i], 0)), 1),
+            history_days=history_days,
+            computed_at=now,
+        )
+        for i, pid in enumerate(ids)
+    ]
+    DemandForecast.objects.bulk_create(
+        forecasts,
+        batch_size=2000,
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=[
+            'method', 'daily_demand', 'demand_std', 'lead_time_days', 'safety_stock',
+            'reorder_point', 'days_of_cover', 'history_days', 'computed_at',
+        ],
+    )
+    DemandForecast.objects.filter(product__is_active=False).delete()
+    return len(forecasts)
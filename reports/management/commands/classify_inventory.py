@@ -0,0 +1,33 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.cache import bump_topics
+from reports.classification import classify_closed_months, classify_period
+
+
+class Command(BaseCommand):
+    help = 'Store ABC/XYZ inventory classes for each newly closed month (run daily or monthly; no-op when up to date).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window-months', type=int, default=12, help='Closed months of dispatch history per classification')
+        parser.add_argument('--month', help='Recompute one month (YYYY-MM) instead of the incremental run')
+
+    def handle(self, *args, **options):
+        window = options['window_months']
+        if window < 1:
+            raise CommandError('--window-months must be positive.')
+        if options['month']:
+            try:
+                period = datetime.strptime(options['month'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('--month must be YYYY-MM.')
+            classify_period(period, window)
+            periods = [period]
+        else:
+            periods = classify_closed_months(window)
+        if periods:
+            bump_topics('stock')
+        self.stdout.write(self.style.SUCCESS(
+            f"Classified {len(periods)} month(s){': ' + ', '.join(p.strftime('%Y-%m') for p in periods) if periods else ' (up to date)'}."
+        ))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.cache import bump_topics
+from reports.forecasting import run_forecast
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-product demand forecasts, reorder points and days of cover from dispatch history (run nightly).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--method', choices=['ema', 'sma'], default='ema')
+        parser.add_argument('--history-days', type=int, default=90, help='Days of dispatch history to use')
+        parser.add_argument('--window', type=int, default=28, help='Days used for the moving average and demand variability')
+        parser.add_argument('--alpha', type=float, default=0.2, help='Smoothing factor for ema')
+        parser.add_argument('--lead-time', type=int, default=7, help='Supplier lead time in days')
+        parser.add_argument('--service-level', type=float, default=0.95, help='Target probability of not stocking out during lead time')
+
+    def handle(self, *args, **options):
+        if options['history_days'] < 1 or options['window'] < 1:
+            raise CommandError('--history-days and --window must be positive.')
+        if not 0 < options['alpha'] <= 1 or not 0.5 <= options['service_level'] < 1:
+            raise CommandError('--alpha must be in (0, 1] and --service-level in [0.5, 1).')
+        count = run_forecast(
+            method=options['method'],
+            history_days=options['history_days'],
+            window=options['window'],
+            alpha=options['alpha'],
+            lead_time_days=options['lead_time'],
+            service_level=options['service_level'],
+        )
+        bump_topics('stock')
+        self.stdout.write(self.style.SUCCESS(f'Forecast {count} products.'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from reports.account_summary import rebuild_account_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recompute every PharmacyAccountSummary from orders, allocations and invoices (to repair drift).'
+
+    def handle(self, *args, **options):
+        count = rebuild_account_summaries()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} pharmacy account summaries.'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from reports.cache import bump_topics
+from reports.facts import rebuild_sales_facts
+
+
+class Command(BaseCommand):
+    help = 'Recompute the SalesFact table from all dispatched allocations (after deploying it, or to repair drift).'
+
+    def handle(self, *args, **options):
+        count = rebuild_sales_facts()
+        bump_topics('dispatch')
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} sales fact rows.'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from reports import views  # noqa: F401 (registers the @snapshot_report views)
+from reports.snapshots import SNAPSHOT_REPORTS, prune_snapshots, take_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Store close-of-business snapshots of the registered reports, served to ?as_of=latest (run from cron after close).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--report', action='append', choices=sorted(SNAPSHOT_REPORTS), help='Only this report (repeatable)')
+        parser.add_argument('--keep-days', type=int, default=35, help='Delete snapshots older than this many days')
+
+    def handle(self, *args, **options):
+        if options['keep_days'] < 1:
+            raise CommandError('--keep-days must be positive.')
+        taken = 0
+        for report_key in options['report'] or sorted(SNAPSHOT_REPORTS):
+            _, param_sets = SNAPSHOT_REPORTS[report_key]
+            for params in param_sets:
+                snapshot = take_snapshot(report_key, params)
+                taken += 1
+                self.stdout.write(f'{report_key} {snapshot.params_key}: {len(snapshot.payload)} bytes')
+        pruned = prune_snapshots(options['keep_days'])
+        self.stdout.write(self.style.SUCCESS(f'Stored {taken} report snapshots; pruned {pruned}.'))
@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from reports.cache import bump_topics
+from reports.turnover import take_stock_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Store closing stock per product for the day (run nightly, after the last dispatch). Re-running a day overwrites it.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Snapshot date (YYYY-MM-DD, default today); past dates are rolled back from current stock')
+        parser.add_argument('--days', type=int, default=1, help='Backfill this many days ending with --date')
+
+    def handle(self, *args, **options):
+        end = timezone.localdate()
+        if options['date']:
+            try:
+                end = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--date must be YYYY-MM-DD.')
+        if options['days'] < 1:
+            raise CommandError('--days must be positive.')
+        rows = 0
+        for offset in range(options['days'] - 1, -1, -1):
+            rows += take_stock_snapshot(end - timedelta(days=offset))
+        bump_topics('stock')
+        self.stdout.write(self.style.SUCCESS(f"Stored {rows} snapshot rows for {options['days']} day(s) up to {end}."))
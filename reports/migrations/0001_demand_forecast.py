@@ -0,0 +1,32 @@
+# Generated by Django 5.2.11 on 2026-10-19 00:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('products', '0012_remove_product_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(choices=[('sma', 'Moving average'), ('ema', 'Exponential smoothing')], max_length=10)),
+                ('daily_demand', models.FloatField(help_text='Forecast units dispatched per day')),
+                ('demand_std', models.FloatField(help_text='Standard deviation of daily demand over the history window')),
+                ('lead_time_days', models.PositiveIntegerField()),
+                ('safety_stock', models.PositiveIntegerField()),
+                ('reorder_point', models.PositiveIntegerField(db_index=True)),
+                ('days_of_cover', models.FloatField(blank=True, help_text='Stock on hand / daily demand at computation time; null when there is no demand', null=True)),
+                ('history_days', models.PositiveIntegerField()),
+                ('computed_at', models.DateTimeField()),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='demand_forecast', to='products.product')),
+            ],
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.11 on 2026-10-19 00:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_remove_product_image'),
+        ('reports', '0001_demand_forecast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryClass',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_end', models.DateField(help_text='Last day of the last month in the window (the classification date)')),
+                ('window_months', models.PositiveIntegerField()),
+                ('abc_class', models.CharField(choices=[('A', 'A'), ('B', 'B'), ('C', 'C')], max_length=1)),
+                ('xyz_class', models.CharField(choices=[('X', 'X'), ('Y', 'Y'), ('Z', 'Z')], max_length=1)),
+                ('sales_value', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('value_share', models.FloatField(help_text='Share of total sales value in the window (0-1)')),
+                ('cumulative_share', models.FloatField(help_text='Cumulative value share of this and all higher-value products')),
+                ('quantity', models.PositiveIntegerField()),
+                ('demand_cv', models.FloatField(blank=True, help_text='Coefficient of variation of monthly units; null without demand', null=True)),
+                ('computed_at', models.DateTimeField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_classes', to='products.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period_end', 'abc_class', 'xyz_class'], name='reports_invclass_period_idx')],
+                'unique_together': {('product', 'period_end')},
+            },
+        ),
+    ]
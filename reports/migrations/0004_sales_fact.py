@@ -0,0 +1,34 @@
+# Generated by Django 5.2.11 on 2026-10-19 00:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacies', '0001_initial'),
+        ('products', '0013_last_dispatched_at'),
+        ('reports', '0003_stock_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('business_date', models.DateField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('free_quantity', models.IntegerField(default=0, help_text='Free units shipped with the dispatched quantity (pro rata per line)')),
+                ('value', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('taxable_value', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('gst_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('pharmacy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_facts', to='pharmacies.pharmacy')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_facts', to='products.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'business_date'], name='reports_salesfact_product_idx'), models.Index(fields=['pharmacy', 'business_date'], name='reports_salesfact_pharmacy_idx')],
+                'unique_together': {('business_date', 'product', 'pharmacy')},
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.11 on 2026-10-19 00:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0004_sales_fact'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report_key', models.CharField(max_length=50)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('params_key', models.CharField(default='{}', max_length=255)),
+                ('generated_at', models.DateTimeField()),
+                ('payload', models.BinaryField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['report_key', 'params_key', '-generated_at'], name='reports_snapshot_latest_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.11 on 2026-10-19 01:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacies', '0001_initial'),
+        ('reports', '0005_report_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PharmacyAccountSummary',
+            fields=[
+                ('pharmacy', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='account_summary', serialize=False, to='pharmacies.pharmacy')),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('pending_orders', models.PositiveIntegerField(default=0)),
+                ('approved_orders', models.PositiveIntegerField(default=0)),
+                ('rejected_orders', models.PositiveIntegerField(default=0)),
+                ('processing_orders', models.PositiveIntegerField(default=0)),
+                ('shipped_orders', models.PositiveIntegerField(default=0)),
+                ('delivered_orders', models.PositiveIntegerField(default=0)),
+                ('dispatched_amount', models.DecimalField(decimal_places=2, default=0, help_text='Dispatched value of non-void lines on approved/processing/shipped/delivered orders', max_digits=14)),
+                ('paid_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('last_order_number', models.CharField(blank=True, default='', max_length=30)),
+                ('last_order_at', models.DateTimeField(blank=True, null=True)),
+                ('last_invoice_number', models.CharField(blank=True, default='', max_length=30)),
+                ('last_invoice_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -1,3 +1,137 @@
 from django.db import models
 
-# Create your models here.
+
+class DemandForecast(models.Model):
+    """Latest demand forecast and reorder point per product, written by the forecast_demand command (reports.forecasting)."""
+    METHOD_CHOICES = (('sma', 'Moving average'), ('ema', 'Exponential smoothing'))
+    product = models.OneToOneField('products.Product', on_delete=models.CASCADE, related_name='demand_forecast')
+    method = models.CharField(max_length=10, choices=METHOD_CHOICES)
+    daily_demand = models.FloatField(help_text='Forecast units dispatched per day')
+    demand_std = models.FloatField(help_text='Standard deviation of daily demand over the history window')
+    lead_time_days = models.PositiveIntegerField()
+    safety_stock = models.PositiveIntegerField()
+    reorder_point = models.PositiveIntegerField(db_index=True)
+    days_of_cover = models.FloatField(null=True, blank=True, help_text='Stock on hand / daily demand at computation time; null when there is no demand')
+    history_days = models.PositiveIntegerField()
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.product_id}: {self.daily_demand:.2f}/day, reorder at {self.reorder_point}"
+
+
+class InventoryClass(models.Model):
+    """
+    ABC (share of sales value) and XYZ (variability of monthly demand) class of a product over the window_months
+    closed months ending with period_end's month. One snapshot per product per month (reports.classification).
+    """
+    ABC_CHOICES = (('A', 'A'), ('B', 'B'), ('C', 'C'))
+    XYZ_CHOICES = (('X', 'X'), ('Y', 'Y'), ('Z', 'Z'))
+    product = models.ForeignKey('products.Product', on_delete=models.CASCADE, related_name='inventory_classes')
+    period_end = models.DateField(help_text='Last day of the last month in the window (the classification date)')
+    window_months = models.PositiveIntegerField()
+    abc_class = models.CharField(max_length=1, choices=ABC_CHOICES)
+    xyz_class = models.CharField(max_length=1, choices=XYZ_CHOICES)
+    sales_value = models.DecimalField(max_digits=14, decimal_places=2)
+    value_share = models.FloatField(help_text='Share of total sales value in the window (0-1)')
+    cumulative_share = models.FloatField(help_text='Cumulative value share of this and all higher-value products')
+    quantity = models.PositiveIntegerField()
+    demand_cv = models.FloatField(null=True, blank=True, help_text='Coefficient of variation of monthly units; null without demand')
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = [('product', 'period_end')]
+        indexes = [models.Index(fields=['period_end', 'abc_class', 'xyz_class'], name='reports_invclass_period_idx')]
+
+    def __str__(self):
+        return f"{self.product_id} {self.abc_class}{self.xyz_class} ({self.period_end})"
+
+
+class StockSnapshot(models.Model):
+    """Closing stock of one product on one day, at landed cost (reports.turnover). Written in bulk by snapshot_stock."""
+    snapshot_date = models.DateField()
+    product = models.ForeignKey('products.Product', on_delete=models.CASCADE, related_name='stock_snapshots')
+    quantity = models.IntegerField()
+    value = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        unique_together = [('snapshot_date', 'product')]
+
+    def __str__(self):
+        return f"{self.product_id} on {self.snapshot_date}: {self.quantity}"
+
+
+class SalesFact(models.Model):
+    """
+    Dispatched sales per product, pharmacy and business date (local date of the allocation), maintained by
+    increments in the dispatch and void paths (reports.facts) and rebuilt by rebuild_sales_facts.
+    Values are GST-inclusive line prices; taxable_value + gst_amount = value.
+    """
+    business_date = models.DateField()
+    product = models.ForeignKey('products.Product', on_delete=models.CASCADE, related_name='sales_facts')
+    pharmacy = models.ForeignKey('pharmacies.Pharmacy', on_delete=models.CASCADE, related_name='sales_facts')
+    quantity = models.IntegerField(default=0)
+    free_quantity = models.IntegerField(default=0, help_text='Free units shipped with the dispatched quantity (pro rata per line)')
+    value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    taxable_value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    gst_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = [('business_date', 'product', 'pharmacy')]
+        indexes = [
+            models.Index(fields=['product', 'business_date'], name='reports_salesfact_product_idx'),
+            models.Index(fields=['pharmacy', 'business_date'], name='reports_salesfact_pharmacy_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.business_date} {self.product_id}/{self.pharmacy_id}: {self.quantity}"
+
+
+class ReportSnapshot(models.Model):
+    """
+    A report's JSON response generated off-peak by snapshot_reports (reports.snapshots), served to ?as_of=latest.
+    payload is zlib-compressed JSON; params_key is the canonical JSON of params, for lookups.
+    """
+    report_key = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True)
+    params_key = models.CharField(max_length=255, default='{}')
+    generated_at = models.DateTimeField()
+    payload = models.BinaryField()
+
+    class Meta:
+        indexes = [models.Index(fields=['report_key', 'params_key', '-generated_at'], name='reports_snapshot_latest_idx')]
+
+    def __str__(self):
+        return f"{self.report_key} {self.params_key} @ {self.generated_at:%Y-%m-%d %H:%M}"
+
+
+class PharmacyAccountSummary(models.Model):
+    """
+    Read model behind the pharmacy portal: one row per pharmacy, keyed by the pharmacy. Kept current by
+    increments in the order, dispatch, payment and void paths (reports.account_summary); built from the
+    orders on first use and rebuilt by rebuild_account_summaries.
+    """
+    pharmacy = models.OneToOneField('pharmacies.Pharmacy', on_delete=models.CASCADE, primary_key=True, related_name='account_summary')
+    order_count = models.PositiveIntegerField(default=0)
+    pending_orders = models.PositiveIntegerField(default=0)
+    approved_orders = models.PositiveIntegerField(default=0)
+    rejected_orders = models.PositiveIntegerField(default=0)
+    processing_orders = models.PositiveIntegerField(default=0)
+    shipped_orders = models.PositiveIntegerField(default=0)
+    delivered_orders = models.PositiveIntegerField(default=0)
+    dispatched_amount = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0,
+        help_text='Dispatched value of non-void lines on approved/processing/shipped/delivered orders',
+    )
+    paid_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    last_order_number = models.CharField(max_length=30, blank=True, default='')
+    last_order_at = models.DateTimeField(null=True, blank=True)
+    last_invoice_number = models.CharField(max_length=30, blank=True, default='')
+    last_invoice_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def outstanding(self):
+        return max(self.dispatched_amount - self.paid_amount, 0)
+
+    def __str__(self):
+        return f"{self.pharmacy_id}: {self.order_count} orders, outstanding {self.outstanding}"
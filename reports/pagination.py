@@ -0,0 +1,82 @@
+import json
+
+from django.db import connections
+from rest_framework.pagination import CursorPagination
+
+
+def estimate_count(queryset):
+    """Planner row estimate on PostgreSQL (no scan); exact count elsewhere."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class ReportCursorPagination(CursorPagination):
+    """
+    Keyset pagination for report lists: ?cursor= continues from the last row of the previous page, so
+    every page costs the same at any depth. Sorted in SQL by the view's `ordering`, or by ?ordering= when
+    it names one of the view's `ordering_fields`; id (or `tiebreaker`, the group key of a grouped list) breaks ties.
+    ?count=exact|estimate adds a total.
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    count_query_param = 'count'
+    default_ordering = None
+    tiebreaker = 'id'
+
+    def __init__(self, ordering=None, cursor_query_param=None, tiebreaker=None):
+        # Views with more than one paginated list give each its own ordering and cursor parameter.
+        if ordering is not None:
+            self.default_ordering = ordering
+        if cursor_query_param is not None:
+            self.cursor_query_param = cursor_query_param
+        if tiebreaker is not None:
+            self.tiebreaker = tiebreaker
+
+    def get_ordering(self, request, queryset, view):
+        default = self.default_ordering or getattr(view, 'ordering', None) or self.ordering
+        requested = request.query_params.get('ordering', '')
+        if requested.lstrip('-') in getattr(view, 'ordering_fields', ()):
+            ordering = [requested]
+        else:
+            ordering = [default] if isinstance(default, str) else list(default)
+        if not any(field.lstrip('-') in ('id', 'pk', self.tiebreaker) for field in ordering):
+            ordering.append(('-' if ordering[0].startswith('-') else '') + self.tiebreaker)
+        return tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'estimate':
+            self.count = estimate_count(queryset)
+        elif mode == 'exact':
+            self.count = queryset.count()
+        else:
+            self.count = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data = {'count': self.count, **response.data}
+        return response
+
+
+def paginated_report(view, request, queryset, to_row, paginator=None):
+    """
+    A report list as one keyset page of to_row(record), or, when the view is exporting (?format=csv|xlsx),
+    every row in the same order streamed from an iterator.
+    """
+    paginator = paginator or ReportCursorPagination()
+    if view.export_format(request):
+        ordered = queryset.order_by(*paginator.get_ordering(request, queryset, view))
+        return view.report_response(request, (to_row(r) for r in ordered.iterator(chunk_size=2000)))
+    page = paginator.paginate_queryset(queryset, request, view=view)
+    return paginator.get_paginated_response([to_row(r) for r in page])
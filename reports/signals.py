@@ -0,0 +1,32 @@
+from django.db.models.signals import post_save, post_delete
+
+from orders.models import Order, OrderItem, OrderItemAllocation, Dispatch
+from products.models import Product, StockBatch, Purchase, PurchaseItem
+from invoices.models import Invoice
+from .cache import bump_topics_on_commit
+
+# Model writes -> report cache topics they invalidate. Order carries paid_amount, so it also bumps payments.
+MODEL_TOPICS = {
+    Order: ('orders', 'payments'),
+    OrderItem: ('orders',),
+    Invoice: ('orders',),
+    Dispatch: ('dispatch',),
+    OrderItemAllocation: ('dispatch', 'stock'),
+    Purchase: ('purchases',),
+    PurchaseItem: ('purchases',),
+    Product: ('stock',),
+    StockBatch: ('stock',),
+}
+
+
+def _bump_for(topics):
+    def handler(sender, **kwargs):
+        bump_topics_on_commit(*topics)
+    return handler
+
+
+def connect():
+    for model, topics in MODEL_TOPICS.items():
+        handler = _bump_for(topics)
+        post_save.connect(handler, sender=model, weak=False, dispatch_uid=f'report_cache_{model.__name__}_save')
+        post_delete.connect(handler, sender=model, weak=False, dispatch_uid=f'report_cache_{model.__name__}_delete')
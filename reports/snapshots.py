@@ -0,0 +1,105 @@
+import inspect
+import json
+import zlib
+from datetime import timedelta
+from functools import wraps
+
+from django.http import HttpRequest, QueryDict
+from django.utils import timezone
+from django.utils.http import urlencode
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import ReportSnapshot
+
+# report key -> (view class, parameter sets snapshotted by snapshot_reports); filled by @snapshot_report
+SNAPSHOT_REPORTS = {}
+# Query parameters that do not change a report's data
+IGNORED_PARAMS = ('as_of', 'format')
+
+
+def params_key(params):
+    return json.dumps(params, sort_keys=True, separators=(',', ':'))
+
+
+def request_params(request):
+    return {k: v for k, v in request.query_params.items() if k not in IGNORED_PARAMS}
+
+
+def call_report_view(view_class, params, user=None, path='/', base_request=None, cached=True):
+    """
+    Run a report view's GET in-process with the given query parameters and return its Response (JSON renderer).
+    No HTTP round trip, authentication or permission checks: callers decide who may see the result.
+    base_request (an HttpRequest) supplies the host for absolute links such as pagination cursors.
+    cached=False runs the undecorated GET, bypassing @cached_report, so the data is computed now.
+    """
+    http_request = HttpRequest()
+    http_request.method = 'GET'
+    http_request.path = path
+    http_request.GET = QueryDict(urlencode(params))
+    http_request.META.update({'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'QUERY_STRING': urlencode(params)})
+    if base_request is not None:
+        http_request.META.update({
+            k: v for k, v in base_request.META.items()
+            if k in ('HTTP_HOST', 'SERVER_NAME', 'SERVER_PORT')
+        })
+    view = view_class()
+    view.args, view.kwargs, view.headers, view.format_kwarg = (), {}, {}, None
+    request = view.initialize_request(http_request)
+    if user is not None:
+        request.user = user
+    view.request = request
+    request.accepted_renderer, request.accepted_media_type = view.perform_content_negotiation(request)
+    if not cached:
+        return inspect.unwrap(view_class.get)(view, request)
+    return view.get(request)
+
+
+def take_snapshot(report_key, params=None):
+    """Generate one report with params and store its response data. Returns the ReportSnapshot."""
+    view_class, _ = SNAPSHOT_REPORTS[report_key]
+    params = params or {}
+    response = call_report_view(view_class, params, cached=False)
+    if response.status_code != 200:
+        raise ValueError(f'{report_key} {params} returned {response.status_code}: {response.data}')
+    payload = zlib.compress(json.dumps(response.data, cls=JSONEncoder).encode())
+    return ReportSnapshot.objects.create(
+        report_key=report_key, params=params, params_key=params_key(params), generated_at=timezone.now(), payload=payload,
+    )
+
+
+def latest_snapshot(report_key, params):
+    return ReportSnapshot.objects.filter(
+        report_key=report_key, params_key=params_key(params)
+    ).order_by('-generated_at').first()
+
+
+def prune_snapshots(keep_days):
+    return ReportSnapshot.objects.filter(generated_at__lt=timezone.now() - timedelta(days=keep_days)).delete()[0]
+
+
+def snapshot_report(report_key, *param_sets):
+    """
+    Class decorator registering a report view for snapshot_reports with the parameter sets to generate
+    (default: no parameters). The view then answers ?as_of=latest with the newest snapshot taken with the same
+    parameters (format aside) instead of querying, with its time in the X-Snapshot-Generated-At header.
+    """
+    def decorator(view_class):
+        SNAPSHOT_REPORTS[report_key] = (view_class, list(param_sets) or [{}])
+        get = view_class.get
+
+        @wraps(get)
+        def wrapper(self, request, *args, **kwargs):
+            if request.query_params.get('as_of') != 'latest':
+                return get(self, request, *args, **kwargs)
+            snapshot = latest_snapshot(report_key, request_params(request))
+            if snapshot is None:
+                return Response({'detail': 'No snapshot of this report with these parameters yet.'}, status=404)
+            return Response(
+                json.loads(zlib.decompress(bytes(snapshot.payload))),
+                headers={'X-Snapshot-Generated-At': snapshot.generated_at.isoformat()},
+            )
+
+        view_class.get = wrapper
+        return view_class
+    return decorator
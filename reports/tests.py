@@ -1,3 +1,1219 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import random
+import time
+import zipfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock
+from xml.etree import ElementTree
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.views import APIView
+
+from accounts.models import User
+from invoices.models import Invoice
+from orders import ledger
+from orders.models import LedgerEntry, Order, OrderItem
+from orders.testing import OrderFlowMixin
+from pharmacies.models import Pharmacy
+from products.models import Category, Product, Purchase, PurchaseItem, StockBatch
+from .cache import bump_topics, cached_report, single_flight
+from .dashboard import DASHBOARD_CACHE_KEY, dashboard_stats
+from .dates import date_range_q, day_start
+from .exports import (
+    XLSX_PARTS, CSVRenderer, ExportableReportMixin, _ZipSink, stream_csv, stream_jsonl, stream_rows, stream_xlsx,
+)
+from .classification import classify, classify_closed_months, last_closed_month_end
+from .facts import FACT_MEASURES, apply_deltas, rebuild_sales_facts
+from .forecasting import demand_matrix, forecast, reorder_points
+from .models import DemandForecast, InventoryClass, ReportSnapshot, SalesFact, StockSnapshot
+from .pagination import ReportCursorPagination, paginated_report
+from .views import StockExpiryReport
+from .valuation import valued_batches
+
+PHARMACIES = 50
+PRODUCTS = 500
+ORDERS = 20000
+INVOICES = 5000
+PURCHASES = 2000
+
+
+def explain_indexes(sql, params=()):
+    """Names of the indexes the planner uses for sql (SQLite EXPLAIN QUERY PLAN, PostgreSQL EXPLAIN JSON)."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Whether an index is usable, not whether the planner prefers it on this synthetic data.
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            names, nodes = set(), [plan[0]['Plan']]
+            while nodes:
+                node = nodes.pop()
+                if 'Index Name' in node:
+                    names.add(node['Index Name'])
+                nodes.extend(node.get('Plans', []))
+            return names
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return {row[-1].split(' INDEX ')[1].split(' ')[0] for row in cursor.fetchall() if ' INDEX ' in row[-1]}
+
+
+class HotQueryIndexTests(TestCase):
+    """Each hot endpoint's main query, captured from a real request over a large synthetic dataset, uses its index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(48)
+        today = timezone.localdate()
+        category = Category.objects.create(name='Synthetic')
+        pharmacies = Pharmacy.objects.bulk_create([
+            Pharmacy(pharmacy_name=f'Pharmacy {i}', license_number=f'DL-{i}', gst_number=f'29AAAAA{i:04d}A1Z5',
+                     contact_person='Owner', phone='9000000000', email=f'p{i}@example.com', address='Address')
+            for i in range(PHARMACIES)
+        ])
+        products = Product.objects.bulk_create([
+            Product(name=f'Product {i}', category=category, mrp=100, selling_price=80, stock_quantity=rng.randint(0, 500),
+                    is_active=rng.random() > 0.1)
+            for i in range(PRODUCTS)
+        ])
+        StockBatch.objects.bulk_create([
+            StockBatch(product=p, batch_number=f'B{n}', expiry_date=today + timedelta(days=rng.randint(-60, 900)),
+                       quantity=rng.choice([0, rng.randint(1, 200)]))
+            for p in products for n in range(3)
+        ])
+        statuses = ['pending', 'approved', 'processing', 'shipped', 'delivered', 'rejected']
+        orders = []
+        for i in range(ORDERS):
+            day = today - timedelta(days=rng.randint(0, 720))
+            orders.append(Order(
+                pharmacy=rng.choice(pharmacies), order_number=f'ORD-SYN-{i:06d}', status=rng.choice(statuses),
+                total_amount=Decimal('160.00'), is_void=rng.random() < 0.02, business_date=day,
+            ))
+        orders = Order.objects.bulk_create(orders, batch_size=2000)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=o, product=rng.choice(products), quantity=2, unit_price=80, total_price=160, is_void=rng.random() < 0.02)
+            for o in orders for _ in range(2)
+        ], batch_size=4000)
+        Invoice.objects.bulk_create([
+            Invoice(order=o, invoice_number=f'INV-SYN-{n:06d}', business_date=o.business_date)
+            for n, o in enumerate(orders[:INVOICES])
+        ], batch_size=2000)
+        Purchase.objects.bulk_create([
+            Purchase(supplier_name=f'Supplier {i % 40}', status='pending' if i % 50 == 0 else 'approved')
+            for i in range(PURCHASES)
+        ], batch_size=2000)
+        # auto_now_add stamps every row with now; spread the history so date filters are selective
+        purchases = list(Purchase.objects.only('id'))
+        for purchase in purchases:
+            purchase.purchase_date = today - timedelta(days=purchase.pk % 720)
+        Purchase.objects.bulk_update(purchases, ['purchase_date'], batch_size=500)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        cls.pharmacy = pharmacies[0]
+        cls.order = Order.objects.filter(pharmacy=cls.pharmacy).first()
+        cls.admin = User.objects.create_user('synthetic-admin', password='x', role='admin', is_staff=True)
+        cls.pharmacy_user = User.objects.create_user('synthetic-pharmacy', password='x', role='pharmacy', pharmacy=cls.pharmacy)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def assertMainQueryUses(self, index, table, request):
+        """Run request(), take the first query over table (skipping pagination counts) and assert its plan uses index."""
+        with CaptureQueriesContext(connection) as ctx:
+            response = request()
+        self.assertLess(response.status_code, 400, getattr(response, 'data', response))
+        main = next((
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].startswith('SELECT') and f'FROM "{table}"' in q['sql'] and '"__count"' not in q['sql']
+        ), None)
+        self.assertIsNotNone(main, f'no query over {table}')
+        self.assertIn(index, explain_indexes(main), main)
+
+    def test_pharmacy_order_history(self):
+        client = self.client_for(self.pharmacy_user)
+        self.assertMainQueryUses('orders_order_pharmacy_idx', 'orders_order', lambda: client.get('/api/orders/'))
+
+    def test_order_status_summary(self):
+        client = self.client_for(self.admin)
+        self.assertMainQueryUses('orders_order_status_idx', 'orders_order', lambda: client.get('/api/reports/order-status-summary/'))
+
+    def test_void_item_recomputes_order_total(self):
+        client = self.client_for(self.admin)
+        item = self.order.items.filter(is_void=False).first()
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.post(f'/api/orders/{self.order.id}/items/{item.id}/void/')
+        self.assertEqual(response.status_code, 200, response.data)
+        total = next(q['sql'] for q in ctx.captured_queries if 'SUM(' in q['sql'] and 'FROM "orders_orderitem"' in q['sql'])
+        self.assertIn('orders_item_live_idx', explain_indexes(total), total)
+
+    def test_order_lines_by_void_state(self):
+        sql, params = OrderItem.objects.filter(order=self.order, is_void=True).values('id').query.sql_with_params()
+        self.assertIn('orders_item_void_idx', explain_indexes(sql, params), sql)
+
+    def test_available_batches(self):
+        client = self.client_for(self.admin)
+        item = self.order.items.first()
+        self.assertMainQueryUses(
+            'products_batch_instock_idx', 'products_stockbatch',
+            lambda: client.get(f'/api/orders/{self.order.id}/items/{item.id}/available-batches/'),
+        )
+
+    def test_low_stock(self):
+        client = self.client_for(self.admin)
+        self.assertMainQueryUses('products_active_stock_idx', 'products_product', lambda: client.get('/api/reports/low-stock/?threshold=5'))
+
+    def test_invoice_list(self):
+        client = self.client_for(self.admin)
+        self.assertMainQueryUses('invoices_invoice_created_idx', 'invoices_invoice', lambda: client.get('/api/reports/invoice-list/'))
+
+    def test_pending_purchases_in_range(self):
+        client = self.client_for(self.admin)
+        start = timezone.localdate() - timedelta(days=90)
+        self.assertMainQueryUses(
+            'products_purchase_status_idx', 'products_purchase',
+            lambda: client.get(f'/api/reports/purchase-history/?status=pending&start_date={start}'),
+        )
+
+
+class AccountSummaryTests(OrderFlowMixin, TestCase):
+    """
+    After every event, PharmacyAccountSummary kept by increments equals the summary rebuilt from the orders,
+    and each pharmacy's ledger balance equals its dispatched less paid amount.
+    """
+
+    def after_event(self):
+        self.assertSummaryCurrent()
+
+    def assertSummaryCurrent(self):
+        from reports.account_summary import build_account_summaries
+        from reports.models import PharmacyAccountSummary
+        fields = [f.name for f in PharmacyAccountSummary._meta.concrete_fields if f.name != 'updated_at']
+        rebuilt = {s.pharmacy_id: s for s in build_account_summaries()}
+        for summary in PharmacyAccountSummary.objects.all():
+            for field in fields:
+                self.assertEqual(getattr(summary, field), getattr(rebuilt[summary.pk], field), field)
+        # The receivables ledger carries the same balance
+        for summary in rebuilt.values():
+            balance = ledger.balance_before(summary.pharmacy_id, timezone.localdate() + timedelta(days=1))
+            self.assertEqual(balance, summary.dispatched_amount - summary.paid_amount, summary.pharmacy_id)
+
+    def test_order_lifecycle(self):
+        order = self.place_order()
+        self.approve(order)
+        self.dispatch(order, {self.gloves.id: 3, self.masks.id: 2})
+        self.put(f'/api/orders/{order.id}/record_payment/', {'amount': 20})
+        self.void_item(order, self.masks)
+        self.put(f'/api/orders/{order.id}/update_status/', {'status': 'rejected'})
+        self.put(f'/api/orders/{order.id}/update_status/', {'status': 'shipped'})
+        other = self.place_order()
+        self.approve(other)
+        self.dispatch(other, {self.gloves.id: 1})
+        self.post(f'/api/orders/{other.id}/void/')
+
+        summary = self.client_for_pharmacy().get('/api/reports/pharmacy/account-summary/').json()
+        self.assertEqual(summary['order_count'], 2)
+        self.assertEqual(summary['orders_by_status']['shipped'], 1)
+        self.assertEqual(summary['dispatched_amount'], 30.0)
+        self.assertEqual(summary['outstanding'], 10.0)
+
+    def test_pharmacy_order_placed_and_deleted(self):
+        order = self.place_order(client=self.client_for_pharmacy())
+        response = self.client_for_pharmacy().delete(f'/api/orders/{order.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertSummaryCurrent()
+
+    def test_moving_order_to_another_pharmacy(self):
+        order = self.place_order()
+        self.approve(order)
+        self.dispatch(order, {self.gloves.id: 4})
+        self.put(f'/api/orders/{order.id}/record_payment/', {'amount': 10})
+        response = self.client.patch(f'/api/orders/{order.id}/', {'pharmacy': self.other.id, 'paid_amount': '30.00'}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(Order.objects.get(pk=order.pk).paid_amount, Decimal('10.00'))
+        self.assertSummaryCurrent()
+
+    def test_draft_submit(self):
+        from drafts.models import DraftOrder, DraftOrderItem
+        draft = DraftOrder.objects.create(user=self.pharmacy_user)
+        DraftOrderItem.objects.create(draft_order=draft, product=self.gloves, quantity=2, unit_price=10)
+        response = self.client_for_pharmacy().post('/api/drafts/submit/')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertSummaryCurrent()
+
+
+class DashboardStatsTests(OrderFlowMixin, TestCase):
+    """The cached admin dashboard: recomputed after a committed write, stale entry served while another refreshes."""
+
+    def setUp(self):
+        super().setUp()
+        self.order = self.place_order()
+        self.approve(self.order)
+        self.dispatch(self.order, {self.gloves.id: 3, self.masks.id: 2})
+
+    def test_outstanding_leaves_out_voided_lines(self):
+        self.assertEqual(dashboard_stats()['outstanding']['dispatched_amount'], 40.0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.void_item(self.order, self.masks)
+        # The void bumped the dispatch topic, so this request recomputes the stale entry before answering
+        self.assertEqual(dashboard_stats()['outstanding']['dispatched_amount'], 30.0)
+
+    def test_stale_entry_served_while_refreshing(self):
+        self.assertEqual(dashboard_stats()['total_orders'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.place_order()
+        cache.add(f'{DASHBOARD_CACHE_KEY}:refreshing', 1, 30)  # another request is recomputing
+        with self.assertNumQueries(0):
+            self.assertEqual(dashboard_stats()['total_orders'], 1)
+        cache.delete(f'{DASHBOARD_CACHE_KEY}:refreshing')
+        self.assertEqual(dashboard_stats()['total_orders'], 2)
+
+    def test_endpoint(self):
+        response = self.client.get('/api/reports/dashboard-stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([o['id'] for o in response.data['recent_orders']], [self.order.id])
+        self.assertEqual(self.client_for_pharmacy().get('/api/reports/dashboard-stats/').status_code, 403)
+
+
+class ClassifyTests(SimpleTestCase):
+    """ABC by cumulative share of sales value, XYZ by the variability of monthly units."""
+
+    def test_classify(self):
+        units = np.array([[10.0, 10, 10], [0, 30, 0], [1, 0, 1], [0, 0, 0]])
+        value = np.array([[80.0, 0, 0], [15, 0, 0], [5, 0, 0], [0, 0, 0]])
+        abc, xyz, share, cumulative, cv = classify(units, value)
+        self.assertEqual(list(abc), ['A', 'B', 'C', 'C'])
+        self.assertEqual(list(xyz), ['X', 'Z', 'Y', 'Z'])  # cv 0, 1.41, 0.71 and no demand
+        np.testing.assert_allclose(share, [0.8, 0.15, 0.05, 0])
+        np.testing.assert_allclose(cumulative[:3], [0.8, 0.95, 1.0])
+
+
+class InventoryClassificationTests(OrderFlowMixin, TestCase):
+    """Monthly classification snapshots from dispatches, computed once per closed month."""
+
+    def setUp(self):
+        super().setUp()
+        self.period_end = last_closed_month_end()
+        order = self.place_order()
+        self.approve(order)
+        when = timezone.make_aware(datetime.combine(self.period_end.replace(day=15), datetime.min.time()))
+        self.backdate(self.dispatch(order, {self.gloves.id: 3}), when)
+
+    def test_closed_months(self):
+        self.assertEqual(classify_closed_months(window_months=3), [self.period_end])
+        self.assertEqual(classify_closed_months(window_months=3), [])
+        classes = {c.product_id: c for c in InventoryClass.objects.filter(period_end=self.period_end)}
+        gloves, masks = classes[self.gloves.id], classes[self.masks.id]
+        self.assertEqual((gloves.abc_class, gloves.xyz_class, gloves.sales_value, gloves.quantity), ('A', 'Z', Decimal('30.00'), 3))
+        self.assertEqual((masks.abc_class, masks.xyz_class, masks.demand_cv), ('C', 'Z', None))
+
+    def test_matrix(self):
+        classify_closed_months(window_months=3)
+        response = self.client.get('/api/reports/inventory-classification/', {'view': 'matrix'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(c['abc_class'], c['xyz_class'], c['products'], c['sales_value']) for c in response.data],
+                         [('A', 'Z', 1, 30.0), ('C', 'Z', 1, 0.0)])
+
+
+class InventoryClassificationPagingTests(TestCase):
+    """Every snapshot row comes back exactly once when paging the classification list, nulls included."""
+
+    @classmethod
+    def setUpTestData(cls):
+        from reports.models import InventoryClass
+        category = Category.objects.create(name='Consumables')
+        products = Product.objects.bulk_create([
+            Product(name=f'Item {i}', category=category, mrp=20, selling_price=10) for i in range(7)
+        ])
+        cls.period_end = timezone.localdate().replace(day=1) - timedelta(days=1)
+        InventoryClass.objects.bulk_create([
+            InventoryClass(product=product, period_end=cls.period_end, window_months=6, abc_class='C',
+                           xyz_class='Z', sales_value=Decimal(i % 3), value_share=0, cumulative_share=1,
+                           quantity=i % 2, demand_cv=None if i % 2 else 0.5 * i, computed_at=timezone.now())
+            for i, product in enumerate(products)
+        ])
+        cls.admin = User.objects.create_user('classes-admin', password='x', role='admin', is_staff=True)
+
+    def page_through(self, params):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        url, seen = '/api/reports/inventory-classification/', []
+        params = {**params, 'page_size': 2}
+        while url:
+            response = client.get(url, params)
+            self.assertEqual(response.status_code, 200, response.data)
+            seen += [row['product_id'] for row in response.data['results']]
+            url, params = response.data['next'], None
+        return seen
+
+    def test_pages_cover_rows_with_null_demand_cv(self):
+        expected = sorted(Product.objects.values_list('id', flat=True))
+        for ordering in ('', 'demand_cv', '-demand_cv', 'quantity', '-sales_value'):
+            seen = self.page_through({'ordering': ordering})
+            self.assertEqual(sorted(seen), expected, ordering)
+
+
+class DeadStockReportTests(TestCase):
+    """The product-level dead-stock list pages by product, and a malformed ?days= is a 400."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Consumables')
+        products = Product.objects.bulk_create([
+            Product(name=f'Idle {i}', category=category, mrp=20, selling_price=10, stock_quantity=10) for i in range(5)
+        ])
+        Product.objects.update(created_at=timezone.now() - timedelta(days=200))
+        StockBatch.objects.bulk_create([
+            StockBatch(product=product, batch_number=f'B{n}', expiry_date=timezone.localdate() + timedelta(days=365),
+                       quantity=5, received_date=timezone.localdate() - timedelta(days=200))
+            for product in products for n in range(2)
+        ])
+        cls.admin = User.objects.create_user('dead-stock-admin', password='x', role='admin', is_staff=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_product_level_pages(self):
+        url, params, seen = '/api/reports/dead-stock/', {'level': 'product', 'page_size': 2}, []
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200, response.data)
+            self.assertTrue(all(row['quantity'] == 10 for row in response.data['results']))
+            seen += [row['product_id'] for row in response.data['results']]
+            url, params = response.data['next'], None
+        self.assertEqual(sorted(seen), sorted(Product.objects.values_list('id', flat=True)))
+
+    def test_days_must_be_a_number(self):
+        response = self.client.get('/api/reports/dead-stock/', {'days': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+
+
+class ReportBundleValidationTests(TestCase):
+    """Malformed bundle entries are rejected with 400 before any report runs."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('bundle-admin', password='x', role='admin', is_staff=True)
+
+    def bundle(self, *entries):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        return client.post('/api/reports/bundle/', {'reports': list(entries)}, format='json')
+
+    def test_rejects_malformed_keys_and_params(self):
+        for entry in (
+            {'name': 'dead-stock', 'key': ['a']},
+            {'name': 'dead-stock', 'key': ''},
+            {'name': 'dead-stock', 'params': {'days': [1, 2]}},
+            {'name': 'dead-stock', 'params': {'days': {'gt': 1}}},
+            {'name': 'dead-stock', 'params': {'days': None}},
+        ):
+            self.assertEqual(self.bundle(entry).status_code, 400, entry)
+
+    def test_runs_valid_entries(self):
+        response = self.bundle({'name': 'dead-stock', 'key': 'idle', 'params': {'days': 30}}, {'name': 'stock-expiry'})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual({key: r['status'] for key, r in response.data['reports'].items()}, {'idle': 200, 'stock-expiry': 200})
+
+    def test_failed_report_is_logged_not_exposed(self):
+        with mock.patch.object(StockExpiryReport, 'get', side_effect=RuntimeError('connection string leaked')), \
+                self.assertLogs('reports.bundle', 'ERROR') as logs:
+            response = self.bundle({'name': 'dead-stock'}, {'name': 'stock-expiry'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['reports']['dead-stock']['status'], 200)
+        self.assertEqual(response.data['reports']['stock-expiry']['status'], 500)
+        self.assertEqual(response.data['reports']['stock-expiry']['error'], {'detail': 'Report failed.'})
+        self.assertIn('connection string leaked', logs.output[0])
+
+
+class ReportSnapshotTests(TestCase):
+    """Close-of-business snapshots served to ?as_of=latest: computed from the database, matched on parameters."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Product.objects.create(name='Gloves', category=Category.objects.create(name='Consumables'),
+                               mrp=20, selling_price=10, stock_quantity=10)
+        cls.admin = User.objects.create_user('snapshot-admin', password='x', role='admin', is_staff=True)
+
+    def test_snapshot_bypasses_response_cache(self):
+        from reports.snapshots import take_snapshot
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        self.assertEqual(client.get('/api/reports/stock-summary/').data['total_quantity'], 10)
+        Product.objects.update(stock_quantity=7)  # a write the cached response has not seen
+        self.assertEqual(client.get('/api/reports/stock-summary/').data['total_quantity'], 10)
+        take_snapshot('stock_summary')
+        self.assertEqual(client.get('/api/reports/stock-summary/', {'as_of': 'latest'}).data['total_quantity'], 7)
+
+    def latest(self, url, **params):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        return client.get(url, {'as_of': 'latest', **params})
+
+    def test_latest_needs_a_snapshot_with_the_same_params(self):
+        self.assertEqual(self.latest('/api/reports/fulfillment/').status_code, 404)
+        call_command('snapshot_reports', report=['fulfillment'], stdout=io.StringIO())
+        self.assertEqual(ReportSnapshot.objects.count(), 2)  # the registered parameter sets
+        response = self.latest('/api/reports/fulfillment/', group_by='product')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('X-Snapshot-Generated-At', response)
+        self.assertEqual(self.latest('/api/reports/fulfillment/', group_by='pharmacy').status_code, 404)
+
+    def test_command_prunes_old_snapshots(self):
+        out = io.StringIO()
+        call_command('snapshot_reports', report=['stock_summary'], stdout=out)
+        ReportSnapshot.objects.update(generated_at=timezone.now() - timedelta(days=40))
+        call_command('snapshot_reports', report=['stock_summary'], keep_days=35, stdout=out)
+        self.assertIn('Stored 1 report snapshots; pruned 1.', out.getvalue())
+        self.assertEqual(self.latest('/api/reports/stock-summary/').data['total_quantity'], 10)
+        with self.assertRaises(CommandError):
+            call_command('snapshot_reports', keep_days=0, stdout=out)
+
+
+class SalesRegisterTests(OrderFlowMixin, TestCase):
+    """The sales register streams the stored bill summaries, which order edits and voids keep current."""
+
+    def setUp(self):
+        super().setUp()
+        self.order = self.place_order()
+        self.approve(self.order)
+
+    def register(self):
+        response = self.client.get('/api/reports/sales-register/', {'format': 'jsonl'})
+        self.assertEqual(response.status_code, 200)
+        return sorted(
+            (r['bill_type'], float(r['total_amount']))
+            for r in map(json.loads, b''.join(response.streaming_content).decode().splitlines())
+        )
+
+    def test_reads_summaries_kept_on_write(self):
+        self.dispatch(self.order, {self.gloves.id: 3, self.masks.id: 2})
+        self.void_item(self.order, self.masks)
+        with CaptureQueriesContext(connection) as queries:
+            rows = self.register()
+        self.assertFalse([q for q in queries if q['sql'].startswith(('INSERT', 'DELETE'))])
+        self.assertEqual(rows, [('dispatch', 30.0), ('invoice', 40.0)])
+
+    def test_line_edit_refreshes_in_the_same_transaction(self):
+        from unittest import mock
+        items = [{'product': self.gloves.id, 'quantity': 1, 'unit_price': '10'}]
+        with mock.patch('orders.serializers.refresh_tax_summaries', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.patch(f'/api/orders/{self.order.id}/', {'items': items}, format='json')
+        self.assertEqual(self.order.items.count(), 2)
+        response = self.client.patch(f'/api/orders/{self.order.id}/', {'items': items}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.register(), [('invoice', 10.0)])
+
+    def test_backfill_command(self):
+        from django.core.management import call_command
+        from invoices.models import InvoiceTaxSummary
+        self.dispatch(self.order, {self.gloves.id: 3})
+        InvoiceTaxSummary.objects.all().delete()
+        call_command('backfill_tax_summaries', stdout=io.StringIO())
+        self.assertEqual(self.register(), [('dispatch', 30.0), ('invoice', 50.0)])
+
+
+class BusinessDateTests(OrderFlowMixin, TestCase):
+    """Records carry the local day they happened on; report date filters are half-open ranges on it."""
+
+    def test_business_date_is_the_local_day(self):
+        # 01:30 in Asia/Kolkata, still the previous day (20:00) in UTC
+        late = timezone.make_aware(datetime(2026, 3, 10, 1, 30))
+        self.assertEqual(late.astimezone(ZoneInfo('UTC')).day, 9)
+        with mock.patch('django.utils.timezone.now', return_value=late):
+            order = self.place_order()
+            self.approve(order)
+            dispatch = self.dispatch(order, {self.gloves.id: 1})
+        next_day = datetime(2026, 3, 10).date()
+        self.assertEqual(order.business_date, next_day)
+        self.assertEqual(order.invoice.business_date, next_day)
+        self.assertEqual(dispatch.business_date, next_day)
+        self.assertEqual(set(dispatch.allocations.values_list('business_date', flat=True)), {next_day})
+
+    def test_range_bounds(self):
+        day = datetime(2026, 3, 10).date()
+        self.assertEqual(date_range_q(Order, 'business_date', day, day),
+                         Q(business_date__gte=day) & Q(business_date__lt=day + timedelta(days=1)))
+        # Datetime columns are compared with local midnights, never cast per row
+        q = date_range_q(Order, 'updated_at', end_d=day)
+        self.assertEqual(q, Q(updated_at__lt=day_start(day + timedelta(days=1))))
+        self.assertEqual(timezone.localtime(day_start(day)).hour, 0)
+        self.assertEqual(date_range_q(Order, 'business_date'), Q())
+
+    def test_report_filters_by_business_date(self):
+        order = self.place_order()
+        today = timezone.localdate()
+        yesterday = today - timedelta(days=1)
+        Order.objects.filter(pk=order.pk).update(business_date=yesterday)
+
+        def order_count(start, end):
+            response = self.client.get('/api/reports/collections-summary/', {'start_date': start, 'end_date': end})
+            self.assertEqual(response.status_code, 200)
+            return response.data['order_count']
+
+        self.assertEqual(order_count(today, today), 0)
+        self.assertEqual(order_count(yesterday, yesterday), 1)
+        self.assertEqual(order_count('not-a-date', today), 1)
+
+
+class ProductTotalsTests(OrderFlowMixin, TestCase):
+    """Sales and purchases by product are grouped, ordered and cut to ?limit= in SQL."""
+
+    def setUp(self):
+        super().setUp()
+        for quantities in ({self.gloves.id: 4, self.masks.id: 2}, {self.gloves.id: 1}):
+            order = self.place_order()
+            self.approve(order)
+            self.dispatch(order, quantities)
+        self.place_order()  # pending: not sold
+        purchase = Purchase.objects.create(supplier_name='Supplier', status='approved')
+        purchase.items.create(product=self.gloves, quantity=10, unit_price=6)
+        purchase.items.create(product=self.masks, quantity=30, unit_price=3)
+        Purchase.objects.create(supplier_name='Supplier').items.create(product=self.gloves, quantity=99, unit_price=1)
+
+    def rows(self, report, **params):
+        response = self.client.get(f'/api/reports/{report}/', params)
+        self.assertEqual(response.status_code, 200)
+        return [(r.get('product_name') or r.get('category_name'), r['quantity'], r['value']) for r in response.data]
+
+    def test_sales_by_product(self):
+        self.assertEqual(self.rows('sales-by-product'), [('Gloves', 5, 50.0), ('Masks', 2, 10.0)])
+        self.assertEqual(self.rows('sales-by-product', ordering='quantity'), [('Masks', 2, 10.0), ('Gloves', 5, 50.0)])
+        self.assertEqual(self.rows('sales-by-product', limit=1), [('Gloves', 5, 50.0)])
+        self.assertEqual(self.rows('sales-by-product', group_by='category'), [('Consumables', 7, 60.0)])
+
+    def test_purchase_by_product(self):
+        self.assertEqual(self.rows('purchase-by-product'), [('Masks', 30, 90.0), ('Gloves', 10, 60.0)])
+        self.assertEqual(self.rows('purchase-by-product', ordering='-quantity', limit=1), [('Masks', 30, 90.0)])
+
+    def test_one_grouped_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/reports/sales-by-product/')
+        self.assertEqual(len([q for q in queries if 'orders_orderitemallocation' in q['sql']]), 1)
+
+
+class ReceivablesAgingTests(OrderFlowMixin, TestCase):
+    """Each order's payments settle its oldest dispatches first; what is unpaid is bucketed by dispatch age."""
+
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        order = self.place_order()
+        self.approve(order)
+        self.backdate(self.dispatch(order, {self.gloves.id: 4}), now - timedelta(days=100))  # 40
+        self.backdate(self.dispatch(order, {self.masks.id: 2}), now - timedelta(days=10))  # 10
+        self.put(f'/api/orders/{order.id}/record_payment/', {'amount': 20})
+        other = self.place_order(pharmacy=self.other)
+        self.approve(other)
+        self.backdate(self.dispatch(other, {self.gloves.id: 3}), now - timedelta(days=45))  # 30
+        rejected = self.place_order(pharmacy=self.other)
+        self.approve(rejected)
+        self.dispatch(rejected, {self.gloves.id: 1})
+        self.put(f'/api/orders/{rejected.id}/update_status/', {'status': 'rejected'})
+
+    def aging(self, **params):
+        response = self.client.get('/api/reports/receivables-aging/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_buckets_per_pharmacy(self):
+        data = self.aging()
+        rows = {r['pharmacy_id']: r for r in data['pharmacies']}
+        self.assertEqual(
+            {k: rows[self.pharmacy.id][k] for k in ('0_30', '31_60', '61_90', '90_plus', 'outstanding')},
+            {'0_30': 10.0, '31_60': 0.0, '61_90': 0.0, '90_plus': 20.0, 'outstanding': 30.0},
+        )
+        self.assertEqual((rows[self.other.id]['31_60'], rows[self.other.id]['outstanding']), (30.0, 30.0))
+        self.assertEqual(data['totals'], {'0_30': 10.0, '31_60': 30.0, '61_90': 0.0, '90_plus': 20.0, 'outstanding': 60.0})
+
+    def test_totals_and_pharmacy_filter(self):
+        self.assertNotIn('pharmacies', self.aging(view='totals'))
+        data = self.aging(pharmacy_id=self.other.id)
+        self.assertEqual([r['pharmacy_id'] for r in data['pharmacies']], [self.other.id])
+        self.assertEqual(data['totals']['outstanding'], 30.0)
+
+    def test_as_of(self):
+        as_of = timezone.localdate() - timedelta(days=50)
+        data = self.aging(as_of=as_of.isoformat())
+        # Only the 100-day-old dispatch existed then; 50 days old at the time, less the payment
+        self.assertEqual(data['totals'], {'0_30': 0.0, '31_60': 20.0, '61_90': 0.0, '90_plus': 0.0, 'outstanding': 20.0})
+
+    def test_outstanding_by_store(self):
+        response = self.client.get('/api/reports/outstanding-by-store/')
+        rows = {r['pharmacy_id']: (r['dispatched_amount'], r['paid_amount'], r['outstanding']) for r in response.data}
+        self.assertEqual(rows, {self.pharmacy.id: (50.0, 20.0, 30.0), self.other.id: (30.0, 0.0, 30.0)})
+
+
+class FulfillmentTests(OrderFlowMixin, TestCase):
+    """Ordered vs dispatched per order and product, and lead time from approval to first and last dispatch."""
+
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        self.order = self.place_order()
+        self.approve(self.order)
+        Order.objects.filter(pk=self.order.pk).update(approved_at=now - timedelta(hours=10))
+        self.backdate(self.dispatch(self.order, {self.gloves.id: 3}), now - timedelta(hours=8))
+        self.backdate(self.dispatch(self.order, {self.masks.id: 2}), now - timedelta(hours=2))
+        self.waiting = self.place_order(pharmacy=self.other)
+        self.approve(self.waiting)
+        Order.objects.filter(pk=self.waiting.pk).update(approved_at=now - timedelta(hours=1))
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_fulfillment_by_order_and_product(self):
+        rows = {r['order_id']: (r['ordered'], r['dispatched'], r['remaining']) for r in self.get('/api/reports/fulfillment/')}
+        self.assertEqual(rows, {self.order.id: (6, 5, 1), self.waiting.id: (6, 0, 6)})
+        rows = {r['product_name']: (r['ordered'], r['dispatched']) for r in self.get('/api/reports/fulfillment/', group_by='product')}
+        self.assertEqual(rows, {'Gloves': (8, 3), 'Masks': (4, 2)})
+
+    def test_lead_time(self):
+        rows = self.get('/api/reports/fulfillment/lead-time/')['results']
+        self.assertEqual([r['order_id'] for r in rows], [self.waiting.id, self.order.id])
+        self.assertEqual((rows[0]['fill_rate'], rows[0]['hours_to_first_dispatch']), (0.0, None))
+        row = rows[1]
+        self.assertEqual((row['ordered'], row['dispatched'], row['fill_rate']), (6, 5, 0.8333))
+        self.assertEqual((row['hours_to_first_dispatch'], row['hours_to_last_dispatch']), (2.0, 8.0))
+
+    def test_lead_time_ordering_and_filters(self):
+        rows = self.get('/api/reports/fulfillment/lead-time/', ordering='-to_last_dispatch')['results']
+        self.assertEqual([r['order_id'] for r in rows], [self.order.id, self.waiting.id])  # no dispatch sorts last
+        rows = self.get('/api/reports/fulfillment/lead-time/', pharmacy_id=self.other.id)['results']
+        self.assertEqual([r['order_id'] for r in rows], [self.waiting.id])
+        self.void_item(self.order, self.masks)
+        row = self.get('/api/reports/fulfillment/lead-time/', ordering='fill_rate')['results'][1]
+        self.assertEqual((row['ordered'], row['dispatched'], row['fill_rate']), (4, 3, 0.75))
+
+
+class _CountingReport(APIView):
+    permission_classes = []
+    calls = 0
+
+    @cached_report('orders')
+    def get(self, request):
+        type(self).calls += 1
+        return Response({'calls': type(self).calls}, status=int(request.query_params.get('status', 200)))
+
+
+class ReportCacheTests(OrderFlowMixin, TestCase):
+    """Report responses are cached per topic versions and caller scope; only 200s are cached."""
+
+    def setUp(self):
+        super().setUp()
+        _CountingReport.calls = 0
+        self.view = _CountingReport.as_view()
+
+    def get(self, **params):
+        return self.view(APIRequestFactory().get('/report/', params))
+
+    def test_cached_until_topic_bumped(self):
+        self.assertEqual(self.get().data, {'calls': 1})
+        self.assertEqual(self.get().data, {'calls': 1})
+        self.assertEqual(self.get(page=2).data, {'calls': 2})
+        bump_topics('orders')
+        self.assertEqual(self.get().data, {'calls': 3})
+
+    def test_errors_not_cached(self):
+        self.assertEqual(self.get(status=400).status_code, 400)
+        self.assertEqual(self.get(status=400).data, {'calls': 2})
+
+    def test_committed_write_invalidates(self):
+        self.assertEqual(self.client.get('/api/reports/order-status-summary/').data, [])
+        with self.assertNumQueries(0):
+            self.client.get('/api/reports/order-status-summary/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.place_order()
+        self.assertEqual(self.client.get('/api/reports/order-status-summary/').data, [{'status': 'pending', 'count': 1}])
+
+    def test_scoped_to_pharmacy(self):
+        other_user = User.objects.create_user('flow-other', password='x', role='pharmacy', pharmacy=self.other)
+        with self.captureOnCommitCallbacks(execute=True):
+            for pharmacy in (self.pharmacy, self.other):
+                self.approve(self.place_order(pharmacy=pharmacy))
+        mine = self.client_for_pharmacy().get('/api/reports/pharmacy/invoice-list/').data['results']
+        theirs = self.client_for(other_user).get('/api/reports/pharmacy/invoice-list/').data['results']
+        self.assertEqual(len(mine), 1)
+        self.assertEqual(len(theirs), 1)
+        self.assertNotEqual(mine[0]['id'], theirs[0]['id'])
+
+    @override_settings(REPORT_CACHE_WAIT=0.1)
+    def test_waiters_compute_locally_after_a_short_wait(self):
+        cache.add('report:slow:lock', 1, 30)  # another worker is computing
+        started = time.monotonic()
+        self.assertEqual(single_flight('report:slow', lambda: 'local', 60), 'local')
+        self.assertLess(time.monotonic() - started, 1)
+
+
+def streamed_body(response):
+    return b''.join(response.streaming_content)
+
+
+class ExportWriterTests(SimpleTestCase):
+    """The streamed CSV, JSON Lines and XLSX writers."""
+
+    columns = [('name', 'Name'), ('qty', 'Qty'), ('value', 'Value')]
+    rows = [{'name': 'Gloves, nitrile', 'qty': 4, 'value': Decimal('40.50')}, {'name': 'Masks\x01 <N95>', 'qty': 0, 'value': None}]
+
+    def sheet_rows(self, body):
+        """Cell values by row from the first sheet, with the part names of the workbook."""
+        ns = {'m': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+        with zipfile.ZipFile(io.BytesIO(body)) as archive:
+            self.assertIsNone(archive.testzip())
+            names = set(archive.namelist())
+            sheet = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+        rows = [
+            [cell.findtext('m:v', namespaces=ns) or cell.findtext('m:is/m:t', namespaces=ns) for cell in row]
+            for row in sheet.iterfind('m:sheetData/m:row', ns)
+        ]
+        return names, rows
+
+    def test_csv(self):
+        response = stream_csv(self.columns, iter(self.rows), 'stock')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="stock.csv"')
+        self.assertEqual(list(csv.reader(io.StringIO(streamed_body(response).decode()))), [
+            ['Name', 'Qty', 'Value'], ['Gloves, nitrile', '4', '40.50'], ['Masks\x01 <N95>', '0', ''],
+        ])
+
+    def test_jsonl(self):
+        lines = streamed_body(stream_jsonl(iter(self.rows), 'stock')).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [
+            {'name': 'Gloves, nitrile', 'qty': 4, 'value': '40.50'}, {'name': 'Masks\x01 <N95>', 'qty': 0, 'value': None},
+        ])
+
+    def test_xlsx(self):
+        names, rows = self.sheet_rows(streamed_body(stream_xlsx(self.columns, iter(self.rows), 'stock')))
+        self.assertEqual(names, set(XLSX_PARTS) | {'xl/worksheets/sheet1.xml'})
+        # Invalid XML characters are dropped, markup is escaped and empty cells are left out
+        self.assertEqual(rows, [['Name', 'Qty', 'Value'], ['Gloves, nitrile', '4', '40.50'], ['Masks <N95>', '0']])
+
+    def test_xlsx_streams_large_sheets_in_chunks(self):
+        rows = ({'name': f'Item {n}', 'qty': n, 'value': None} for n in range(1200))
+        chunks = list(stream_xlsx(self.columns, rows, 'stock').streaming_content)
+        self.assertGreater(len(chunks), 3)
+        _, sheet = self.sheet_rows(b''.join(chunks))
+        self.assertEqual(len(sheet), 1201)
+        self.assertEqual(sheet[-1], ['Item 1199', '1199'])
+
+    def test_zip_sink_hands_over_each_write_once(self):
+        sink = _ZipSink()
+        sink.write(b'ab')
+        sink.write(memoryview(b'c'))
+        self.assertEqual(sink.drain(), b'abc')
+        self.assertEqual(sink.drain(), b'')
+        self.assertFalse(sink.seekable())
+
+    def test_default_columns(self):
+        body = streamed_body(stream_rows('csv', None, iter(self.rows), 'stock')).decode()
+        self.assertEqual(body.splitlines()[0], 'Name,Qty,Value')
+        self.assertEqual(streamed_body(stream_rows('csv', None, iter([]), 'stock')), b'\r\n')
+
+
+class ExportErrorTests(OrderFlowMixin, TestCase):
+    """An error from an export request comes back as JSON, not as a file in the requested format."""
+
+    def test_report_error(self):
+        response = self.client.get('/api/reports/dead-stock/', {'days': 'soon', 'format': 'csv'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json(), {'detail': 'days must be a whole number.'})
+
+    def test_streamed_report_errors(self):
+        response = self.client.get('/api/reports/statement/', {'format': 'xlsx'})
+        self.assertEqual((response.status_code, response['Content-Type']), (400, 'application/json'))
+        response = self.client_for_pharmacy().get('/api/reports/sales-register/', {'format': 'csv'})
+        self.assertEqual((response.status_code, response['Content-Type']), (403, 'application/json'))
+
+    def test_export(self):
+        response = self.client.get('/api/reports/order-status-summary/', {'format': 'csv'})
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'text/csv'))
+
+
+class _ProductList(ExportableReportMixin, APIView):
+    ordering = '-selling_price'
+    ordering_fields = ('name', 'selling_price')
+
+
+class ReportCursorPaginationTests(TestCase):
+    """Keyset pages over tied sort keys, ?ordering= limited to ordering_fields, and ?count=."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Consumables')
+        Product.objects.bulk_create([
+            Product(name=f'Item {i}', category=category, mrp=20, selling_price=i % 3) for i in range(9)
+        ])
+
+    def request(self, url='/report/', **params):
+        return Request(APIRequestFactory().get(url, params))
+
+    def page_through(self, **params):
+        """(ids in page order, the count on each page)"""
+        view, url, seen, counts = _ProductList(), '/report/', [], []
+        params['page_size'] = 4
+        while url:
+            paginator = ReportCursorPagination()
+            data = paginator.get_paginated_response(
+                [p.id for p in paginator.paginate_queryset(Product.objects.all(), self.request(url, **params), view)]
+            ).data
+            seen += data['results']
+            counts.append(data.get('count'))
+            url, params = data['next'], {}
+        return seen, counts
+
+    def test_ordering(self):
+        paginator, view = ReportCursorPagination(), _ProductList()
+        self.assertEqual(paginator.get_ordering(self.request(), None, view), ('-selling_price', '-id'))
+        self.assertEqual(paginator.get_ordering(self.request(ordering='name'), None, view), ('name', 'id'))
+        self.assertEqual(paginator.get_ordering(self.request(ordering='mrp'), None, view), ('-selling_price', '-id'))
+        paginator = ReportCursorPagination(ordering='selling_price', tiebreaker='product_id')
+        self.assertEqual(paginator.get_ordering(self.request(), None, view), ('selling_price', 'product_id'))
+
+    def test_pages_cover_tied_rows_once(self):
+        expected = list(Product.objects.order_by('-selling_price', '-id').values_list('id', flat=True))
+        self.assertEqual(self.page_through()[0], expected)
+        self.assertEqual(self.page_through(ordering='selling_price')[0], expected[::-1])
+
+    def test_count(self):
+        self.assertEqual(self.page_through()[1], [None, None, None])
+        self.assertEqual(self.page_through(count='exact')[1], [9, 9, 9])
+        # The planner estimate on PostgreSQL; an exact count elsewhere
+        seen, counts = self.page_through(count='estimate')
+        self.assertEqual(len(seen), 9)
+        self.assertTrue(all(count > 0 for count in counts))
+
+    def test_export_streams_every_row_in_order(self):
+        request = self.request(ordering='name')
+        request.accepted_renderer = CSVRenderer()
+        response = paginated_report(_ProductList(), request, Product.objects.all(), lambda p: {'name': p.name})
+        names = streamed_body(response).decode().splitlines()
+        self.assertEqual(names[1:], sorted(names[1:]))
+        self.assertEqual(len(names), 10)
+
+
+class StockValuationTests(OrderFlowMixin, TestCase):
+    """Stock valued at weighted average landed cost in decimals, and rolled back to a past day by approval time."""
+
+    def setUp(self):
+        super().setUp()
+        self.expiry = timezone.localdate() + timedelta(days=200)
+        # Gloves lot P1: 10 @ 10 + 15 @ 11 = 10.60 a unit; whole-number totals must not be divided as integers
+        self.purchase(self.gloves, 10, '10', 'P1')
+        self.purchase(self.gloves, 15, '11', 'P1')
+
+    def purchase(self, product, quantity, unit_price, batch_number):
+        response = self.client.post('/api/products/purchases/', {'supplier_name': 'Supplier', 'items': [{
+            'product': product.id, 'quantity': quantity, 'unit_price': unit_price,
+            'batch_number': batch_number, 'expiry_date': str(self.expiry),
+        }]}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.post(f"/api/products/purchases/{response.data['id']}/approve/")
+        return Purchase.objects.get(pk=response.data['id'])
+
+    def batches(self, as_of=None):
+        return {(b.product_id, b.batch_number): b for b in valued_batches(as_of)}
+
+    def test_lot_and_average_costs(self):
+        batches = self.batches()
+        lot = batches[self.gloves.id, 'P1']
+        self.assertEqual((lot.on_hand, lot.unit_cost, lot.cost_source), (25, Decimal('10.6000'), 'lot'))
+        self.assertEqual(lot.value, Decimal('265.0000'))
+        # Opening stock B1 takes the product's average; masks have no purchases and no cost
+        self.assertEqual((batches[self.gloves.id, 'B1'].unit_cost, batches[self.gloves.id, 'B1'].cost_source), (Decimal('10.6000'), 'average'))
+        self.assertEqual((batches[self.masks.id, 'B1'].value, batches[self.masks.id, 'B1'].cost_source), (Decimal('0'), 'none'))
+
+    def test_report(self):
+        response = self.client.get('/api/reports/stock-valuation/')
+        self.assertEqual(response.status_code, 200)
+        items = {i['product_name']: i for i in response.data['items']}
+        self.assertEqual((items['Gloves']['stock_quantity'], items['Gloves']['unit_price'], items['Gloves']['value']),
+                         (125, Decimal('10.60'), Decimal('1325.00')))
+        self.assertEqual(response.data['total_valuation'], Decimal('1325.00'))
+        self.assertEqual(response.data['unvalued_quantity'], 100)
+        self.assertEqual(sum(b['value'] for b in response.data['by_expiry']), Decimal('1325.00'))
+
+    def test_rolled_back_by_approval_time(self):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        # Created long ago but approved today: not yet in stock yesterday
+        late = self.purchase(self.masks, 8, '3', 'P2')
+        Purchase.objects.filter(pk=late.pk).update(purchase_date=yesterday - timedelta(days=30))
+        Purchase.objects.filter(items__batch_number='P1').update(approved_at=timezone.now() - timedelta(days=2))
+        order = self.place_order()
+        self.approve(order)
+        self.dispatch(order, {self.gloves.id: 4})  # from P1, the earliest expiry
+        today, past = self.batches(), self.batches(yesterday)
+        self.assertEqual((today[self.gloves.id, 'P1'].on_hand, past[self.gloves.id, 'P1'].on_hand), (21, 25))
+        self.assertIn((self.masks.id, 'P2'), today)
+        self.assertNotIn((self.masks.id, 'P2'), past)
+
+
+class GrossMarginTests(OrderFlowMixin, TestCase):
+    """Ex-GST revenue, cost of goods and margin from the allocation cost snapshots, in decimals."""
+
+    def setUp(self):
+        super().setUp()
+        order = self.place_order()
+        OrderItem.objects.filter(order=order).update(gst_rate=12)
+        self.approve(order)
+        self.dispatch(order, {self.gloves.id: 3, self.masks.id: 2})
+        order.dispatches.get().allocations.filter(order_item__product=self.gloves).update(unit_cost=Decimal('6.5'))
+
+    def report(self, **params):
+        response = self.client.get('/api/reports/gross-margin/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_by_product(self):
+        gloves, masks = self.report()
+        # 3 x 10 incl. 12% GST = 26.7857 taxable, against 3 x 6.50 cost
+        self.assertEqual((gloves['product_name'], gloves['revenue'], gloves['cogs']), ('Gloves', Decimal('26.79'), Decimal('19.50')))
+        self.assertEqual((gloves['gross_margin'], gloves['margin_percent'], gloves['uncosted_quantity']), (Decimal('7.29'), Decimal('27.20'), 0))
+        # Masks have no cost snapshot: revenue counted, no margin
+        self.assertEqual((masks['revenue'], masks['cogs'], masks['margin_percent'], masks['uncosted_quantity']),
+                         (Decimal('8.93'), Decimal('0.00'), None, 2))
+
+    def test_by_pharmacy(self):
+        row, = self.report(group_by='pharmacy')
+        self.assertEqual((row['pharmacy_id'], row['quantity'], row['revenue'], row['gross_margin']),
+                         (self.pharmacy.id, 5, Decimal('35.71'), Decimal('7.29')))
+
+
+class ForecastTests(SimpleTestCase):
+    """Vectorized demand forecasts and reorder points."""
+
+    def test_sma(self):
+        daily, std = forecast(np.array([[9.0, 1, 2, 3, 4]]), method='sma', window=4)
+        self.assertAlmostEqual(daily[0], 2.5)
+        self.assertAlmostEqual(std[0], 1.2910, places=4)
+
+    def test_ema_weights_recent_days(self):
+        daily, _ = forecast(np.array([[0.0, 0, 0, 8], [8.0, 0, 0, 0]]), method='ema', window=4, alpha=0.5)
+        self.assertAlmostEqual(daily[0], 8 / 1.875)
+        self.assertAlmostEqual(daily[1], 1 / 1.875)
+
+    def test_reorder_points(self):
+        safety, reorder = reorder_points(np.array([2.0, 0.0]), np.array([1.0, 0.0]), lead_time_days=4, service_level=0.95)
+        # z(0.95) = 1.645: safety ceil(1.645 * 1 * 2) = 4, reorder ceil(2 * 4 + 4) = 12
+        self.assertEqual((list(safety), list(reorder)), ([4, 0], [12, 0]))
+
+
+class DemandForecastTests(OrderFlowMixin, TestCase):
+    """Demand history from dispatches, the forecast_demand command and the suggested purchase list."""
+
+    def setUp(self):
+        super().setUp()
+        self.today = timezone.localdate()
+        now = timezone.now()
+        order = self.place_order()
+        self.approve(order)
+        self.backdate(self.dispatch(order, {self.gloves.id: 3}), now - timedelta(days=2))
+        self.backdate(self.dispatch(order, {self.gloves.id: 1, self.masks.id: 2}), now - timedelta(days=1))
+        self.void_item(order, self.masks)
+
+    def test_demand_matrix(self):
+        matrix = demand_matrix([self.gloves.id, self.masks.id], self.today - timedelta(days=3), 3)
+        self.assertEqual(matrix.tolist(), [[0, 3, 1], [0, 0, 0]])  # void lines left out
+
+    def test_forecast_command(self):
+        out = io.StringIO()
+        call_command('forecast_demand', method='sma', history_days=3, window=3, lead_time=2, service_level=0.5, stdout=out)
+        self.assertIn('Forecast 2 products.', out.getvalue())
+        gloves = DemandForecast.objects.get(product=self.gloves)
+        self.assertAlmostEqual(gloves.daily_demand, 1.3333)
+        self.assertAlmostEqual(gloves.demand_std, 1.5275)
+        self.assertEqual((gloves.safety_stock, gloves.reorder_point, gloves.days_of_cover), (0, 3, 72.0))
+        masks = DemandForecast.objects.get(product=self.masks)
+        self.assertEqual((masks.daily_demand, masks.reorder_point, masks.days_of_cover), (0, 0, None))
+        with self.assertRaises(CommandError):
+            call_command('forecast_demand', alpha=0, stdout=out)
+
+    def test_suggested_purchase(self):
+        call_command('forecast_demand', method='sma', history_days=3, window=3, lead_time=2, service_level=0.5, stdout=io.StringIO())
+        Product.objects.filter(pk=self.gloves.pk).update(stock_quantity=2, pack_size=10)
+        rows = self.client.get('/api/reports/suggested-purchase/').data
+        # reorder point 3 + 30 days x 1.33 = 43 units wanted, 41 short, ordered in packs of 10
+        self.assertEqual([(r['product_name'], r['on_order'], r['suggested_quantity']) for r in rows], [('Gloves', 0, 50)])
+        with self.captureOnCommitCallbacks(execute=True):
+            purchase = Purchase.objects.create(supplier_name='Supplier')
+            PurchaseItem.objects.create(purchase=purchase, product=self.gloves, quantity=5, unit_price=4)
+        self.assertEqual(self.client.get('/api/reports/suggested-purchase/').data, [])
+
+
+class InventoryTurnoverTests(OrderFlowMixin, TestCase):
+    """Daily stock snapshots and turnover: cost of goods dispatched over average inventory value."""
+
+    def setUp(self):
+        super().setUp()
+        self.today = timezone.localdate()
+        self.yesterday = self.today - timedelta(days=1)
+        # The gloves lot cost 5 a unit, received well before the window; masks have no cost
+        purchase = Purchase.objects.create(supplier_name='Supplier', status='approved', approved_at=timezone.now() - timedelta(days=10))
+        PurchaseItem.objects.create(purchase=purchase, product=self.gloves, quantity=100, unit_price=5,
+                                    batch_number='B1', expiry_date=self.gloves.batches.get().expiry_date)
+        self.order = self.place_order()
+        self.approve(self.order)
+        self.dispatch(self.order, {self.gloves.id: 4})
+        call_command('snapshot_stock', days=2, stdout=io.StringIO())
+
+    def report(self, **params):
+        response = self.client.get('/api/reports/inventory-turnover/', {
+            'start_date': str(self.yesterday), 'end_date': str(self.today), **params,
+        })
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data['results']
+
+    def test_snapshots_rolled_back(self):
+        snapshots = {(s.snapshot_date, s.product_id): (s.quantity, s.value) for s in StockSnapshot.objects.all()}
+        self.assertEqual(snapshots, {
+            (self.yesterday, self.gloves.id): (100, Decimal('500.00')),
+            (self.today, self.gloves.id): (96, Decimal('480.00')),
+            (self.yesterday, self.masks.id): (100, Decimal('0.00')),
+            (self.today, self.masks.id): (100, Decimal('0.00')),
+        })
+
+    def test_by_product(self):
+        gloves, masks = self.report()
+        self.assertEqual((gloves['product_name'], gloves['snapshot_days'], gloves['avg_quantity']), ('Gloves', 2, 98.0))
+        self.assertEqual((gloves['avg_inventory_value'], gloves['cogs'], gloves['turnover'], gloves['days_of_cover']), (490.0, 20.0, 0.0408, 49.0))
+        self.assertEqual((masks['product_name'], masks['cogs'], masks['turnover']), ('Masks', 0.0, None))
+
+    def test_by_category_and_voids(self):
+        row, = self.report(group_by='category')
+        self.assertEqual((row['category'], row['avg_inventory_value'], row['cogs']), ('Consumables', 490.0, 20.0))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.void_item(self.order, self.gloves)
+        self.assertEqual(self.report(group_by='category')[0]['cogs'], 0.0)
+
+    def test_bad_params(self):
+        for params in ({'group_by': 'pharmacy'}, {'start_date': 'yesterday'}):
+            self.assertEqual(self.client.get('/api/reports/inventory-turnover/', params).status_code, 400)
+
+
+class SalesFactTests(OrderFlowMixin, TestCase):
+    """SalesFact is kept by increments on dispatch and decrements on void, and always matches a full rebuild."""
+
+    def setUp(self):
+        super().setUp()
+        self.order = self.place_order()
+        OrderItem.objects.filter(order=self.order).update(gst_rate=12)
+        OrderItem.objects.filter(order=self.order, product=self.gloves).update(free_qty=3)
+        self.approve(self.order)
+
+    def facts(self):
+        """{(product id, pharmacy id): measures} with every non-zero fact row"""
+        rows = {}
+        for fact in SalesFact.objects.exclude(quantity=0, value=0):
+            rows[fact.product_id, fact.pharmacy_id] = {m: getattr(fact, m) for m in FACT_MEASURES}
+        return rows
+
+    def assertMatchesRebuild(self):
+        facts = self.facts()
+        rebuild_sales_facts()
+        self.assertEqual(self.facts(), facts)
+        return facts
+
+    def test_dispatches_increment(self):
+        self.dispatch(self.order, {self.gloves.id: 3})
+        self.dispatch(self.order, {self.gloves.id: 1, self.masks.id: 2})
+        facts = self.assertMatchesRebuild()
+        # Free units follow the dispatched share, rounded down cumulatively: 2 of 3, then the last 1
+        self.assertEqual(facts[self.gloves.id, self.pharmacy.id], {
+            'quantity': 4, 'free_quantity': 3, 'value': Decimal('40.00'),
+            'taxable_value': Decimal('35.72'), 'gst_amount': Decimal('4.28'),
+        })
+        self.assertEqual(facts[self.masks.id, self.pharmacy.id]['value'], Decimal('10.00'))
+
+    def test_voids_decrement(self):
+        self.dispatch(self.order, {self.gloves.id: 3, self.masks.id: 2})
+        self.void_item(self.order, self.masks)
+        self.assertEqual(list(self.assertMatchesRebuild()), [(self.gloves.id, self.pharmacy.id)])
+        self.post(f'/api/orders/{self.order.id}/void/')
+        self.assertEqual(self.assertMatchesRebuild(), {})
+
+    def test_same_key_deltas_merge(self):
+        day = timezone.localdate()
+        delta = {'quantity': 1, 'free_quantity': 0, 'value': Decimal('10'), 'taxable_value': Decimal('8.93'), 'gst_amount': Decimal('1.07')}
+        key = (day, self.gloves.id, self.pharmacy.id)
+        apply_deltas([(key, delta), (key, delta)])
+        apply_deltas([(key, delta)])
+        fact = SalesFact.objects.get()
+        self.assertEqual((fact.quantity, fact.value, fact.taxable_value), (3, Decimal('30.00'), Decimal('26.79')))
+
+    def test_report(self):
+        self.dispatch(self.order, {self.gloves.id: 3, self.masks.id: 2})
+        response = self.client.get('/api/reports/sales-facts/', {'group_by': 'pharmacy,day'})
+        self.assertEqual(response.status_code, 200)
+        row, = response.data
+        self.assertEqual((row['pharmacy_name'], row['day'], row['quantity'], row['value']),
+                         ('Store 0', str(timezone.localdate()), 5, 40.0))
+        self.assertEqual(self.client.get('/api/reports/sales-facts/', {'group_by': 'supplier'}).status_code, 400)
+
+
+class PharmacyStatementTests(OrderFlowMixin, TestCase):
+    """The statement of account endpoints: period, pharmacy scope and the streamed and PDF formats."""
+
+    def setUp(self):
+        super().setUp()
+        self.today = timezone.localdate()
+        order = self.place_order()
+        self.approve(order)
+        self.dispatch(order, {self.gloves.id: 3})
+        self.put(f'/api/orders/{order.id}/record_payment/', {'amount': 10})
+        LedgerEntry.objects.filter(entry_type='dispatch').update(posted_at=timezone.now() - timedelta(days=40))
+
+    def statement(self, client=None, **params):
+        response = (client or self.client).get('/api/reports/statement/', {'format': 'jsonl', **params})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def test_window(self):
+        rows = self.statement(pharmacy_id=self.pharmacy.id, start_date=str(self.today - timedelta(days=30)), end_date=str(self.today))
+        self.assertEqual([(r['entry_type'], r['balance']) for r in rows], [('opening', '30.00'), ('payment', '20.00'), ('closing', '20.00')])
+
+    def test_month_to_date_by_default(self):
+        opening, *_, closing = self.statement(self.client_for_pharmacy())
+        self.assertEqual((opening['date'], closing['date']), (str(self.today.replace(day=1)), str(self.today)))
+        self.assertEqual(closing['balance'], '20.00')
+
+    def test_pharmacy_scope(self):
+        # Admins must name the pharmacy; a pharmacy user always gets its own, whatever pharmacy_id says
+        response = self.client.get('/api/reports/statement/', {'format': 'jsonl'})
+        self.assertEqual((response.status_code, response.json()), (400, {'detail': 'pharmacy_id is required.'}))
+        self.assertEqual(self.statement(pharmacy_id=self.other.id)[-1]['balance'], '0.00')
+        self.assertEqual(self.statement(self.client_for_pharmacy(), pharmacy_id=self.other.id)[-1]['balance'], '20.00')
+
+    def test_csv_by_default(self):
+        response = self.client.get('/api/reports/statement/', {'pharmacy_id': self.pharmacy.id})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        header, *rows = csv.reader(io.StringIO(b''.join(response.streaming_content).decode()))
+        self.assertEqual(header, ['Date', 'Type', 'Reference', 'Order No', 'Debit', 'Credit', 'Balance'])
+        self.assertEqual([r[1] for r in rows], ['opening', 'payment', 'closing'])
+
+    def test_pdf(self):
+        response = self.client.get('/api/reports/statement/pdf/', {'pharmacy_id': self.pharmacy.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(response.content.startswith(b'%PDF'))
+        self.assertEqual(self.client.get('/api/reports/statement/pdf/').status_code, 400)
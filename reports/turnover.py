@@ -0,0 +1,69 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, F, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+from orders.models import OrderItemAllocation
+from products.models import Product
+from .models import StockSnapshot
+from .valuation import valued_batches
+
+# group_by -> (snapshot fields to group on, allocation field matched against the first of them)
+TURNOVER_GROUPS = {
+    'product': (('product_id', 'product__name', 'product__category__name'), 'order_item__product_id'),
+    'category': (('product__category_id', 'product__category__name'), 'order_item__product__category_id'),
+}
+
+
+def take_stock_snapshot(snapshot_date=None):
+    """
+    Store closing stock per active product for snapshot_date (default today), valued as reports.valuation does;
+    a past date is rolled back from current stock. One grouped read and one bulk upsert. Returns the row count.
+    """
+    snapshot_date = snapshot_date or timezone.localdate()
+    held = {
+        r['product_id']: r
+        for r in valued_batches(snapshot_date).order_by().values('product_id').annotate(
+            quantity=Sum('on_hand'), total_value=Sum('value')
+        )
+    }
+    rows = [
+        StockSnapshot(
+            snapshot_date=snapshot_date,
+            product_id=pid,
+            quantity=held.get(pid, {}).get('quantity') or 0,
+            value=Decimal(str(round(held.get(pid, {}).get('total_value') or 0, 2))),
+        )
+        for pid in Product.objects.filter(is_active=True).values_list('id', flat=True).iterator()
+    ]
+    StockSnapshot.objects.bulk_create(
+        rows, batch_size=2000, update_conflicts=True,
+        unique_fields=['snapshot_date', 'product'], update_fields=['quantity', 'value'],
+    )
+    return len(rows)
+
+
+def inventory_turnover(start, end, group_by='product', category_id=None):
+    """
+    Per product or category over [start, end] (dates, inclusive): average inventory value from the daily snapshots,
+    cost of goods dispatched (allocation unit_cost snapshot; void lines and lines without a cost excluded), and the
+    number of snapshot days. One grouped query; turnover and days of cover are derived by the caller.
+    """
+    fields, allocation_key = TURNOVER_GROUPS[group_by]
+    cogs = OrderItemAllocation.objects.filter(
+        business_date__gte=start, business_date__lt=end + timedelta(days=1), order_item__is_void=False,
+        **{allocation_key: OuterRef(fields[0])}
+    ).order_by().values(allocation_key).annotate(
+        total=Sum(F('quantity') * F('unit_cost'), output_field=DecimalField())
+    ).values('total')[:1]
+    snapshots = StockSnapshot.objects.filter(snapshot_date__gte=start, snapshot_date__lte=end)
+    if category_id:
+        snapshots = snapshots.filter(product__category_id=category_id)
+    return snapshots.order_by().values(*fields).annotate(
+        days=Count('snapshot_date', distinct=True),
+        avg_inventory_value=Cast(Sum('value'), FloatField()) / Count('snapshot_date', distinct=True),
+        avg_quantity=Cast(Sum('quantity'), FloatField()) / Count('snapshot_date', distinct=True),
+        cogs=Cast(Coalesce(Subquery(cogs), Decimal('0')), FloatField()),
+    )
@@ -1,43 +1,69 @@
 from django.urls import path
+from .bundle import ReportBundleView
 from .views import (
     AdminDashboardStatsView,
     SalesByProductReport,
+    GrossMarginReport,
+    SalesFactReport,
     OutstandingByStoreReport,
+    ReceivablesAgingReport,
     CollectionsSummaryReport,
     StockExpiryReport,
+    DeadStockReport,
     LowStockReport,
+    SuggestedPurchaseReport,
+    InventoryClassificationReport,
     StockRequirementsReport,
     CurrentStockSummaryReport,
     StockValuationReport,
+    InventoryTurnoverReport,
     PurchaseHistoryReport,
     PurchaseByProductReport,
     OrderStatusSummaryReport,
     FulfillmentReport,
+    FulfillmentLeadTimeReport,
     InvoiceListReport,
+    SalesRegisterReport,
     InvoicesGeneratedReport,
+    PharmacyStatementReport,
+    PharmacyStatementPDFView,
     VoidReport,
+    PharmacyAccountSummaryView,
     PharmacyOrderSummaryView,
     PharmacyOutstandingView,
     PharmacyInvoiceListView,
 )
 
 urlpatterns = [
+    path('bundle/', ReportBundleView.as_view(), name='report_bundle'),
     path('dashboard-stats/', AdminDashboardStatsView.as_view(), name='admin_dashboard_stats'),
     path('sales-by-product/', SalesByProductReport.as_view(), name='report_sales_by_product'),
+    path('gross-margin/', GrossMarginReport.as_view(), name='report_gross_margin'),
+    path('sales-facts/', SalesFactReport.as_view(), name='report_sales_facts'),
     path('outstanding-by-store/', OutstandingByStoreReport.as_view(), name='report_outstanding_by_store'),
+    path('receivables-aging/', ReceivablesAgingReport.as_view(), name='report_receivables_aging'),
     path('collections-summary/', CollectionsSummaryReport.as_view(), name='report_collections_summary'),
     path('stock-expiry/', StockExpiryReport.as_view(), name='report_stock_expiry'),
+    path('dead-stock/', DeadStockReport.as_view(), name='report_dead_stock'),
     path('low-stock/', LowStockReport.as_view(), name='report_low_stock'),
+    path('suggested-purchase/', SuggestedPurchaseReport.as_view(), name='report_suggested_purchase'),
+    path('inventory-classification/', InventoryClassificationReport.as_view(), name='report_inventory_classification'),
     path('stock-requirements/', StockRequirementsReport.as_view(), name='report_stock_requirements'),
     path('stock-summary/', CurrentStockSummaryReport.as_view(), name='report_stock_summary'),
     path('stock-valuation/', StockValuationReport.as_view(), name='report_stock_valuation'),
+    path('inventory-turnover/', InventoryTurnoverReport.as_view(), name='report_inventory_turnover'),
     path('purchase-history/', PurchaseHistoryReport.as_view(), name='report_purchase_history'),
     path('purchase-by-product/', PurchaseByProductReport.as_view(), name='report_purchase_by_product'),
     path('order-status-summary/', OrderStatusSummaryReport.as_view(), name='report_order_status_summary'),
     path('fulfillment/', FulfillmentReport.as_view(), name='report_fulfillment'),
+    path('fulfillment/lead-time/', FulfillmentLeadTimeReport.as_view(), name='report_fulfillment_lead_time'),
     path('invoice-list/', InvoiceListReport.as_view(), name='report_invoice_list'),
+    path('sales-register/', SalesRegisterReport.as_view(), name='report_sales_register'),
+    path('statement/', PharmacyStatementReport.as_view(), name='report_pharmacy_statement'),
+    path('statement/pdf/', PharmacyStatementPDFView.as_view(), name='report_pharmacy_statement_pdf'),
     path('invoices-generated/', InvoicesGeneratedReport.as_view(), name='report_invoices_generated'),
     path('void/', VoidReport.as_view(), name='report_void'),
+    path('pharmacy/account-summary/', PharmacyAccountSummaryView.as_view(), name='report_pharmacy_account_summary'),
     path('pharmacy/order-summary/', PharmacyOrderSummaryView.as_view(), name='report_pharmacy_order_summary'),
     path('pharmacy/outstanding/', PharmacyOutstandingView.as_view(), name='report_pharmacy_outstanding'),
     path('pharmacy/invoice-list/', PharmacyInvoiceListView.as_view(), name='report_pharmacy_invoice_list'),
@@ -0,0 +1,111 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Case, CharField, DecimalField, ExpressionWrapper, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from orders.models import OrderItemAllocation
+from products.costing import COST_FIELD, approved_purchase_lines, average_cost_subquery
+from products.models import StockBatch
+
+VALUE_FIELD = DecimalField(max_digits=18, decimal_places=4)
+
+# (key, first day, last day) until expiry, counted from the valuation date; None = open-ended
+EXPIRY_BUCKETS = [
+    ('expired', None, -1),
+    ('0_30', 0, 30),
+    ('31_90', 31, 90),
+    ('91_180', 91, 180),
+    ('180_plus', 181, None),
+]
+
+
+def _sum_subquery(qs, field):
+    return Coalesce(
+        Subquery(qs.order_by().values(field).annotate(total=Sum('quantity')).values('total')[:1], output_field=IntegerField()),
+        0,
+    )
+
+
+def valued_batches(as_of=None):
+    """
+    StockBatch rows annotated with on_hand (quantity held at the end of as_of), unit_cost, cost_source,
+    value and expiry_bucket, all computed in SQL.
+
+    Each lot is costed as products.costing.batch_unit_cost does, in SQL: the weighted average price of the approved
+    purchase lines for the same (product, batch number, expiry), else the product's weighted average purchase cost
+    (opening stock, manual batches); lots with no purchase history at all have no cost (value 0). Costs and values
+    are decimals (unit_cost to COST_PLACES); callers round values to the paisa.
+    For a past as_of, quantities are rolled back by the dispatches and the purchases approved (received) after that
+    day; write-offs are not recorded, so they cannot be rolled back.
+    """
+    today = timezone.localdate()
+    as_of = as_of or today
+    purchases = approved_purchase_lines(as_of)
+    lot_cost = average_cost_subquery(purchases.filter(
+        product=OuterRef('product'), batch_number=OuterRef('batch_number'), expiry_date=OuterRef('expiry_date')
+    ))
+    product_cost = average_cost_subquery(purchases.filter(product=OuterRef('product')))
+
+    on_hand = F('quantity')
+    if as_of < today:
+        day_end = timezone.make_aware(datetime.combine(as_of + timedelta(days=1), time.min))
+        dispatched_since = OrderItemAllocation.objects.filter(stock_batch=OuterRef('pk'), created_at__gte=day_end)
+        received_since = approved_purchase_lines().filter(
+            purchase__approved_at__gte=day_end,
+            product=OuterRef('product'), batch_number=OuterRef('batch_number'), expiry_date=OuterRef('expiry_date'),
+        )
+        on_hand = on_hand + _sum_subquery(dispatched_since, 'stock_batch') - _sum_subquery(received_since, 'product')
+
+    expiry_cases = []
+    for key, first_day, last_day in EXPIRY_BUCKETS:
+        condition = Q()
+        if first_day is not None:
+            condition &= Q(expiry_date__gte=as_of + timedelta(days=first_day))
+        if last_day is not None:
+            condition &= Q(expiry_date__lte=as_of + timedelta(days=last_day))
+        expiry_cases.append(When(condition, then=Value(key)))
+
+    return StockBatch.objects.annotate(
+        on_hand=ExpressionWrapper(on_hand, output_field=IntegerField()),
+        lot_cost=lot_cost,
+        product_cost=product_cost,
+    ).filter(on_hand__gt=0).annotate(
+        unit_cost=Coalesce('lot_cost', 'product_cost', Value(Decimal('0')), output_field=COST_FIELD),
+        cost_source=Case(
+            When(lot_cost__isnull=False, then=Value('lot')),
+            When(product_cost__isnull=False, then=Value('average')),
+            default=Value('none'),
+            output_field=CharField(),
+        ),
+        value=ExpressionWrapper(F('on_hand') * F('unit_cost'), output_field=VALUE_FIELD),
+        expiry_bucket=Case(*expiry_cases, output_field=CharField()),
+    )
+
+
+def stock_valuation(as_of=None, category_id=None):
+    """
+    Valued stock as of a date: per-product totals plus breakdowns by category and by near-expiry bucket,
+    each a grouped query over valued_batches().
+    """
+    batches = valued_batches(as_of)
+    if category_id:
+        batches = batches.filter(product__category_id=category_id)
+
+    def grouped(*fields):
+        return batches.order_by().values(*fields).annotate(quantity=Sum('on_hand'), total_value=Sum('value'))
+
+    products = grouped('product_id', 'product__name', 'product__category__name').order_by('-total_value', 'product_id')
+    categories = grouped('product__category_id', 'product__category__name').order_by('-total_value')
+    expiry = {r['expiry_bucket']: r for r in grouped('expiry_bucket')}
+    unvalued = batches.filter(cost_source='none').aggregate(quantity=Sum('on_hand'))['quantity'] or 0
+    return {
+        'products': list(products),
+        'categories': list(categories),
+        'expiry': [
+            {'bucket': key, 'quantity': expiry.get(key, {}).get('quantity') or 0, 'value': expiry.get(key, {}).get('total_value') or Decimal('0')}
+            for key, _, _ in EXPIRY_BUCKETS
+        ],
+        'unvalued_quantity': unvalued,
+    }
@@ -1,97 +1,273 @@
-from datetime import datetime, timedelta
+import itertools
+import math
+from datetime import date, datetime, timedelta
 from decimal import Decimal
-from django.db.models import Sum, Count, F
-from django.db.models.functions import TruncDate
+from django.db.models import Sum, Count, Min, F, Q, OuterRef, Subquery, Value, ExpressionWrapper, DecimalField, FloatField, DurationField
+from django.db.models.functions import TruncWeek, TruncMonth, TruncQuarter, TruncYear, Cast, Coalesce, NullIf
 from django.utils import timezone
+from django.http import HttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import permissions
+from rest_framework.pagination import PageNumberPagination
 
 from accounts.permissions import IsAdminUser, IsPharmacyUser
-from orders.models import Order, OrderItem, OrderItemAllocation
+from orders import ledger
+from orders.models import Order, OrderItem, OrderItemAllocation, Dispatch
+from products.costing import COST_PLACES, DecimalRatio
 from products.models import Product, StockBatch, Purchase, PurchaseItem
 from pharmacies.models import Pharmacy
-from invoices.models import Invoice
+from weasyprint import HTML
+from invoices.models import Invoice, InvoiceTaxSummary
+from invoices.rendering import render_statement_html
+from invoices.tax import gst_state_code
+from .account_summary import STATUS_FIELDS, get_account_summary
+from .aging import ACTIVE_STATUSES, AGING_BUCKETS, receivables_aging
+from .classification import latest_period
+from .facts import FACT_MEASURES as SALES_FACT_MEASURES, MONEY_PLACES
+from .models import DemandForecast, InventoryClass, SalesFact
+from .valuation import stock_valuation, valued_batches
+from .turnover import TURNOVER_GROUPS, inventory_turnover
+from .cache import cached_report
+from .dates import filter_date_range, parse_date_range
+from .snapshots import snapshot_report
+from .dashboard import dashboard_stats
+from .pagination import ReportCursorPagination, paginated_report
+from .exports import (
+    CSVRenderer, JSONLinesRenderer, XLSXRenderer, ExportContentNegotiation, ExportableReportMixin, JSONErrorsMixin, stream_rows,
+)
 
 
-def _parse_date_range(request):
-    start_date = request.query_params.get('start_date')
-    end_date = request.query_params.get('end_date')
-    start_d = end_d = None
-    if start_date:
-        try:
-            start_d = datetime.strptime(start_date, '%Y-%m-%d').date()
-        except ValueError:
-            pass
-    if end_date:
-        try:
-            end_d = datetime.strptime(end_date, '%Y-%m-%d').date()
-        except ValueError:
-            pass
-    return start_d, end_d
+def _parse_limit(request):
+    """Optional positive ?limit= (top-N); None when absent or invalid."""
+    try:
+        limit = int(request.query_params.get('limit', 0))
+    except (TypeError, ValueError):
+        return None
+    return limit if limit > 0 else None
+
+
+def _ordered_qty_subquery(include_void=True):
+    """Total ordered quantity of the outer Order, as a correlated subquery (0 when no lines)."""
+    items = OrderItem.objects.filter(order=OuterRef('pk'))
+    if not include_void:
+        items = items.filter(is_void=False)
+    total = items.order_by().values('order').annotate(total=Sum('quantity')).values('total')
+    return Coalesce(Subquery(total), 0)
+
 
+def _dispatched_qty_subquery(include_void=True):
+    """Total allocated (dispatched) quantity of the outer Order, as a correlated subquery (0 when nothing dispatched)."""
+    allocations = OrderItemAllocation.objects.filter(order_item__order=OuterRef('pk'))
+    if not include_void:
+        allocations = allocations.filter(order_item__is_void=False)
+    total = allocations.order_by().values('order_item__order').annotate(total=Sum('quantity')).values('total')
+    return Coalesce(Subquery(total), 0)
 
-class AdminDashboardStatsView(APIView):
+
+def _product_totals(qs, product_field, value_expr, request):
+    """
+    Quantity and value per product (or per category with ?group_by=category) as one grouped query.
+    Ordered in SQL by ?ordering= value|quantity (prefix '-' for descending, default -value) and cut to ?limit=.
+    """
+    if request.query_params.get('group_by') == 'category':
+        id_field, name_field, id_key, name_key = f'{product_field}__category', f'{product_field}__category__name', 'category_id', 'category_name'
+    else:
+        id_field, name_field, id_key, name_key = product_field, f'{product_field}__name', 'product_id', 'product_name'
+    ordering = request.query_params.get('ordering', '-value')
+    sort_field = ordering.lstrip('-')
+    if sort_field not in ('value', 'quantity'):
+        ordering, sort_field = '-value', 'value'
+    direction = '-' if ordering.startswith('-') else ''
+    rows = qs.values(id_field, name_field).annotate(
+        total_quantity=Sum('quantity'),
+        total_value=Sum(value_expr),
+    ).order_by(f'{direction}total_{sort_field}', id_field)
+    limit = _parse_limit(request)
+    if limit:
+        rows = rows[:limit]
+    return [
+        {
+            id_key: r[id_field],
+            name_key: r[name_field] or '—',
+            'quantity': r['total_quantity'] or 0,
+            'value': float(r['total_value'] or 0),
+        }
+        for r in rows
+    ]
+
+
+class AdminDashboardStatsView(ExportableReportMixin, APIView):
+    """Dashboard counters, outstanding totals and recent orders from the cached stats service (reports.dashboard)."""
     permission_classes = [permissions.IsAdminUser]
 
     def get(self, request):
-        total_orders = Order.objects.count()
-        total_sales = Order.objects.filter(status='delivered').aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-        pending_orders = Order.objects.filter(status='pending').count()
-        low_stock_products = Product.objects.filter(stock_quantity__lt=10, is_active=True).count()
-        recent_orders = Order.objects.order_by('-created_at')[:5]
-        return Response({
-            "total_orders": total_orders,
-            "total_sales": total_sales,
-            "pending_orders": pending_orders,
-            "low_stock_count": low_stock_products,
-        })
+        stats = dashboard_stats()
+        if self.export_format(request):
+            return self.report_response(request, [{k: v for k, v in stats.items() if not isinstance(v, (list, dict))}])
+        return Response(stats)
 
 
-class SalesByProductReport(APIView):
+class SalesByProductReport(ExportableReportMixin, APIView):
     permission_classes = [IsAdminUser]
 
+    @cached_report('orders', 'dispatch')
     def get(self, request):
-        start_d, end_d = _parse_date_range(request)
+        start_d, end_d = parse_date_range(request)
         qs = OrderItemAllocation.objects.filter(
             order_item__order__status__in=['approved', 'processing', 'shipped', 'delivered']
-        ).select_related('order_item__order', 'order_item__product')
+        )
+        qs = filter_date_range(qs, 'order_item__order__business_date', start_d, end_d)
+        report = _product_totals(qs, 'order_item__product', F('quantity') * F('order_item__unit_price'), request)
+        return Response(report)
+
+
+# group_by dimension -> output column -> SalesFact field or expression
+SALES_FACT_DIMENSIONS = {
+    'product': {'product_id': 'product_id', 'product_name': 'product__name'},
+    'category': {'category_id': 'product__category_id', 'category_name': 'product__category__name'},
+    'pharmacy': {'pharmacy_id': 'pharmacy_id', 'pharmacy_name': 'pharmacy__pharmacy_name'},
+    'day': {'day': 'business_date'},
+    'week': {'week': TruncWeek('business_date')},
+    'month': {'month': TruncMonth('business_date')},
+    'quarter': {'quarter': TruncQuarter('business_date')},
+    'year': {'year': TruncYear('business_date')},
+}
+SALES_FACT_FILTERS = {'product_id': 'product_id__in', 'pharmacy_id': 'pharmacy_id__in', 'category_id': 'product__category_id__in'}
+
+
+class SalesFactReport(ExportableReportMixin, APIView):
+    """
+    Slice and dice dispatched sales from the SalesFact table (product x pharmacy x business date, see reports.facts).
+    ?group_by= comma-separated dimensions (product, category, pharmacy, day, week, month, quarter, year; default product);
+    filters start_date / end_date (business date), product_id, pharmacy_id, category_id (comma-separated ids).
+    Sums quantity, free_quantity, value, taxable_value and gst_amount per group; ?ordering= a measure (default -value), ?limit=.
+    """
+    permission_classes = [IsAdminUser]
+
+    @cached_report('orders', 'dispatch')
+    def get(self, request):
+        dimensions = [d for d in request.query_params.get('group_by', 'product').split(',') if d]
+        unknown = [d for d in dimensions if d not in SALES_FACT_DIMENSIONS]
+        if unknown or not dimensions:
+            return Response({'detail': f"group_by must be a comma-separated list of: {', '.join(SALES_FACT_DIMENSIONS)}."}, status=400)
+        facts = SalesFact.objects.all()
+        start_d, end_d = parse_date_range(request)
         if start_d:
-            qs = qs.filter(order_item__order__created_at__date__gte=start_d)
+            facts = facts.filter(business_date__gte=start_d)
         if end_d:
-            qs = qs.filter(order_item__order__created_at__date__lte=end_d)
-        from collections import defaultdict
-        by_product = defaultdict(lambda: {'quantity': 0, 'value': Decimal('0'), 'name': None})
-        for a in qs:
-            pid = a.order_item.product_id
-            qty = a.quantity
-            price = a.order_item.unit_price or 0
-            by_product[pid]['quantity'] += qty
-            by_product[pid]['value'] += qty * price
-            by_product[pid]['name'] = a.order_item.product.name if a.order_item.product_id else '—'
-        report = [
-            {'product_id': pid, 'product_name': data['name'] or '—', 'quantity': data['quantity'], 'value': float(data['value'])}
-            for pid, data in by_product.items()
-        ]
-        report.sort(key=lambda x: -x['value'])
+            facts = facts.filter(business_date__lte=end_d)
+        for param, lookup in SALES_FACT_FILTERS.items():
+            ids = [i for i in request.query_params.get(param, '').split(',') if i.isdigit()]
+            if ids:
+                facts = facts.filter(**{lookup: ids})
+
+        columns = {}
+        for dimension in dimensions:
+            columns.update(SALES_FACT_DIMENSIONS[dimension])
+        ordering = request.query_params.get('ordering', '-value')
+        if ordering.lstrip('-') not in SALES_FACT_MEASURES:
+            ordering = '-value'
+        fields = [source for alias, source in columns.items() if alias == source]
+        expressions = {alias: F(source) if isinstance(source, str) else source for alias, source in columns.items() if alias != source}
+        rows = facts.order_by().values(*fields, **expressions).annotate(
+            **{f'total_{m}': Sum(m) for m in SALES_FACT_MEASURES}
+        ).order_by(('-' if ordering.startswith('-') else '') + 'total_' + ordering.lstrip('-'), *columns)
+        limit = _parse_limit(request)
+        if limit:
+            rows = rows[:limit]
+
+        def to_row(r):
+            row = {}
+            for alias in columns:
+                value = r[alias]
+                if isinstance(value, (date, datetime)):
+                    value = str(value)
+                row[alias] = '—' if value is None and alias.endswith('_name') else value
+            row.update({m: r[f'total_{m}'] if m.endswith('quantity') else float(r[f'total_{m}']) for m in SALES_FACT_MEASURES})
+            return row
+        return self.report_response(request, (to_row(r) for r in rows.iterator(chunk_size=2000)))
+
+
+class GrossMarginReport(ExportableReportMixin, APIView):
+    """
+    Revenue (ex-GST), cost of goods sold and gross margin of dispatched stock, from the per-allocation cost
+    snapshot (OrderItemAllocation.unit_cost): one grouped query, no join to purchase history.
+    ?group_by= product (default) | category | pharmacy | month; filters: start_date / end_date (dispatch date),
+    pharmacy_id, category_id. Margin covers costed units only; units without a known cost are counted separately.
+    """
+    permission_classes = [IsAdminUser]
+    groupings = {
+        'product': ('order_item__product', 'order_item__product__name', 'product_id', 'product_name'),
+        'category': ('order_item__product__category', 'order_item__product__category__name', 'category_id', 'category_name'),
+        'pharmacy': ('order_item__order__pharmacy', 'order_item__order__pharmacy__pharmacy_name', 'pharmacy_id', 'pharmacy_name'),
+    }
+    amount_field = DecimalField(max_digits=18, decimal_places=4)
+
+    @cached_report('orders', 'dispatch')
+    def get(self, request):
+        start_d, end_d = parse_date_range(request)
+        qs = OrderItemAllocation.objects.filter(
+            order_item__order__status__in=ACTIVE_STATUSES, order_item__order__is_void=False, order_item__is_void=False
+        )
+        qs = filter_date_range(qs, 'business_date', start_d, end_d)
+        pharmacy_id = request.query_params.get('pharmacy_id')
+        if pharmacy_id:
+            qs = qs.filter(order_item__order__pharmacy_id=pharmacy_id)
+        category_id = request.query_params.get('category_id')
+        if category_id:
+            qs = qs.filter(order_item__product__category_id=category_id)
+
+        group_by = request.query_params.get('group_by', 'product')
+        if group_by == 'month':
+            rows = qs.annotate(month=TruncMonth('business_date')).values('month')
+        else:
+            id_field, name_field, id_key, name_key = self.groupings.get(group_by, self.groupings['product'])
+            rows = qs.values(id_field, name_field)
+        # Line prices include GST; margin is measured on the taxable value.
+        revenue = DecimalRatio(
+            F('quantity') * F('order_item__unit_price') * 100, F('order_item__gst_rate') + 100, output_field=self.amount_field
+        )
+        costed = Q(unit_cost__isnull=False)
+        rows = rows.annotate(
+            total_quantity=Sum('quantity'),
+            total_revenue=Sum(revenue),
+            costed_revenue=Sum(revenue, filter=costed),
+            cogs=Sum(F('quantity') * F('unit_cost'), output_field=self.amount_field),
+            uncosted_quantity=Coalesce(Sum('quantity', filter=~costed), 0),
+        ).order_by('month' if group_by == 'month' else '-total_revenue')
+
+        report = []
+        zero = Decimal('0')
+        for r in rows:
+            margin = (r['costed_revenue'] or zero) - (r['cogs'] or zero)
+            if group_by == 'month':
+                row = {'month': r['month'].strftime('%Y-%m') if r['month'] else None}
+            else:
+                row = {id_key: r[id_field], name_key: r[name_field] or '—'}
+            row.update({
+                'quantity': r['total_quantity'],
+                'revenue': (r['total_revenue'] or zero).quantize(MONEY_PLACES),
+                'cogs': (r['cogs'] or zero).quantize(MONEY_PLACES),
+                'gross_margin': margin.quantize(MONEY_PLACES),
+                'margin_percent': (margin * 100 / r['costed_revenue']).quantize(MONEY_PLACES) if r['costed_revenue'] else None,
+                'uncosted_quantity': r['uncosted_quantity'],
+            })
+            report.append(row)
         return Response(report)
 
 
-class OutstandingByStoreReport(APIView):
+@snapshot_report('outstanding_by_store')
+class OutstandingByStoreReport(ExportableReportMixin, APIView):
     permission_classes = [IsAdminUser]
 
+    @cached_report('orders', 'dispatch', 'payments')
     def get(self, request):
-        # Dispatched per pharmacy: sum of (allocations.quantity * order_item.unit_price)
-        allocations = OrderItemAllocation.objects.select_related(
-            'order_item__order', 'order_item__order__pharmacy'
-        ).filter(order_item__order__status__in=['approved', 'processing', 'shipped', 'delivered'])
-        from collections import defaultdict
-        dispatched_map = defaultdict(lambda: Decimal('0'))
-        for a in allocations:
-            pid = a.order_item.order.pharmacy_id
-            if pid:
-                dispatched_map[pid] += a.quantity * (a.order_item.unit_price or 0)
-        dispatched_map = {k: float(v) for k, v in dispatched_map.items()}
+        # Dispatched per pharmacy: sum of (allocations.quantity * order_item.unit_price), grouped in SQL
+        dispatched = OrderItemAllocation.objects.filter(
+            order_item__order__status__in=['approved', 'processing', 'shipped', 'delivered']
+        ).values('order_item__order__pharmacy').annotate(total=Sum(F('quantity') * F('order_item__unit_price')))
+        dispatched_map = {r['order_item__order__pharmacy']: float(r['total'] or 0) for r in dispatched if r['order_item__order__pharmacy']}
         paid = Order.objects.values('pharmacy').annotate(paid=Sum('paid_amount'))
         paid_map = {r['pharmacy']: float(r['paid'] or 0) for r in paid}
         pharmacy_ids = set(dispatched_map) | set(paid_map)
@@ -111,16 +287,55 @@ class OutstandingByStoreReport(APIView):
         return Response(report)
 
 
-class CollectionsSummaryReport(APIView):
+class ReceivablesAgingReport(ExportableReportMixin, APIView):
+    """
+    Outstanding per pharmacy in 0-30 / 31-60 / 61-90 / 90+ day buckets by dispatch date, payments applied oldest-first.
+    ?pharmacy_id= limits to one store; ?view=totals returns only the overall buckets; ?as_of=YYYY-MM-DD ages as of that day's end.
+    Exports (?format=csv|xlsx) contain the pharmacy rows, or the totals row with view=totals.
+    """
     permission_classes = [IsAdminUser]
 
+    @cached_report('orders', 'dispatch', 'payments')
     def get(self, request):
-        start_d, end_d = _parse_date_range(request)
-        qs = Order.objects.exclude(status='rejected')
-        if start_d:
-            qs = qs.filter(created_at__date__gte=start_d)
-        if end_d:
-            qs = qs.filter(created_at__date__lte=end_d)
+        as_of = None
+        as_of_param = request.query_params.get('as_of')
+        if as_of_param:
+            try:
+                as_of_day = datetime.strptime(as_of_param, '%Y-%m-%d') + timedelta(days=1)
+                as_of = timezone.make_aware(as_of_day) - timedelta(microseconds=1)
+            except ValueError:
+                pass
+        aging = receivables_aging(as_of=as_of, pharmacy_id=request.query_params.get('pharmacy_id'))
+        bucket_keys = [key for key, _, _ in AGING_BUCKETS]
+        totals = {key: sum((b[key] for b in aging.values()), Decimal('0')) for key in bucket_keys}
+        totals['outstanding'] = sum((totals[key] for key in bucket_keys), Decimal('0'))
+        data = {
+            'as_of': (as_of or timezone.now()).isoformat(),
+            'buckets': bucket_keys,
+            'totals': {k: float(v) for k, v in totals.items()},
+        }
+        if request.query_params.get('view') != 'totals':
+            names = dict(Pharmacy.objects.filter(id__in=aging.keys()).values_list('id', 'pharmacy_name'))
+            rows = []
+            for pid, buckets in aging.items():
+                row = {'pharmacy_id': pid, 'pharmacy_name': names.get(pid, '—')}
+                row.update({k: float(v) for k, v in buckets.items()})
+                row['outstanding'] = float(sum(buckets.values()))
+                rows.append(row)
+            rows.sort(key=lambda x: -x['outstanding'])
+            data['pharmacies'] = rows
+        if self.export_format(request):
+            return self.report_response(request, data.get('pharmacies', [data['totals']]))
+        return Response(data)
+
+
+class CollectionsSummaryReport(ExportableReportMixin, APIView):
+    permission_classes = [IsAdminUser]
+
+    @cached_report('orders', 'payments')
+    def get(self, request):
+        start_d, end_d = parse_date_range(request)
+        qs = filter_date_range(Order.objects.exclude(status='rejected'), 'business_date', start_d, end_d)
         agg = qs.aggregate(
             total_collections=Sum('paid_amount'),
             order_count=Count('id'),
@@ -131,9 +346,10 @@ class CollectionsSummaryReport(APIView):
         })
 
 
-class StockExpiryReport(APIView):
+class StockExpiryReport(ExportableReportMixin, APIView):
     permission_classes = [IsAdminUser]
 
+    @cached_report('stock')
     def get(self, request):
         days = int(request.query_params.get('days', 90))
         today = timezone.now().date()
@@ -143,7 +359,7 @@ class StockExpiryReport(APIView):
             expiry_date__gte=today,
             expiry_date__lte=end_date
         ).select_related('product').order_by('expiry_date')
-        report = [
+        report = (
             {
                 'batch_id': b.id,
                 'product_id': b.product_id,
@@ -153,36 +369,229 @@ class StockExpiryReport(APIView):
                 'quantity': b.quantity,
                 'days_until_expiry': (b.expiry_date - today).days,
             }
-            for b in batches
-        ]
-        return Response(report)
+            for b in batches.iterator(chunk_size=2000)
+        )
+        return self.report_response(request, report)
 
 
-class LowStockReport(APIView):
+class DeadStockReport(ExportableReportMixin, APIView):
+    """
+    Stock with no dispatch in the last ?days= (default 90), valued at landed cost (see reports.valuation), with expiry.
+    Batches by default; ?level=product for products idle as a whole. Never-dispatched stock counts once it is older
+    than the window (received_date / created_at). Filters on the indexed last_dispatched_at columns; ?category_id=.
+    Keyset-paginated by value (see ReportCursorPagination).
+    """
     permission_classes = [IsAdminUser]
+    ordering = '-value'
+    ordering_fields = ('value',)
 
+    @cached_report('stock', 'dispatch')
     def get(self, request):
-        threshold = int(request.query_params.get('threshold', 10))
-        products = Product.objects.filter(
-            is_active=True,
-            stock_quantity__lt=threshold
-        ).values('id', 'name', 'stock_quantity', 'category__name').order_by('stock_quantity')
-        report = [
-            {
-                'product_id': p['id'],
-                'product_name': p['name'],
-                'category': p['category__name'] or '—',
-                'stock_quantity': p['stock_quantity'],
+        try:
+            days = int(request.query_params.get('days', 90))
+        except ValueError:
+            return Response({'detail': 'days must be a whole number.'}, status=400)
+        now = timezone.now()
+        cutoff = now - timedelta(days=days)
+        by_product = request.query_params.get('level') == 'product'
+        batches = valued_batches()
+        if by_product:
+            idle = Product.objects.filter(
+                Q(last_dispatched_at__lt=cutoff) | Q(last_dispatched_at__isnull=True, created_at__lt=cutoff),
+                is_active=True,
+            )
+            batches = batches.filter(product__in=idle)
+        else:
+            batches = batches.filter(
+                Q(last_dispatched_at__lt=cutoff)
+                | Q(last_dispatched_at__isnull=True, received_date__lt=cutoff.date())
+                | Q(last_dispatched_at__isnull=True, received_date__isnull=True)
+            )
+        category_id = request.query_params.get('category_id')
+        if category_id:
+            batches = batches.filter(product__category_id=category_id)
+
+        def idle_days(last):
+            return (now - last).days if last else None
+
+        if by_product:
+            rows = batches.order_by().values(
+                'product_id', 'product__name', 'product__category__name', 'product__last_dispatched_at'
+            ).annotate(quantity=Sum('on_hand'), value=Sum('value'), earliest_expiry=Min('expiry_date'))
+            return paginated_report(self, request, rows, paginator=ReportCursorPagination(tiebreaker='product_id'), to_row=lambda r: {
+                'product_id': r['product_id'],
+                'product_name': r['product__name'],
+                'category': r['product__category__name'] or '—',
+                'last_dispatched_at': r['product__last_dispatched_at'].isoformat() if r['product__last_dispatched_at'] else None,
+                'days_idle': idle_days(r['product__last_dispatched_at']),
+                'quantity': r['quantity'],
+                'value': r['value'].quantize(MONEY_PLACES),
+                'earliest_expiry': str(r['earliest_expiry']),
+            })
+        rows = batches.values(
+            'id', 'product_id', 'product__name', 'product__category__name', 'batch_number', 'expiry_date',
+            'last_dispatched_at', 'on_hand', 'unit_cost', 'value',
+        )
+        today = timezone.localdate()
+        return paginated_report(self, request, rows, lambda b: {
+            'batch_id': b['id'],
+            'product_id': b['product_id'],
+            'product_name': b['product__name'],
+            'category': b['product__category__name'] or '—',
+            'batch_number': b['batch_number'],
+            'last_dispatched_at': b['last_dispatched_at'].isoformat() if b['last_dispatched_at'] else None,
+            'days_idle': idle_days(b['last_dispatched_at']),
+            'quantity': b['on_hand'],
+            'unit_cost': b['unit_cost'].quantize(COST_PLACES),
+            'value': b['value'].quantize(MONEY_PLACES),
+            'expiry_date': str(b['expiry_date']),
+            'days_until_expiry': (b['expiry_date'] - today).days,
+        })
+
+
+class LowStockReport(ExportableReportMixin, APIView):
+    """
+    Active products below ?threshold= (default 10), or at/below their forecast reorder point with ?threshold=reorder_point
+    (see reports.forecasting), optionally in one ?category_id=. Keyset-paginated (see ReportCursorPagination).
+    """
+    permission_classes = [IsAdminUser]
+    ordering = 'stock_quantity'
+    ordering_fields = ('stock_quantity', 'name')
+
+    @cached_report('stock')
+    def get(self, request):
+        threshold = request.query_params.get('threshold', 10)
+        if threshold == 'reorder_point':
+            products = Product.objects.filter(is_active=True, stock_quantity__lte=F('demand_forecast__reorder_point'))
+        else:
+            products = Product.objects.filter(
+                is_active=True,
+                stock_quantity__lt=int(threshold)
+            )
+        category_id = request.query_params.get('category_id')
+        if category_id:
+            products = products.filter(category_id=category_id)
+        products = products.values('id', 'name', 'stock_quantity', 'category__name', 'demand_forecast__reorder_point')
+        return paginated_report(self, request, products, lambda p: {
+            'product_id': p['id'],
+            'product_name': p['name'],
+            'category': p['category__name'] or '—',
+            'stock_quantity': p['stock_quantity'],
+            'reorder_point': p['demand_forecast__reorder_point'],
+        })
+
+
+class SuggestedPurchaseReport(ExportableReportMixin, APIView):
+    """
+    Products at or below their forecast reorder point (stock on hand plus quantity on pending purchases), with the
+    quantity to order to cover ?cover_days= (default 30) of forecast demand beyond the reorder point, rounded up
+    to whole packs. Forecasts come from the nightly forecast_demand command.
+    """
+    permission_classes = [IsAdminUser]
+
+    @cached_report('stock', 'purchases')
+    def get(self, request):
+        try:
+            cover_days = max(0, int(request.query_params.get('cover_days', 30)))
+        except ValueError:
+            cover_days = 30
+        pending = PurchaseItem.objects.filter(purchase__status='pending', product=OuterRef('product')).order_by().values(
+            'product').annotate(total=Sum('quantity')).values('total')
+        forecasts = DemandForecast.objects.filter(product__is_active=True).annotate(
+            on_order=Coalesce(Subquery(pending), 0),
+        ).filter(product__stock_quantity__lte=F('reorder_point') - F('on_order'), daily_demand__gt=0)
+        category_id = request.query_params.get('category_id')
+        if category_id:
+            forecasts = forecasts.filter(product__category_id=category_id)
+        rows = forecasts.order_by('days_of_cover', 'product_id').values(
+            'product_id', 'product__name', 'product__category__name', 'product__stock_quantity', 'product__pack_size',
+            'on_order', 'daily_demand', 'safety_stock', 'reorder_point', 'days_of_cover', 'computed_at',
+        )
+
+        def suggestion(f):
+            target = f['reorder_point'] + f['daily_demand'] * cover_days
+            needed = max(0, math.ceil(target - f['product__stock_quantity'] - f['on_order']))
+            pack = f['product__pack_size'] or 1
+            return {
+                'product_id': f['product_id'],
+                'product_name': f['product__name'],
+                'category': f['product__category__name'] or '—',
+                'stock_quantity': f['product__stock_quantity'],
+                'on_order': f['on_order'],
+                'daily_demand': f['daily_demand'],
+                'safety_stock': f['safety_stock'],
+                'reorder_point': f['reorder_point'],
+                'days_of_cover': f['days_of_cover'],
+                'suggested_quantity': math.ceil(needed / pack) * pack,
+                'forecast_at': f['computed_at'].isoformat(),
             }
-            for p in products
-        ]
-        return Response(report)
+
+        return self.report_response(request, (suggestion(f) for f in rows.iterator(chunk_size=2000)))
+
+
+class InventoryClassificationReport(ExportableReportMixin, APIView):
+    """
+    ABC/XYZ classes from the latest monthly snapshot (or ?period=YYYY-MM), see reports.classification.
+    Filters: abc, xyz, category_id. ?view=matrix returns product counts and sales value per ABC/XYZ cell instead.
+    Keyset-paginated by sales value (see ReportCursorPagination). demand_cv is not a sort key: it is null for
+    products without demand, and a keyset cursor cannot continue past nulls.
+    """
+    permission_classes = [IsAdminUser]
+    ordering = '-sales_value'
+    ordering_fields = ('sales_value', 'quantity')
+
+    @cached_report('stock')
+    def get(self, request):
+        period = latest_period()
+        period_param = request.query_params.get('period')
+        if period_param:
+            try:
+                month = datetime.strptime(period_param, '%Y-%m').date()
+            except ValueError:
+                return Response({'detail': 'period must be YYYY-MM.'}, status=400)
+            period = InventoryClass.objects.filter(
+                period_end__year=month.year, period_end__month=month.month
+            ).values_list('period_end', flat=True).first()
+        qs = InventoryClass.objects.filter(period_end=period)
+        for param, field in (('abc', 'abc_class'), ('xyz', 'xyz_class'), ('category_id', 'product__category_id')):
+            value = request.query_params.get(param)
+            if value:
+                qs = qs.filter(**{field: value.upper() if param != 'category_id' else value})
+        if request.query_params.get('view') == 'matrix':
+            cells = qs.order_by('abc_class', 'xyz_class').values('abc_class', 'xyz_class').annotate(
+                products=Count('id'), value=Sum('sales_value'),
+            )
+            return self.report_response(request, (
+                {'period_end': str(period), 'abc_class': c['abc_class'], 'xyz_class': c['xyz_class'],
+                 'products': c['products'], 'sales_value': float(c['value'] or 0)}
+                for c in cells
+            ))
+        qs = qs.values(
+            'id', 'product_id', 'product__name', 'product__category__name', 'period_end', 'window_months',
+            'abc_class', 'xyz_class', 'sales_value', 'value_share', 'cumulative_share', 'quantity', 'demand_cv',
+        )
+        return paginated_report(self, request, qs, lambda c: {
+            'product_id': c['product_id'],
+            'product_name': c['product__name'],
+            'category': c['product__category__name'] or '—',
+            'period_end': str(c['period_end']),
+            'window_months': c['window_months'],
+            'class': c['abc_class'] + c['xyz_class'],
+            'abc_class': c['abc_class'],
+            'xyz_class': c['xyz_class'],
+            'sales_value': float(c['sales_value']),
+            'value_share': c['value_share'],
+            'cumulative_share': c['cumulative_share'],
+            'quantity': c['quantity'],
+            'demand_cv': c['demand_cv'],
+        })
 
 
-class StockRequirementsReport(APIView):
+class StockRequirementsReport(ExportableReportMixin, APIView):
     """Re-expose stock requirements (in_hand, required, shortfall) for report UI."""
     permission_classes = [IsAdminUser]
 
+    @cached_report('orders', 'stock')
     def get(self, request):
         from orders.views import OrderViewSet
         # Reuse logic: we need OrderViewSet.stock_requirements logic without the viewset
@@ -210,9 +619,12 @@ class StockRequirementsReport(APIView):
         return Response(report)
 
 
-class CurrentStockSummaryReport(APIView):
+@snapshot_report('stock_summary')
+class CurrentStockSummaryReport(ExportableReportMixin, APIView):
     permission_classes = [IsAdminUser]
+    export_rows_key = 'items'
 
+    @cached_report('stock')
     def get(self, request):
         category_id = request.query_params.get('category_id')
         qs = Product.objects.filter(is_active=True).select_related('category')
@@ -232,35 +644,117 @@ class CurrentStockSummaryReport(APIView):
         return Response({'items': report, 'total_quantity': total_qty})
 
 
-class StockValuationReport(APIView):
+class InventoryTurnoverReport(ExportableReportMixin, APIView):
+    """
+    Turnover (COGS / average inventory at cost) and days of cover (window days / turnover) per product, or per category
+    with ?group_by=category, for start_date..end_date (default the last 30 days). Average inventory comes from the
+    daily snapshot_stock rows, COGS from the cost snapshotted on each dispatched allocation (see reports.turnover).
+    ?category_id= limits to one category. Keyset-paginated by COGS (see ReportCursorPagination).
+    """
     permission_classes = [IsAdminUser]
+    ordering = '-cogs'
+    ordering_fields = ('cogs', 'avg_inventory_value')
 
+    @cached_report('orders', 'stock', 'dispatch')
     def get(self, request):
-        # Use selling_price for valuation (simplest)
-        products = Product.objects.filter(is_active=True)
-        total = sum(float(p.stock_quantity * p.selling_price) for p in products)
+        group_by = request.query_params.get('group_by', 'product')
+        if group_by not in TURNOVER_GROUPS:
+            return Response({'detail': 'group_by must be product or category.'}, status=400)
+        end = timezone.localdate()
+        start = end - timedelta(days=29)
+        try:
+            if request.query_params.get('start_date'):
+                start = datetime.strptime(request.query_params['start_date'], '%Y-%m-%d').date()
+            if request.query_params.get('end_date'):
+                end = datetime.strptime(request.query_params['end_date'], '%Y-%m-%d').date()
+        except ValueError:
+            return Response({'detail': 'start_date and end_date must be YYYY-MM-DD.'}, status=400)
+        window_days = (end - start).days + 1
+        rows = inventory_turnover(start, end, group_by, category_id=request.query_params.get('category_id'))
+
+        def to_row(r):
+            turnover = r['cogs'] / r['avg_inventory_value'] if r['avg_inventory_value'] else None
+            row = {
+                'product_id': r['product_id'],
+                'product_name': r['product__name'],
+            } if group_by == 'product' else {'category_id': r['product__category_id']}
+            row.update({
+                'category': r['product__category__name'] or '—',
+                'start_date': str(start),
+                'end_date': str(end),
+                'snapshot_days': r['days'],
+                'avg_quantity': round(r['avg_quantity'], 2),
+                'avg_inventory_value': round(r['avg_inventory_value'], 2),
+                'cogs': round(r['cogs'], 2),
+                'turnover': round(turnover, 4) if turnover is not None else None,
+                'days_of_cover': round(window_days / turnover, 1) if turnover else None,
+            })
+            return row
+        paginator = ReportCursorPagination(tiebreaker=TURNOVER_GROUPS[group_by][0][0])
+        return paginated_report(self, request, rows, to_row, paginator=paginator)
+
+
+@snapshot_report('stock_valuation')
+class StockValuationReport(ExportableReportMixin, APIView):
+    """
+    Stock valued at landed purchase cost per batch (see reports.valuation), as of ?as_of=YYYY-MM-DD (default today;
+    ?as_of=latest serves the last close-of-business snapshot, see reports.snapshots).
+    Returns per-product items plus totals by category and by near-expiry bucket; ?category_id= limits to one category.
+    """
+    permission_classes = [IsAdminUser]
+    export_rows_key = 'items'
+
+    @cached_report('stock', 'purchases')
+    def get(self, request):
+        as_of = None
+        as_of_param = request.query_params.get('as_of')
+        if as_of_param:
+            try:
+                as_of = datetime.strptime(as_of_param, '%Y-%m-%d').date()
+            except ValueError:
+                pass
+        valuation = stock_valuation(as_of=as_of, category_id=request.query_params.get('category_id'))
         report = [
             {
-                'product_id': p.id,
-                'product_name': p.name,
-                'stock_quantity': p.stock_quantity,
-                'unit_price': float(p.selling_price),
-                'value': float(p.stock_quantity * p.selling_price),
+                'product_id': p['product_id'],
+                'product_name': p['product__name'],
+                'category': p['product__category__name'] or '—',
+                'stock_quantity': p['quantity'],
+                'unit_price': (p['total_value'] / p['quantity']).quantize(MONEY_PLACES) if p['quantity'] else Decimal('0'),
+                'value': p['total_value'].quantize(MONEY_PLACES),
             }
-            for p in products if p.stock_quantity > 0
+            for p in valuation['products']
         ]
-        report.sort(key=lambda x: -x['value'])
-        return Response({'items': report, 'total_valuation': total})
+        return Response({
+            'as_of': str(as_of or timezone.localdate()),
+            'items': report,
+            'total_valuation': sum((p['value'] for p in report), Decimal('0')),
+            'by_category': [
+                {
+                    'category_id': c['product__category_id'],
+                    'category': c['product__category__name'] or '—',
+                    'quantity': c['quantity'],
+                    'value': c['total_value'].quantize(MONEY_PLACES),
+                }
+                for c in valuation['categories']
+            ],
+            'by_expiry': [dict(b, value=b['value'].quantize(MONEY_PLACES)) for b in valuation['expiry']],
+            'unvalued_quantity': valuation['unvalued_quantity'],
+        })
 
 
-class PurchaseHistoryReport(APIView):
+class PurchaseHistoryReport(ExportableReportMixin, APIView):
+    """Purchases filtered by purchase date range, status and supplier. Keyset-paginated (see ReportCursorPagination)."""
     permission_classes = [IsAdminUser]
+    ordering = '-created_at'
+    ordering_fields = ('created_at', 'purchase_date', 'total_amount')
 
+    @cached_report('purchases')
     def get(self, request):
-        start_d, end_d = _parse_date_range(request)
+        start_d, end_d = parse_date_range(request)
         status_filter = request.query_params.get('status')  # pending | approved
         supplier = request.query_params.get('supplier')
-        qs = Purchase.objects.all().order_by('-created_at')
+        qs = Purchase.objects.all()
         if start_d:
             qs = qs.filter(purchase_date__gte=start_d)
         if end_d:
@@ -269,238 +763,488 @@ class PurchaseHistoryReport(APIView):
             qs = qs.filter(status=status_filter)
         if supplier:
             qs = qs.filter(supplier_name__icontains=supplier)
-        report = [
-            {
-                'id': p.id,
-                'supplier_name': p.supplier_name,
-                'purchase_date': str(p.purchase_date),
-                'total_amount': float(p.total_amount),
-                'status': p.status,
-                'created_at': p.created_at.isoformat() if p.created_at else None,
-            }
-            for p in qs
-        ]
-        return Response(report)
+        return paginated_report(self, request, qs, lambda p: {
+            'id': p.id,
+            'supplier_name': p.supplier_name,
+            'purchase_date': str(p.purchase_date),
+            'total_amount': float(p.total_amount),
+            'status': p.status,
+            'created_at': p.created_at.isoformat() if p.created_at else None,
+        })
 
 
-class PurchaseByProductReport(APIView):
+class PurchaseByProductReport(ExportableReportMixin, APIView):
     permission_classes = [IsAdminUser]
 
+    @cached_report('purchases')
     def get(self, request):
-        start_d, end_d = _parse_date_range(request)
-        qs = PurchaseItem.objects.filter(purchase__status='approved').select_related('product')
+        start_d, end_d = parse_date_range(request)
+        qs = PurchaseItem.objects.filter(purchase__status='approved')
         if start_d:
             qs = qs.filter(purchase__purchase_date__gte=start_d)
         if end_d:
             qs = qs.filter(purchase__purchase_date__lte=end_d)
-        from collections import defaultdict
-        by_product = defaultdict(lambda: {'quantity': 0, 'value': Decimal('0'), 'name': None})
-        for item in qs:
-            pid = item.product_id
-            by_product[pid]['quantity'] += item.quantity
-            by_product[pid]['value'] += item.quantity * (item.unit_price or 0)
-            by_product[pid]['name'] = item.product.name if item.product_id else '—'
-        report = [
-            {'product_id': pid, 'product_name': data['name'] or '—', 'quantity': data['quantity'], 'value': float(data['value'])}
-            for pid, data in by_product.items()
-        ]
-        report.sort(key=lambda x: -x['value'])
+        report = _product_totals(qs, 'product', F('quantity') * F('unit_price'), request)
         return Response(report)
 
 
-class OrderStatusSummaryReport(APIView):
+class OrderStatusSummaryReport(ExportableReportMixin, APIView):
     permission_classes = [IsAdminUser]
 
+    @cached_report('orders')
     def get(self, request):
         qs = Order.objects.values('status').annotate(count=Count('id')).order_by('-count')
         report = [{'status': r['status'], 'count': r['count']} for r in qs]
         return Response(report)
 
 
-class FulfillmentReport(APIView):
+@snapshot_report('fulfillment', {}, {'group_by': 'product'})
+class FulfillmentReport(ExportableReportMixin, APIView):
     permission_classes = [IsAdminUser]
 
+    @cached_report('orders', 'dispatch')
     def get(self, request):
         group_by = request.query_params.get('group_by', 'order')  # order | product
         if group_by == 'product':
-            # Per product: total ordered vs total dispatched
-            items = OrderItem.objects.filter(
-                order__status__in=['approved', 'processing', 'shipped', 'delivered']
-            ).values('product', 'product__name').annotate(
-                ordered=Sum('quantity'),
+            # Per product: total ordered vs total dispatched, both as correlated subqueries in one query
+            active = ['approved', 'processing', 'shipped', 'delivered']
+            ordered = OrderItem.objects.filter(product=OuterRef('pk'), order__status__in=active).order_by().values(
+                'product').annotate(total=Sum('quantity')).values('total')
+            dispatched = OrderItemAllocation.objects.filter(
+                order_item__product=OuterRef('pk'), order_item__order__status__in=active
+            ).order_by().values('order_item__product').annotate(total=Sum('quantity')).values('total')
+            products = Product.objects.annotate(
+                ordered=Subquery(ordered),
+                dispatched=Coalesce(Subquery(dispatched), 0),
+            ).filter(ordered__isnull=False).values('id', 'name', 'ordered', 'dispatched').order_by('-ordered', 'id')
+            report = (
+                {
+                    'product_id': p['id'],
+                    'product_name': p['name'] or '—',
+                    'ordered': p['ordered'],
+                    'dispatched': p['dispatched'],
+                    'remaining': p['ordered'] - p['dispatched'],
+                }
+                for p in products.iterator(chunk_size=2000)
             )
-            # Dispatched per product from allocations
-            disp = OrderItemAllocation.objects.filter(
-                order_item__order__status__in=['approved', 'processing', 'shipped', 'delivered']
-            ).values('order_item__product').annotate(dispatched=Sum('quantity'))
-            disp_map = {r['order_item__product']: (r['dispatched'] or 0) for r in disp}
-            report = []
-            for r in items:
-                prod_id = r['product']
-                dispatched = disp_map.get(prod_id, 0)
-                report.append({
-                    'product_id': prod_id,
-                    'product_name': r['product__name'] or '—',
-                    'ordered': r['ordered'],
-                    'dispatched': dispatched,
-                    'remaining': r['ordered'] - dispatched,
-                })
-            report.sort(key=lambda x: -x['ordered'])
         else:
-            # Per order
-            orders = Order.objects.exclude(status__in=['pending', 'rejected']).prefetch_related('items')
-            report = []
-            for o in orders:
-                total_ordered = sum(i.quantity for i in o.items.all())
-                total_dispatched = sum(i.dispatched_quantity for i in o.items.all())
-                report.append({
-                    'order_id': o.id,
-                    'order_number': o.order_number,
-                    'pharmacy_name': o.pharmacy.pharmacy_name if o.pharmacy else '—',
-                    'ordered': total_ordered,
-                    'dispatched': total_dispatched,
-                    'remaining': total_ordered - total_dispatched,
-                })
-            report.sort(key=lambda x: -x['ordered'])
-        return Response(report)
+            # Per order: ordered and dispatched quantities as correlated subqueries (no per-item queries)
+            orders = Order.objects.exclude(status__in=['pending', 'rejected']).annotate(
+                ordered=_ordered_qty_subquery(),
+                dispatched=_dispatched_qty_subquery(),
+            ).values('id', 'order_number', 'pharmacy__pharmacy_name', 'ordered', 'dispatched').order_by('-ordered', 'id')
+            report = (
+                {
+                    'order_id': o['id'],
+                    'order_number': o['order_number'],
+                    'pharmacy_name': o['pharmacy__pharmacy_name'] or '—',
+                    'ordered': o['ordered'],
+                    'dispatched': o['dispatched'],
+                    'remaining': o['ordered'] - o['dispatched'],
+                }
+                for o in orders.iterator(chunk_size=2000)
+            )
+        return self.report_response(request, report)
 
 
-class InvoiceListReport(APIView):
+class FulfillmentLeadTimeReport(ExportableReportMixin, APIView):
+    """
+    Per-order fill rate (dispatched / ordered, non-void lines) and lead time from approval to first and last dispatch.
+    Filters: start_date / end_date (approval date), pharmacy_id. Sorted in SQL via ?ordering= (see ordering_fields); paginated with ?page=
+    (exports contain every row).
+    """
     permission_classes = [IsAdminUser]
+    ordering_fields = ('approved_at', 'order_number', 'fill_rate', 'to_first_dispatch', 'to_last_dispatch')
 
+    @cached_report('orders', 'dispatch')
     def get(self, request):
-        start_d, end_d = _parse_date_range(request)
-        qs = Invoice.objects.select_related('order').order_by('-created_at')
-        if start_d:
-            qs = qs.filter(created_at__date__gte=start_d)
-        if end_d:
-            qs = qs.filter(created_at__date__lte=end_d)
-        report = [
-            {
-                'id': inv.id,
-                'invoice_number': inv.invoice_number,
-                'order_id': inv.order_id,
-                'order_number': inv.order.order_number if inv.order else '—',
-                'created_at': inv.created_at.isoformat() if inv.created_at else None,
-            }
-            for inv in qs
-        ]
-        return Response(report)
+        start_d, end_d = parse_date_range(request)
+        dispatches = Dispatch.objects.filter(order=OuterRef('pk')).order_by()
+        qs = Order.objects.filter(approved_at__isnull=False, is_void=False).annotate(
+            ordered=_ordered_qty_subquery(include_void=False),
+            dispatched=_dispatched_qty_subquery(include_void=False),
+            first_dispatch_at=Subquery(dispatches.order_by('dispatched_at').values('dispatched_at')[:1]),
+            last_dispatch_at=Subquery(dispatches.order_by('-dispatched_at').values('dispatched_at')[:1]),
+        ).annotate(
+            fill_rate=ExpressionWrapper(
+                Cast('dispatched', FloatField()) / NullIf(Cast('ordered', FloatField()), Value(0.0)), output_field=FloatField()
+            ),
+            to_first_dispatch=ExpressionWrapper(F('first_dispatch_at') - F('approved_at'), output_field=DurationField()),
+            to_last_dispatch=ExpressionWrapper(F('last_dispatch_at') - F('approved_at'), output_field=DurationField()),
+        )
+        qs = filter_date_range(qs, 'approved_at', start_d, end_d)
+        pharmacy_id = request.query_params.get('pharmacy_id')
+        if pharmacy_id:
+            qs = qs.filter(pharmacy_id=pharmacy_id)
+        ordering = request.query_params.get('ordering', '-approved_at')
+        if ordering.lstrip('-') not in self.ordering_fields:
+            ordering = '-approved_at'
+        sort = F(ordering.lstrip('-'))
+        qs = qs.order_by(sort.desc(nulls_last=True) if ordering.startswith('-') else sort.asc(nulls_last=True), '-id')
+        qs = qs.values(
+            'id', 'order_number', 'pharmacy__pharmacy_name', 'approved_at', 'first_dispatch_at', 'last_dispatch_at',
+            'ordered', 'dispatched', 'fill_rate', 'to_first_dispatch', 'to_last_dispatch',
+        )
+
+        def hours(delta):
+            return round(delta.total_seconds() / 3600, 2) if delta is not None else None
 
+        def rows(orders):
+            for o in orders:
+                yield {
+                    'order_id': o['id'],
+                    'order_number': o['order_number'],
+                    'pharmacy_name': o['pharmacy__pharmacy_name'] or '—',
+                    'approved_at': o['approved_at'].isoformat(),
+                    'first_dispatch_at': o['first_dispatch_at'].isoformat() if o['first_dispatch_at'] else None,
+                    'last_dispatch_at': o['last_dispatch_at'].isoformat() if o['last_dispatch_at'] else None,
+                    'ordered': o['ordered'],
+                    'dispatched': o['dispatched'],
+                    'fill_rate': round(o['fill_rate'], 4) if o['fill_rate'] is not None else None,
+                    'hours_to_first_dispatch': hours(o['to_first_dispatch']),
+                    'hours_to_last_dispatch': hours(o['to_last_dispatch']),
+                }
 
-class InvoicesGeneratedReport(APIView):
+        if self.export_format(request):
+            return self.report_response(request, rows(qs.iterator(chunk_size=2000)))
+        paginator = PageNumberPagination()
+        page = paginator.paginate_queryset(qs, request, view=self)
+        return paginator.get_paginated_response(list(rows(page)))
+
+
+def _invoice_rows(request, qs):
+    """Invoices filtered by date range and ?search= (invoice or order number), as compact values() rows."""
+    start_d, end_d = parse_date_range(request)
+    qs = filter_date_range(qs, 'business_date', start_d, end_d)
+    search = request.query_params.get('search')
+    if search:
+        qs = qs.filter(Q(invoice_number__icontains=search) | Q(order__order_number__icontains=search))
+    return qs.values('id', 'invoice_number', 'order_id', 'created_at', order_number=F('order__order_number'), order_total=F('order__total_amount'))
+
+
+class InvoiceListReport(ExportableReportMixin, APIView):
+    """Invoices filtered by date range, ?pharmacy_id= and ?search=. Keyset-paginated (see ReportCursorPagination)."""
     permission_classes = [IsAdminUser]
+    ordering = '-created_at'
+    ordering_fields = ('created_at', 'invoice_number')
 
+    @cached_report('orders')
     def get(self, request):
-        start_d, end_d = _parse_date_range(request)
         qs = Invoice.objects.all()
-        if start_d:
-            qs = qs.filter(created_at__date__gte=start_d)
-        if end_d:
-            qs = qs.filter(created_at__date__lte=end_d)
-        count = qs.count()
+        pharmacy_id = request.query_params.get('pharmacy_id')
+        if pharmacy_id:
+            qs = qs.filter(order__pharmacy_id=pharmacy_id)
+        return paginated_report(self, request, _invoice_rows(request, qs), lambda inv: {
+            'id': inv['id'],
+            'invoice_number': inv['invoice_number'],
+            'order_id': inv['order_id'],
+            'order_number': inv['order_number'] or '—',
+            'created_at': inv['created_at'].isoformat() if inv['created_at'] else None,
+        })
+
+
+class SalesRegisterReport(JSONErrorsMixin, APIView):
+    """
+    GSTR-1 style sales register: one row per bill per GST rate, for overall invoices (by invoice date)
+    and dispatch-wise bills (by dispatch date). Streams ?format=csv (default), ?format=jsonl or ?format=xlsx
+    from the stored invoice tax summaries, which are written with each bill and rebuilt when its order changes
+    (bills older than stored summaries: backfill_tax_summaries command). Optional bill_type=invoice|dispatch.
+    """
+    permission_classes = [IsAdminUser]
+    renderer_classes = [CSVRenderer, JSONLinesRenderer, XLSXRenderer]
+    content_negotiation_class = ExportContentNegotiation
+    columns = [
+        ('bill_type', 'Bill Type'),
+        ('invoice_number', 'Invoice No'),
+        ('bill_date', 'Invoice Date'),
+        ('buyer_name', 'Buyer'),
+        ('buyer_gstin', 'Buyer GSTIN'),
+        ('place_of_supply', 'Place of Supply'),
+        ('gst_rate', 'GST %'),
+        ('taxable_value', 'Taxable Value'),
+        ('cgst_amount', 'CGST'),
+        ('sgst_amount', 'SGST'),
+        ('igst_amount', 'IGST'),
+        ('tax_amount', 'Total Tax'),
+        ('total_amount', 'Invoice Value'),
+    ]
+
+    def get(self, request):
+        start_d, end_d = parse_date_range(request)
+        bill_type = request.query_params.get('bill_type')
+        invoices = filter_date_range(Invoice.objects.all(), 'business_date', start_d, end_d)
+        dispatches = filter_date_range(Dispatch.objects.all(), 'business_date', start_d, end_d)
+        if bill_type == 'invoice':
+            dispatches = dispatches.none()
+        elif bill_type == 'dispatch':
+            invoices = invoices.none()
+        rows = InvoiceTaxSummary.objects.filter(
+            Q(dispatch__isnull=True, invoice__in=invoices) | Q(dispatch__in=dispatches)
+        ).order_by('invoice_id', 'dispatch_id', 'gst_rate').values(
+            'invoice__invoice_number', 'invoice__created_at', 'dispatch_id', 'dispatch__dispatched_at',
+            'invoice__order__pharmacy__pharmacy_name', 'invoice__order__pharmacy__gst_number',
+            'gst_rate', 'taxable_value', 'cgst_amount', 'sgst_amount', 'igst_amount', 'tax_amount', 'total_amount',
+        ).iterator(chunk_size=2000)
+        filename = f"sales_register_{start_d or 'start'}_{end_d or 'end'}"
+        return stream_rows(request.accepted_renderer.format, self.columns, (self._row(r) for r in rows), filename)
+
+    @staticmethod
+    def _row(r):
+        is_dispatch = r['dispatch_id'] is not None
+        billed_at = r['dispatch__dispatched_at'] if is_dispatch else r['invoice__created_at']
+        gstin = r['invoice__order__pharmacy__gst_number'] or ''
+        return {
+            'bill_type': 'dispatch' if is_dispatch else 'invoice',
+            'invoice_number': f"{r['invoice__invoice_number']}/D{r['dispatch_id']}" if is_dispatch else r['invoice__invoice_number'],
+            'bill_date': timezone.localtime(billed_at).date().isoformat() if billed_at else '',
+            'buyer_name': r['invoice__order__pharmacy__pharmacy_name'] or '',
+            'buyer_gstin': gstin,
+            'place_of_supply': gst_state_code(gstin) or '',
+            'gst_rate': r['gst_rate'],
+            'taxable_value': r['taxable_value'],
+            'cgst_amount': r['cgst_amount'],
+            'sgst_amount': r['sgst_amount'],
+            'igst_amount': r['igst_amount'],
+            'tax_amount': r['tax_amount'],
+            'total_amount': r['total_amount'],
+        }
+
+
+def _statement_pharmacy(request):
+    """Admins pick the pharmacy with ?pharmacy_id=; a pharmacy user always gets its own."""
+    if request.user.role == 'admin':
+        pharmacy_id = request.query_params.get('pharmacy_id')
+        return Pharmacy.objects.filter(pk=pharmacy_id).first() if pharmacy_id and pharmacy_id.isdigit() else None
+    return getattr(request.user, 'pharmacy', None)
+
+
+def _statement_period(request):
+    """?start_date= / ?end_date=, defaulting to the current month to date."""
+    start_d, end_d = parse_date_range(request)
+    end_d = end_d or timezone.localdate()
+    return start_d or end_d.replace(day=1), end_d
+
+
+class PharmacyStatementReport(JSONErrorsMixin, APIView):
+    """
+    Statement of account from the receivables ledger (orders.ledger): opening balance (latest checkpoint plus the
+    entries after it), each dispatch, payment and void with its running balance, and the closing balance.
+    Streams ?format=csv (default), ?format=jsonl or ?format=xlsx. Admins pass pharmacy_id.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [CSVRenderer, JSONLinesRenderer, XLSXRenderer]
+    content_negotiation_class = ExportContentNegotiation
+    columns = [
+        ('date', 'Date'),
+        ('entry_type', 'Type'),
+        ('reference', 'Reference'),
+        ('order_number', 'Order No'),
+        ('debit', 'Debit'),
+        ('credit', 'Credit'),
+        ('balance', 'Balance'),
+    ]
+
+    def get(self, request):
+        pharmacy = _statement_pharmacy(request)
+        if pharmacy is None:
+            return Response({'detail': 'pharmacy_id is required.'}, status=400)
+        start_d, end_d = _statement_period(request)
+        opening, rows = ledger.statement(pharmacy.pk, start_d, end_d)
+
+        def statement_rows():
+            balance = opening
+            yield {'date': start_d, 'entry_type': 'opening', 'reference': 'Opening balance', 'balance': opening}
+            for row in rows:
+                balance = row['balance']
+                yield row
+            yield {'date': end_d, 'entry_type': 'closing', 'reference': 'Closing balance', 'balance': balance}
+
+        filename = f"statement_{pharmacy.pk}_{start_d}_{end_d}"
+        return stream_rows(request.accepted_renderer.format, self.columns, statement_rows(), filename)
+
+
+class PharmacyStatementPDFView(APIView):
+    """The statement of account as a PDF, rendered like the invoices (same params as PharmacyStatementReport)."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        pharmacy = _statement_pharmacy(request)
+        if pharmacy is None:
+            return Response({'detail': 'pharmacy_id is required.'}, status=400)
+        start_d, end_d = _statement_period(request)
+        opening, rows = ledger.statement(pharmacy.pk, start_d, end_d)
+        rows = list(rows)
+        statement = {
+            'start_date': start_d,
+            'end_date': end_d,
+            'opening_balance': opening,
+            'closing_balance': rows[-1]['balance'] if rows else opening,
+            'total_debit': sum((r['debit'] for r in rows), Decimal('0')),
+            'total_credit': sum((r['credit'] for r in rows), Decimal('0')),
+            'rows': rows,
+        }
+        html = render_statement_html(pharmacy, statement)
+        response = HttpResponse(HTML(string=html, base_url=request.build_absolute_uri()).write_pdf(), content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="statement_{pharmacy.pk}_{start_d}_{end_d}.pdf"'
+        return response
+
+
+class InvoicesGeneratedReport(ExportableReportMixin, APIView):
+    permission_classes = [IsAdminUser]
+
+    @cached_report('orders')
+    def get(self, request):
+        start_d, end_d = parse_date_range(request)
+        count = filter_date_range(Invoice.objects.all(), 'business_date', start_d, end_d).count()
         return Response({'count': count})
 
 
-class VoidReport(APIView):
+class VoidReport(ExportableReportMixin, APIView):
+    """
+    Voided orders and voided lines, filtered by date range and ?pharmacy_id=. Each list is keyset-paginated
+    on its own cursor (?orders_cursor=, ?items_cursor=). Exports list both in one sheet, told apart by the void_type column.
+    """
     permission_classes = [IsAdminUser]
+    export_columns = [
+        ('void_type', 'Type'),
+        ('order_id', 'Order ID'),
+        ('order_number', 'Order No'),
+        ('pharmacy_name', 'Pharmacy'),
+        ('status', 'Status'),
+        ('order_item_id', 'Line ID'),
+        ('product_name', 'Product'),
+        ('quantity', 'Quantity'),
+        ('amount', 'Amount'),
+        ('voided_at', 'Voided At'),
+    ]
 
+    @staticmethod
+    def _order_row(o):
+        return {
+            'order_id': o['id'],
+            'order_number': o['order_number'],
+            'pharmacy_name': o['pharmacy__pharmacy_name'] or '—',
+            'status': o['status'],
+            'total_amount': float(o['total_amount']),
+            'voided_at': o['updated_at'].isoformat() if o['updated_at'] else None,
+        }
+
+    @staticmethod
+    def _item_row(i):
+        return {
+            'order_item_id': i['id'],
+            'order_id': i['order_id'],
+            'order_number': i['order__order_number'] or '—',
+            'pharmacy_name': i['order__pharmacy__pharmacy_name'] or '—',
+            'product_name': i['product__name'] or '—',
+            'quantity': i['quantity'],
+            'total_price': float(i['total_price']),
+        }
+
+    @cached_report('orders')
     def get(self, request):
-        start_d, end_d = _parse_date_range(request)
+        start_d, end_d = parse_date_range(request)
+        pharmacy_id = request.query_params.get('pharmacy_id')
         # Voided whole orders
-        orders_qs = Order.objects.filter(is_void=True).select_related('pharmacy').order_by('-updated_at')
-        if start_d:
-            orders_qs = orders_qs.filter(updated_at__date__gte=start_d)
-        if end_d:
-            orders_qs = orders_qs.filter(updated_at__date__lte=end_d)
-        voided_orders = [
-            {
-                'order_id': o.id,
-                'order_number': o.order_number,
-                'pharmacy_name': o.pharmacy.pharmacy_name if o.pharmacy else '—',
-                'status': o.status,
-                'total_amount': float(o.total_amount),
-                'voided_at': o.updated_at.isoformat() if o.updated_at else None,
-            }
-            for o in orders_qs
-        ]
+        orders_qs = filter_date_range(Order.objects.filter(is_void=True), 'updated_at', start_d, end_d)
+        if pharmacy_id:
+            orders_qs = orders_qs.filter(pharmacy_id=pharmacy_id)
+        orders_qs = orders_qs.values('id', 'order_number', 'pharmacy__pharmacy_name', 'status', 'total_amount', 'updated_at')
         # Voided line items (order not fully voided)
-        items_qs = OrderItem.objects.filter(is_void=True).select_related('order', 'order__pharmacy', 'product').order_by('-id')
-        if start_d:
-            items_qs = items_qs.filter(order__updated_at__date__gte=start_d)
-        if end_d:
-            items_qs = items_qs.filter(order__updated_at__date__lte=end_d)
-        voided_items = [
-            {
-                'order_item_id': i.id,
-                'order_id': i.order_id,
-                'order_number': i.order.order_number if i.order else '—',
-                'pharmacy_name': i.order.pharmacy.pharmacy_name if i.order and i.order.pharmacy else '—',
-                'product_name': i.product.name if i.product_id else '—',
-                'quantity': i.quantity,
-                'total_price': float(i.total_price),
-            }
-            for i in items_qs
-        ]
+        items_qs = filter_date_range(OrderItem.objects.filter(is_void=True), 'order__updated_at', start_d, end_d)
+        if pharmacy_id:
+            items_qs = items_qs.filter(order__pharmacy_id=pharmacy_id)
+        items_qs = items_qs.values(
+            'id', 'order_id', 'order__order_number', 'order__pharmacy__pharmacy_name', 'product__name', 'quantity', 'total_price'
+        )
+        orders_pages = ReportCursorPagination(ordering='-updated_at', cursor_query_param='orders_cursor')
+        items_pages = ReportCursorPagination(ordering='-id', cursor_query_param='items_cursor')
+        if self.export_format(request):
+            orders = orders_qs.order_by(*orders_pages.get_ordering(request, orders_qs, self)).iterator(chunk_size=2000)
+            items = items_qs.order_by(*items_pages.get_ordering(request, items_qs, self)).iterator(chunk_size=2000)
+            rows = itertools.chain(
+                (dict(self._order_row(o), void_type='order', amount=float(o['total_amount'])) for o in orders),
+                (dict(self._item_row(i), void_type='item', amount=float(i['total_price'])) for i in items),
+            )
+            return self.report_response(request, rows)
+        orders_page = orders_pages.paginate_queryset(orders_qs, request, view=self)
+        items_page = items_pages.paginate_queryset(items_qs, request, view=self)
         return Response({
-            'voided_orders': voided_orders,
-            'voided_items': voided_items,
+            'voided_orders': orders_pages.get_paginated_response([self._order_row(o) for o in orders_page]).data,
+            'voided_items': items_pages.get_paginated_response([self._item_row(i) for i in items_page]).data,
         })
 
 
-class PharmacyOrderSummaryView(APIView):
-    """Order status summary for the logged-in pharmacy only."""
+class PharmacyAccountSummaryView(ExportableReportMixin, APIView):
+    """Portal home for the logged-in pharmacy: its PharmacyAccountSummary row (one primary-key lookup)."""
+    permission_classes = [IsPharmacyUser]
+
+    def get(self, request):
+        pharmacy = getattr(request.user, 'pharmacy', None)
+        if not pharmacy:
+            return Response({})
+        summary = get_account_summary(pharmacy)
+        return Response({
+            'order_count': summary.order_count,
+            'orders_by_status': {status: getattr(summary, field) for status, field in STATUS_FIELDS.items()},
+            'dispatched_amount': float(summary.dispatched_amount),
+            'paid_amount': float(summary.paid_amount),
+            'outstanding': float(summary.outstanding),
+            'last_order_number': summary.last_order_number or None,
+            'last_order_at': summary.last_order_at.isoformat() if summary.last_order_at else None,
+            'last_invoice_number': summary.last_invoice_number or None,
+            'last_invoice_at': summary.last_invoice_at.isoformat() if summary.last_invoice_at else None,
+            'updated_at': summary.updated_at.isoformat(),
+        })
+
+
+class PharmacyOrderSummaryView(ExportableReportMixin, APIView):
+    """Order status summary for the logged-in pharmacy only, from its PharmacyAccountSummary."""
     permission_classes = [IsPharmacyUser]
 
     def get(self, request):
         pharmacy = getattr(request.user, 'pharmacy', None)
         if not pharmacy:
             return Response([], status=200)
-        qs = Order.objects.filter(pharmacy=pharmacy).values('status').annotate(count=Count('id')).order_by('-count')
-        report = [{'status': r['status'], 'count': r['count']} for r in qs]
+        summary = get_account_summary(pharmacy)
+        counts = [(status, getattr(summary, field)) for status, field in STATUS_FIELDS.items()]
+        report = [{'status': status, 'count': count} for status, count in sorted(counts, key=lambda c: -c[1]) if count]
         return Response(report)
 
 
-class PharmacyOutstandingView(APIView):
-    """Outstanding (dispatched vs paid) for the logged-in pharmacy only."""
+class PharmacyOutstandingView(ExportableReportMixin, APIView):
+    """Outstanding (dispatched vs paid) for the logged-in pharmacy only, from its PharmacyAccountSummary."""
     permission_classes = [IsPharmacyUser]
 
     def get(self, request):
         pharmacy = getattr(request.user, 'pharmacy', None)
         if not pharmacy:
             return Response({'dispatched_amount': 0, 'paid_amount': 0, 'outstanding': 0})
-        dispatched_result = OrderItemAllocation.objects.filter(
-            order_item__order__pharmacy=pharmacy,
-            order_item__order__status__in=['approved', 'processing', 'shipped', 'delivered']
-        ).aggregate(total=Sum(F('quantity') * F('order_item__unit_price')))
-        dispatched = dispatched_result['total'] or Decimal('0')
-        paid = Order.objects.filter(pharmacy=pharmacy).aggregate(paid=Sum('paid_amount'))['paid'] or Decimal('0')
-        outstanding = max(Decimal('0'), dispatched - paid)
+        summary = get_account_summary(pharmacy)
         return Response({
-            'dispatched_amount': float(dispatched),
-            'paid_amount': float(paid),
-            'outstanding': float(outstanding),
+            'dispatched_amount': float(summary.dispatched_amount),
+            'paid_amount': float(summary.paid_amount),
+            'outstanding': float(summary.outstanding),
         })
 
 
-class PharmacyInvoiceListView(APIView):
-    """Invoice list for the logged-in pharmacy only."""
+class PharmacyInvoiceListView(ExportableReportMixin, APIView):
+    """Invoice list for the logged-in pharmacy only; filters and keyset pages as InvoiceListReport."""
     permission_classes = [IsPharmacyUser]
+    ordering = '-created_at'
+    ordering_fields = ('created_at', 'invoice_number')
 
+    @cached_report('orders')
     def get(self, request):
         pharmacy = getattr(request.user, 'pharmacy', None)
         if not pharmacy:
             return Response([])
-        qs = Invoice.objects.filter(order__pharmacy=pharmacy).select_related('order').order_by('-created_at')[:50]
-        report = [
-            {
-                'id': inv.id,
-                'invoice_number': inv.invoice_number,
-                'order_id': inv.order_id,
-                'order_number': inv.order.order_number if inv.order else '—',
-                'created_at': inv.created_at.isoformat() if inv.created_at else None,
-                'total_amount': float(inv.order.total_amount) if inv.order else 0,
-            }
-            for inv in qs
-        ]
-        return Response(report)
+        qs = _invoice_rows(request, Invoice.objects.filter(order__pharmacy=pharmacy))
+        return paginated_report(self, request, qs, lambda inv: {
+            'id': inv['id'],
+            'invoice_number': inv['invoice_number'],
+            'order_id': inv['order_id'],
+            'order_number': inv['order_number'] or '—',
+            'created_at': inv['created_at'].isoformat() if inv['created_at'] else None,
+            'total_amount': float(inv['order_total'] or 0),
+        })